@@ -297,7 +297,7 @@ def sql_db_query(query: str) -> str:
         
         # 执行查询（添加超时控制）
         result_data = DatasourceConnectionUtil.execute_query(
-            datasource_type, config, query
+            datasource_type, config, query, datasource_id
         )
         
         # 记录成功的调用
@@ -4,31 +4,44 @@
 """
 import logging
 import threading
+import time
 from typing import Optional, List
-from concurrent.futures import ThreadPoolExecutor
 
 from agent.excel.excel_agent_state import ExcelAgentState
-from agent.excel.excel_question_recommender import excel_question_recommender
-from copy import deepcopy
+from agent.excel.excel_question_recommender import QUESTION_RECOMMENDER_INPUT_KEYS, excel_question_recommender
 import asyncio
 
+from common.side_task_executor import SIDE_TASK_RECOMMEND, SIDE_TASK_TIMEOUT, side_task_input, submit_side_task
+
 logger = logging.getLogger(__name__)
 
-# 全局线程池和任务字典
-_recommender_executor: Optional[ThreadPoolExecutor] = None
+# 早期推荐问题任务字典（任务在进程级旁路任务执行器中执行）
 _recommender_lock = threading.Lock()
-_recommender_futures: dict = {}  # {task_id: {'future': future, 'result': [], 'completed': False}}
+_recommender_futures: dict = {}  # {task_id: {'future': future, 'result': [], 'completed': False, 'done_at': None}}
 
 
-def get_recommender_executor() -> ThreadPoolExecutor:
-    """获取或创建推荐问题生成的线程池"""
-    global _recommender_executor
-    if _recommender_executor is None:
-        with _recommender_lock:
-            if _recommender_executor is None:
-                _recommender_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="excel_early_recommender")
-                logger.info("✅ 创建表格问答早期推荐问题生成线程池")
-    return _recommender_executor
+def _on_recommender_done(task_id: str, future):
+    with _recommender_lock:
+        if future.cancelled():
+            # 问答取消后任务不会再被等待，直接清理任务信息
+            _recommender_futures.pop(task_id, None)
+        elif task_id in _recommender_futures:
+            _recommender_futures[task_id]['done_at'] = time.monotonic()
+
+
+def _sweep_stale_recommenders():
+    """
+    清理已完成但超过 SIDE_TASK_TIMEOUT 仍未被取走的任务信息（问答中途失败或等待超时后不会再取结果）
+    调用方持有 _recommender_lock
+    """
+    now = time.monotonic()
+    stale = [
+        task_id
+        for task_id, task_info in _recommender_futures.items()
+        if task_info.get('done_at') is not None and now - task_info['done_at'] > SIDE_TASK_TIMEOUT
+    ]
+    for task_id in stale:
+        del _recommender_futures[task_id]
 
 
 def start_early_recommender(state: ExcelAgentState) -> ExcelAgentState:
@@ -51,22 +64,21 @@ def start_early_recommender(state: ExcelAgentState) -> ExcelAgentState:
             return state
         
         # 创建任务ID用于跟踪
-        task_id = f"excel_{id(state)}"
+        task_id = f"excel_{state.get('side_task_group') or id(state)}"
         
         logger.info("🚀 早期启动推荐问题生成（后台并行执行）")
         
-        # 在线程池中异步执行推荐问题生成
-        executor = get_recommender_executor()
+        # 在当前节点中构建任务输入（仅包含所需字段），后续节点修改 state 不影响后台任务
+        recommender_input = side_task_input(state, QUESTION_RECOMMENDER_INPUT_KEYS)
         
         def run_recommender():
             """在线程中运行 excel_question_recommender"""
             try:
-                state_copy = deepcopy(state)
                 # excel_question_recommender 是异步函数，需要在新的事件循环中运行
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 try:
-                    result_state = loop.run_until_complete(excel_question_recommender(state_copy))
+                    result_state = loop.run_until_complete(excel_question_recommender(recommender_input))
                 finally:
                     loop.close()
                 
@@ -86,15 +98,22 @@ def start_early_recommender(state: ExcelAgentState) -> ExcelAgentState:
                         _recommender_futures[task_id]['result'] = []
                         _recommender_futures[task_id]['error'] = str(e)
         
-        future = executor.submit(run_recommender)
-        
+        # 先登记任务再提交，避免任务先于登记完成时丢失结果
         with _recommender_lock:
+            _sweep_stale_recommenders()
             _recommender_futures[task_id] = {
-                'future': future,
+                'future': None,
                 'result': [],
                 'completed': False,
-                'error': None
+                'error': None,
+                'done_at': None,
             }
+        # 推荐问题优先级最低，与总结、图表任务共用旁路任务执行器，按问答分组以便取消
+        future = submit_side_task(SIDE_TASK_RECOMMEND, run_recommender, group=state.get("side_task_group"))
+        with _recommender_lock:
+            if task_id in _recommender_futures:
+                _recommender_futures[task_id]['future'] = future
+        future.add_done_callback(lambda f: _on_recommender_done(task_id, f))
         
         # 在 state 中保存 task_id
         state["_early_recommender_task_id"] = task_id
@@ -195,7 +214,7 @@ def wait_and_merge_early_recommender(state: ExcelAgentState) -> ExcelAgentState:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                result_state = loop.run_until_complete(excel_question_recommender(deepcopy(state)))
+                result_state = loop.run_until_complete(excel_question_recommender(side_task_input(state, QUESTION_RECOMMENDER_INPUT_KEYS)))
             finally:
                 loop.close()
             if "recommended_questions" in result_state:
@@ -218,7 +237,7 @@ def wait_and_merge_early_recommender(state: ExcelAgentState) -> ExcelAgentState:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                result_state = loop.run_until_complete(excel_question_recommender(deepcopy(state)))
+                result_state = loop.run_until_complete(excel_question_recommender(side_task_input(state, QUESTION_RECOMMENDER_INPUT_KEYS)))
             finally:
                 loop.close()
             if "recommended_questions" in result_state:
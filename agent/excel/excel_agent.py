@@ -15,6 +15,7 @@ from agent.excel.excel_duckdb_manager import (
     get_chat_duckdb_manager,
 )
 from agent.excel.excel_graph import create_excel_graph
+from common.side_task_executor import cancel_side_tasks
 from constants.code_enum import DataTypeEnum
 from services.user_service import (
     add_user_record,
@@ -84,6 +85,8 @@ class ExcelAgent:
         summarize_content = ""  # 用于单独保存 summarize 信息（markdown格式）
         sql_statement = ""  # 用于保存 SQL 语句
         current_step = None
+        # 本次问答的旁路任务分组，问答结束、停止或客户端断开时取消尚未开始的旁路任务
+        side_task_group = uuid.uuid4().hex
 
         # 实现上传一次多次对话的效果 默认单轮对话取最新上传的文件
         if file_list is None or len(file_list) == 0:
@@ -105,6 +108,7 @@ class ExcelAgent:
                 execution_result=None,  # 修改：使用ExecutionResult对象
                 report_summary="",
                 render_data=None,  # 渲染数据（和数据问答一致）
+                side_task_group=side_task_group,
             )
             graph: CompiledStateGraph = self.excel_graph
 
@@ -236,6 +240,8 @@ class ExcelAgent:
             logger.error(f"表格问答智能体运行异常: {e}")
             error_msg = f"处理过程中发生错误: {str(e)}"
             await self._send_response(response, error_msg, "error")
+        finally:
+            cancel_side_tasks(side_task_group)
 
     async def _process_chunk(
         self,
@@ -927,10 +933,12 @@ class ExcelAgent:
             return "未找到执行结果"
 
         if execution_result.success:
-            row_count = len(execution_result.data) if execution_result.data else 0
+            row_count = execution_result.row_count
             column_count = (
                 len(execution_result.columns) if execution_result.columns else 0
             )
+            if execution_result.truncated:
+                return f"✅ 查询执行成功！结果超过返回上限，已截断为 {row_count} 行数据，{column_count} 列"
             return f"✅ 查询执行成功！返回 {row_count} 行数据，{column_count} 列"
         else:
             return f"❌ 查询执行失败：{execution_result.error or '未知错误'}"
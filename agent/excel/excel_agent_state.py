@@ -2,16 +2,8 @@ from typing import TypedDict, Optional, Dict, Any, List
 
 from pydantic import BaseModel
 
-
-class ExecutionResult(BaseModel):
-    """
-    sql执行结果
-    """
-
-    success: bool
-    columns: List[str]  # 表格列名
-    data: Optional[List[Dict[str, Any]]] = None  # 执行结果
-    error: Optional[str] = None
+# 与数据问答共用按列存储的 SQL 执行结果（columns + column_data，data 为按行访问的视图）
+from agent.text2sql.state.agent_state import ExecutionResult  # noqa: F401
 
 
 class FileInfo(BaseModel):
@@ -58,3 +50,6 @@ class ExcelAgentState(TypedDict):
     report_summary: Optional[str]  # 报告摘要
     render_data: Optional[Dict[str, Any]]  # 渲染数据（和数据问答一致）
     recommended_questions: Optional[List[str]]  # 推荐问题列表
+    parsed_sql: Optional[Any]  # generated_sql 的解析结果（common.sql_parse_util.ParsedSQL），各节点共享
+    side_task_group: Optional[str]  # 旁路任务分组（一次问答），用于取消总结/图表/推荐问题任务
+    _early_recommender_task_id: Optional[str]  # 早期推荐问题任务ID（未声明的键不会在节点间传递）
@@ -10,15 +10,13 @@ from decimal import Decimal
 from datetime import datetime, date
 from typing import Dict, Any, List, Optional
 
-import sqlglot
-from sqlglot import parse
-
 from agent.excel.excel_agent_state import ExcelAgentState, ExecutionResult
+from common.sql_parse_util import ParsedSQL, get_parsed_sql, get_sqlglot_dialect, parse_sql
 
 logger = logging.getLogger(__name__)
 
 # Excel 使用 DuckDB，映射到 PostgreSQL 方言
-DB_TYPE = "postgres"
+DB_TYPE = get_sqlglot_dialect("excel")
 
 
 def convert_value(v):
@@ -33,134 +31,50 @@ def convert_value(v):
         return v
 
 
-def extract_table_names_sqlglot(sql: str) -> List[str]:
+def extract_table_names_sqlglot(sql: str, parsed_sql: Optional[ParsedSQL] = None) -> List[str]:
     """
     使用 sqlglot 提取 SQL 中的所有表名
     
     Args:
         sql: SQL 语句
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     """
-    try:
-        expression = parse(sql, read=DB_TYPE)[0]
-        tables = set()
-        for table in expression.find_all(sqlglot.exp.Table):
-            tables.add(table.name)
-        return list(tables)
-    except Exception as e:
-        logger.warning(f"SQL 解析错误: {e}")
-        return []
+    parsed_sql = parsed_sql or parse_sql(sql, DB_TYPE)
+    return parsed_sql.tables
 
 
-def extract_table_alias_mapping(sql: str) -> Dict[str, str]:
+def extract_table_alias_mapping(sql: str, parsed_sql: Optional[ParsedSQL] = None) -> Dict[str, str]:
     """
     提取SQL中的表别名映射关系
     
     Args:
         sql: SQL语句
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     
     Returns:
         别名到真实表名的映射字典 {alias: table_name}
     """
-    alias_mapping = {}
-    try:
-        expressions = parse(sql, read=DB_TYPE)
-        
-        for expression in expressions:
-            if expression:
-                for table_exp in expression.find_all(sqlglot.exp.Table):
-                    if hasattr(table_exp, "alias") and table_exp.alias:
-                        alias_mapping[table_exp.alias] = table_exp.name
-                
-                for from_exp in expression.find_all(sqlglot.exp.From):
-                    if hasattr(from_exp, "expressions"):
-                        for expr in from_exp.expressions:
-                            if isinstance(expr, sqlglot.exp.Alias) and hasattr(expr.this, "name"):
-                                alias_mapping[expr.alias] = expr.this.name
-                            elif hasattr(expr, "name") and hasattr(expr, "alias") and expr.alias:
-                                alias_mapping[expr.alias] = expr.name
-                
-                for join_exp in expression.find_all(sqlglot.exp.Join):
-                    if hasattr(join_exp, "this"):
-                        join_table = join_exp.this
-                        if isinstance(join_table, sqlglot.exp.Alias) and hasattr(join_table.this, "name"):
-                            alias_mapping[join_table.alias] = join_table.this.name
-                        elif hasattr(join_table, "name") and hasattr(join_table, "alias") and join_table.alias:
-                            alias_mapping[join_table.alias] = join_table.name
-    except Exception as e:
-        logger.warning(f"提取表别名映射失败: {e}")
-    
-    return alias_mapping
+    parsed_sql = parsed_sql or parse_sql(sql, DB_TYPE)
+    return parsed_sql.alias_mapping
 
 
-def extract_select_columns(sql: str, table_alias_mapping: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+def extract_select_columns(
+    sql: str,
+    table_alias_mapping: Optional[Dict[str, str]] = None,
+    parsed_sql: Optional[ParsedSQL] = None,
+) -> List[Dict[str, Any]]:
     """
     从 SQL 中提取 SELECT 列的详细信息
     返回格式: [{"name": "column_name", "alias": "alias_name", "table": "table_name", "is_aggregate": False}, ...]
+    
+    Args:
+        sql: SQL 语句
+        table_alias_mapping: 表别名映射字典，如果提供，会将别名转换为真实表名
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     """
+    parsed_sql = parsed_sql or parse_sql(sql, DB_TYPE)
     try:
-        expressions = parse(sql, read=DB_TYPE)
-        column_info_list = []
-
-        for expression in expressions:
-            if not expression:
-                continue
-
-            selects = expression.find_all(sqlglot.exp.Select)
-            for select in selects:
-                projections = select.expressions
-                for proj in projections:
-                    col_info = {
-                        "name": "",
-                        "alias": "",
-                        "table": "",
-                        "is_aggregate": False,
-                    }
-
-                    if isinstance(proj, (sqlglot.exp.AggFunc, sqlglot.exp.Sum, sqlglot.exp.Count, sqlglot.exp.Avg, sqlglot.exp.Max, sqlglot.exp.Min)):
-                        col_info["is_aggregate"] = True
-                        col_info["name"] = str(proj)
-                    elif isinstance(proj, sqlglot.exp.Column):
-                        col_info["name"] = proj.name
-                        table_ref = proj.table or ""
-                        if table_ref and table_alias_mapping:
-                            col_info["table"] = table_alias_mapping.get(table_ref, table_ref)
-                        else:
-                            col_info["table"] = table_ref
-                    elif isinstance(proj, sqlglot.exp.Star):
-                        col_info["name"] = "*"
-                    else:
-                        col_info["name"] = str(proj)
-
-                    def clean_alias(alias_str: str) -> str:
-                        if not alias_str:
-                            return alias_str
-                        alias_str = alias_str.strip()
-                        if alias_str.startswith('`') and alias_str.endswith('`'):
-                            alias_str = alias_str[1:-1]
-                        if alias_str.startswith('"') and alias_str.endswith('"'):
-                            alias_str = alias_str[1:-1]
-                        if alias_str.startswith('[') and alias_str.endswith(']'):
-                            alias_str = alias_str[1:-1]
-                        return alias_str.strip()
-                    
-                    if isinstance(proj, sqlglot.exp.Alias):
-                        col_info["alias"] = clean_alias(proj.alias)
-                        if hasattr(proj, "this"):
-                            if isinstance(proj.this, (sqlglot.exp.AggFunc, sqlglot.exp.Sum, sqlglot.exp.Count, sqlglot.exp.Avg, sqlglot.exp.Max, sqlglot.exp.Min)):
-                                col_info["is_aggregate"] = True
-                                if isinstance(proj.this, sqlglot.exp.Column):
-                                    col_info["name"] = proj.this.name
-                                    table_ref = proj.this.table or ""
-                                    if table_ref and table_alias_mapping:
-                                        col_info["table"] = table_alias_mapping.get(table_ref, table_ref)
-                                    else:
-                                        col_info["table"] = table_ref
-                    elif hasattr(proj, "alias") and proj.alias:
-                        col_info["alias"] = clean_alias(proj.alias)
-
-                    column_info_list.append(col_info)
-
-        return column_info_list
+        return parsed_sql.get_select_columns(table_alias_mapping)
     except Exception as e:
         logger.warning(f"提取 SELECT 列信息失败: {e}")
         return []
@@ -221,7 +135,8 @@ def get_column_comment_from_schema(db_info: List[Dict[str, Any]], table_name: st
 
 def map_columns_to_comments(
     sql: str, db_info: List[Dict[str, Any]], actual_columns: List[str], 
-    chart_config: Optional[Dict[str, Any]] = None
+    chart_config: Optional[Dict[str, Any]] = None,
+    parsed_sql: Optional[ParsedSQL] = None,
 ) -> tuple:
     """
     将 SQL 查询结果的列名映射为中文注释
@@ -237,19 +152,23 @@ def map_columns_to_comments(
         db_info: 数据库信息（列表格式）
         actual_columns: 实际列名列表
         chart_config: 图表配置（可选）
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     
     Returns:
         (column_names_chinese, column_mapping)
     """
     try:
+        # SQL 只解析一次，表名、别名映射和 SELECT 列都基于同一解析结果
+        parsed_sql = parsed_sql or parse_sql(sql, DB_TYPE)
+
         # 提取表别名映射
-        table_alias_mapping = extract_table_alias_mapping(sql)
+        table_alias_mapping = extract_table_alias_mapping(sql, parsed_sql)
         
         # 提取 SELECT 列的详细信息
-        column_info_list = extract_select_columns(sql, table_alias_mapping)
+        column_info_list = extract_select_columns(sql, table_alias_mapping, parsed_sql)
         
         # 获取表名
-        table_names = extract_table_names_sqlglot(sql)
+        table_names = extract_table_names_sqlglot(sql, parsed_sql)
         
         # 从chart_config中提取映射（包括columns和axis）
         chart_config_mapping = {}
@@ -365,8 +284,7 @@ def excel_data_render_antv(state: ExcelAgentState):
             logger.warning("SQL 执行结果为空或失败,跳过数据渲染")
             return state
 
-        data: List[Dict[str, Any]] = execution_result.data
-        if not data:
+        if not execution_result.row_count:
             logger.warning("数据为空,跳过数据渲染")
             return state
 
@@ -374,8 +292,8 @@ def excel_data_render_antv(state: ExcelAgentState):
         db_info = state.get("db_info", [])
         generated_sql = state.get("generated_sql", "") or state.get("filtered_sql", "")
         
-        # 获取实际的列名(从第一条数据中提取)
-        actual_columns = list(data[0].keys()) if data else []
+        # 获取实际的列名
+        actual_columns = list(execution_result.columns)
         
         if not actual_columns:
             logger.warning("无法从数据中提取列名，跳过数据渲染")
@@ -387,20 +305,18 @@ def excel_data_render_antv(state: ExcelAgentState):
         chart_config = state.get("chart_config", {})
         
         # 映射列名为中文注释
+        parsed_sql = get_parsed_sql(state, generated_sql, DB_TYPE)
         column_names_chinese, column_mapping = map_columns_to_comments(
-            generated_sql, db_info, actual_columns, chart_config
+            generated_sql, db_info, actual_columns, chart_config, parsed_sql
         )
         
         logger.info(f"列名映射结果: 中文列名数量={len(column_names_chinese)}")
 
-        # 转换数据格式: 将英文列名映射为中文列名
-        formatted_data = []
-        for row in data:
-            formatted_row = {}
-            for col_name, value in row.items():
-                chinese_col_name = column_mapping.get(col_name, col_name)
-                formatted_row[chinese_col_name] = convert_value(value)
-            formatted_data.append(formatted_row)
+        # 转换数据格式: 将英文列名映射为中文列名（按列批量转换取值）
+        formatted_data = execution_result.to_records(
+            column_names=[column_mapping.get(col_name, col_name) for col_name in actual_columns],
+            convert_value=convert_value,
+        )
 
         # 确保 columns 字段与 formatted_data 的 key 一致
         if formatted_data and len(formatted_data) > 0:
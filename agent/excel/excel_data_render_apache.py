@@ -4,8 +4,8 @@ import traceback
 from decimal import Decimal
 
 from agent.excel.excel_agent_state import ExcelAgentState, ExecutionResult
+from common.sql_parse_util import get_parsed_sql, get_sqlglot_dialect, parse_sql
 import sqlglot
-from sqlglot import parse
 from datetime import datetime, date
 import pandas as pd
 
@@ -17,6 +17,9 @@ import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Excel 使用 DuckDB，映射到 PostgreSQL 方言（与 excel_data_render_antv 保持一致）
+DB_TYPE = get_sqlglot_dialect("excel")
+
 
 def excel_data_render_apache(state: ExcelAgentState) -> ExcelAgentState:
     """
@@ -34,13 +37,12 @@ def excel_data_render_apache(state: ExcelAgentState) -> ExcelAgentState:
         logger.warning("SQL 执行结果为空或失败,跳过数据渲染")
         return state
 
-    data = data_result.data
-    if not data:
+    if not data_result.row_count:
         logger.warning("数据为空,跳过数据渲染")
         return state
 
-    # 获取实际的列名(从第一条数据中提取)
-    actual_columns = list(data[0].keys()) if data else []
+    # 获取实际的列名
+    actual_columns = list(data_result.columns)
     
     if not actual_columns:
         logger.warning("无法从数据中提取列名，跳过数据渲染")
@@ -54,20 +56,18 @@ def excel_data_render_apache(state: ExcelAgentState) -> ExcelAgentState:
     chart_config = state.get("chart_config", {})
     
     # 映射列名为中文注释
+    parsed_sql = get_parsed_sql(state, generated_sql, DB_TYPE)
     column_names_chinese, column_mapping = map_columns_to_comments(
-        generated_sql, db_info, actual_columns, chart_config
+        generated_sql, db_info, actual_columns, chart_config, parsed_sql
     )
     
     logger.info(f"列名映射结果: 中文列名数量={len(column_names_chinese)}")
 
-    # 转换数据格式: 将英文列名映射为中文列名
-    formatted_data = []
-    for row in data:
-        formatted_row = {}
-        for col_name, value in row.items():
-            chinese_col_name = column_mapping.get(col_name, col_name)
-            formatted_row[chinese_col_name] = convert_value(value)
-        formatted_data.append(formatted_row)
+    # 转换数据格式: 将英文列名映射为中文列名（按列批量转换取值）
+    formatted_data = data_result.to_records(
+        column_names=[column_mapping.get(col_name, col_name) for col_name in actual_columns],
+        convert_value=convert_value,
+    )
 
     # 确保 columns 字段与 formatted_data 的 key 一致
     if formatted_data and len(formatted_data) > 0:
@@ -108,7 +108,7 @@ def check_if_select_all(sql: str) -> bool:
     :return: 是否为 SELECT * 查询
     """
     try:
-        expressions = parse(sql)
+        expressions = parse_sql(sql, DB_TYPE).expressions
         for expression in expressions:
             if expression:
                 selects = expression.find_all(sqlglot.exp.Select)
@@ -201,16 +201,7 @@ def extract_table_names_sqlglot(sql: str) -> list:
     :param sql: SQL 语句
     :return: 表名列表（去重）
     """
-    try:
-        expression = parse(sql)[0]
-        tables = set()
-        for table in expression.find_all(sqlglot.exp.Table):
-            # 取表名（去掉 schema）
-            tables.add(table.name)
-        return list(tables)
-    except Exception as e:
-        logger.info(f"SQL 解析错误: {e}")
-        return []
+    return parse_sql(sql, DB_TYPE).tables
 
 
 def get_column_comments(schema_inspector: list, table_name: str) -> list:
@@ -262,7 +253,7 @@ def extract_actual_column_names(sql: str) -> list:
     :return: 实际列名列表
     """
     try:
-        expressions = parse(sql)
+        expressions = parse_sql(sql, DB_TYPE).expressions
         columns = []
 
         for expression in expressions:
@@ -323,7 +314,7 @@ def extract_column_names_sqlglot(sql: str) -> list:
     :return: 列名列表
     """
     try:
-        expressions = parse(sql)
+        expressions = parse_sql(sql, DB_TYPE).expressions
         columns = []
 
         for expression in expressions:
@@ -374,7 +365,7 @@ def extract_select_columns_with_comments(sql: str, schema_inspector: list) -> li
     :return: 列标题列表（优先使用中文注释，其次使用别名或列名）
     """
     try:
-        expressions = parse(sql)
+        expressions = parse_sql(sql, DB_TYPE).expressions
         column_info_list = []
 
         # 提取表别名映射
@@ -513,39 +504,6 @@ def extract_table_alias_mapping(sql: str) -> dict:
     :param sql: SQL语句
     :return: 别名到真实表名的映射字典
     """
-    alias_mapping = {}
-    try:
-        expressions = parse(sql)
-
-        # 方法1: 直接从表表达式中提取
-        for expression in expressions:
-            if expression:
-                for table_exp in expression.find_all(sqlglot.exp.Table):
-                    if hasattr(table_exp, "alias") and table_exp.alias:
-                        alias_mapping[table_exp.alias] = table_exp.name
-
-        # 方法2: 从FROM和JOIN子句中提取
-        for expression in expressions:
-            if expression:
-                # 处理 FROM 子句
-                for from_exp in expression.find_all(sqlglot.exp.From):
-                    if hasattr(from_exp, "expressions"):
-                        for expr in from_exp.expressions:
-                            if isinstance(expr, sqlglot.exp.Alias) and hasattr(expr.this, "name"):
-                                alias_mapping[expr.alias] = expr.this.name
-                            elif hasattr(expr, "name") and hasattr(expr, "alias"):
-                                alias_mapping[expr.alias] = expr.name
-
-                # 处理 JOIN 子句
-                for join_exp in expression.find_all(sqlglot.exp.Join):
-                    if hasattr(join_exp, "this"):
-                        join_table = join_exp.this
-                        if isinstance(join_table, sqlglot.exp.Alias) and hasattr(join_table.this, "name"):
-                            alias_mapping[join_table.alias] = join_table.this.name
-                        elif hasattr(join_table, "name") and hasattr(join_table, "alias"):
-                            alias_mapping[join_table.alias] = join_table.name
-    except Exception as e:
-        logger.info(f"提取表别名映射失败: {e}")
-
+    alias_mapping = parse_sql(sql, DB_TYPE).alias_mapping
     logger.info(f"表别名映射: {alias_mapping}")
     return alias_mapping
@@ -3,20 +3,88 @@ DuckDB 连接管理器
 统一管理 Excel Agent 中的 DuckDB 连接和数据注册，避免重复创建和注册
 """
 
+import asyncio
+import csv
+import functools
+import hashlib
 import logging
+import os
 import re
+import shutil
+import tempfile
+import threading
 import time
 import traceback
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import duckdb
 import pandas as pd
+import requests
 
 from agent.excel.excel_agent_state import FileInfo, SheetInfo
+from agent.excel.excel_file_cache import get_excel_file_cache
+from common.datasource_util import DatasourceConnectionUtil
 
 logger = logging.getLogger(__name__)
 
+# 远程文件下载到本地临时文件的目录（为空时使用系统临时目录）
+EXCEL_INGEST_TEMP_DIR = os.getenv("EXCEL_INGEST_TEMP_DIR") or None
+# 下载文件时的分块大小（字节）
+EXCEL_DOWNLOAD_CHUNK_SIZE = int(os.getenv("EXCEL_DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+# 下载文件超时时间（秒）
+EXCEL_DOWNLOAD_TIMEOUT = int(os.getenv("EXCEL_DOWNLOAD_TIMEOUT", 300))
+
+# 并行解析 Sheet 的线程数
+EXCEL_SHEET_LOAD_WORKERS = int(os.getenv("EXCEL_SHEET_LOAD_WORKERS", 4))
+# 单个 Sheet 导入的最大行数，超出部分不再读取
+EXCEL_SHEET_MAX_ROWS = int(os.getenv("EXCEL_SHEET_MAX_ROWS", 1000000))
+# 单个 Sheet 导入的最大数据量（字节），超出部分不再读取
+# xlsx 按 Sheet XML 解压后大小、CSV 按文件大小判断，超过上限时改为逐行读取并按单元格文本长度截断
+EXCEL_SHEET_MAX_BYTES = int(os.getenv("EXCEL_SHEET_MAX_BYTES", 512 * 1024 * 1024))
+
+# 会话 DuckDB 数据库文件目录（每个 worker 进程一个子目录，每个 chat 一个数据库文件）
+EXCEL_DUCKDB_SESSION_DIR = os.getenv("EXCEL_DUCKDB_SESSION_DIR", "./excel_sessions")
+# 所有会话 DuckDB 连接的内存总预算（字节），按最大打开会话数平均分配为每个连接的 memory_limit
+EXCEL_DUCKDB_MEMORY_BUDGET = int(os.getenv("EXCEL_DUCKDB_MEMORY_BUDGET", 4 * 1024 * 1024 * 1024))
+# 同时保持打开的会话连接数上限，超出后按 LRU 关闭空闲会话连接（数据保留在磁盘，下次访问时重新打开）
+EXCEL_DUCKDB_MAX_OPEN_SESSIONS = int(os.getenv("EXCEL_DUCKDB_MAX_OPEN_SESSIONS", 16))
+# 会话连接空闲多久后释放内存（秒）
+EXCEL_DUCKDB_IDLE_RELEASE_SECONDS = int(os.getenv("EXCEL_DUCKDB_IDLE_RELEASE_SECONDS", 600))
+# 会话过期时间（秒），过期后删除会话数据库文件
+EXCEL_DUCKDB_SESSION_TIMEOUT = int(os.getenv("EXCEL_DUCKDB_SESSION_TIMEOUT", 36000))
+# 后台清理任务执行间隔（秒）
+EXCEL_DUCKDB_SWEEP_INTERVAL = int(os.getenv("EXCEL_DUCKDB_SWEEP_INTERVAL", 60))
+
+# 查询结果最多返回的行数 / 估算字节数，超出部分不再拉取（结果标记为已截断）
+EXCEL_SQL_RESULT_MAX_ROWS = int(os.getenv("EXCEL_SQL_RESULT_MAX_ROWS", 10000))
+EXCEL_SQL_RESULT_MAX_BYTES = int(os.getenv("EXCEL_SQL_RESULT_MAX_BYTES", 64 * 1024 * 1024))
+
+# 列统计：不同取值数不超过该值的文本列记录高频取值
+EXCEL_PROFILE_TOPK_MAX_DISTINCT = int(os.getenv("EXCEL_PROFILE_TOPK_MAX_DISTINCT", 50))
+# 列统计：每列记录的高频取值个数
+EXCEL_PROFILE_TOPK = int(os.getenv("EXCEL_PROFILE_TOPK", 10))
+# 列统计：取值文本的最大长度
+EXCEL_PROFILE_VALUE_MAX_LENGTH = 50
+
+# DuckDB excel 扩展是否可用（进程内只探测一次；需预先在镜像中执行 INSTALL excel）
+_excel_extension_available: Optional[bool] = None
+
+
+def _synchronized(func):
+    """使用管理器锁串行化对 DuckDB 主连接的访问，避免连接在使用中被 LRU 回收"""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
 
 class ExcelDuckDBManager:
     """
@@ -26,19 +94,41 @@ class ExcelDuckDBManager:
     - 支持多文件、多Sheet的数据管理
     """
 
-    def __init__(self):
+    def __init__(self, database_path: Optional[str] = None, memory_limit: Optional[int] = None):
+        """
+        :param database_path: DuckDB 数据库文件路径，为空时使用内存数据库
+        :param memory_limit: 连接内存上限（字节），超出部分溢写到临时目录
+        """
         self._connection: Optional[duckdb.DuckDBPyConnection] = None
+        self._database_path = database_path
+        self._memory_limit = memory_limit
+        self._lock = threading.RLock()
         self._registered_catalogs: Dict[str, str] = {}  # {catalog_name: file_path}
         self._registered_tables: Dict[str, SheetInfo] = {}  # {table_name: SheetInfo}
+        # {source_key: (etag, catalog_name, {table_name: SheetInfo})}，用于追问时复用已注册的文件
+        self._registered_sources: Dict[str, Tuple[str, str, Dict[str, SheetInfo]]] = {}
+        # {source_key: [parquet 文件路径]}，从解析结果缓存创建视图的文件，视图依赖这些文件存在
+        self._cached_source_files: Dict[str, List[str]] = {}
         self._session_id: str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._last_used: float = time.time()
 
     def _get_connection(self) -> duckdb.DuckDBPyConnection:
         """
-        获取 DuckDB 连接，延迟初始化
+        获取 DuckDB 连接，延迟初始化（基于文件的会话被回收后再次访问时重新打开，已注册的表仍在磁盘上）
         """
+        self._last_used = time.time()
         if self._connection is None:
-            logger.info("创建新的 DuckDB 连接")
-            self._connection = duckdb.connect(database=":memory:")
+            config = {}
+            if self._memory_limit:
+                config["memory_limit"] = f"{max(self._memory_limit // (1024 * 1024), 64)}MB"
+            if self._database_path:
+                os.makedirs(os.path.dirname(self._database_path) or ".", exist_ok=True)
+                config["temp_directory"] = f"{self._database_path}.tmp"
+                logger.info(f"打开 DuckDB 会话数据库: {self._database_path}")
+                self._connection = duckdb.connect(database=self._database_path, config=config)
+            else:
+                logger.info("创建新的 DuckDB 连接")
+                self._connection = duckdb.connect(database=":memory:", config=config)
 
             # 安装并加载必要的扩展
             # self._connection.execute("INSTALL httpfs")
@@ -91,6 +181,346 @@ class ExcelDuckDBManager:
             col_name = f"column_{col_name}"
         return col_name or "unknown_column"
 
+    def _build_column_aliases(self, source_columns: List[str]) -> List[str]:
+        """
+        生成清理后的列名（重复列名追加 _1、_2 后缀）
+        """
+        aliases = []
+        used = set()
+        for column in source_columns:
+            alias = self._sanitize_column_name(column)
+            candidate = alias
+            counter = 1
+            while candidate.lower() in used:
+                candidate = f"{alias}_{counter}"
+                counter += 1
+            used.add(candidate.lower())
+            aliases.append(candidate)
+        return aliases
+
+    @contextmanager
+    def _local_file(self, file_path: str, suffix: str) -> Iterator[str]:
+        """
+        获取文件的本地路径：本地文件直接返回，URL 流式下载到临时文件，使用结束后删除
+        """
+        if os.path.isfile(file_path):
+            yield file_path
+            return
+
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=EXCEL_INGEST_TEMP_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with requests.get(file_path, stream=True, timeout=EXCEL_DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=EXCEL_DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            yield temp_path
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _create_table_from_source(
+        self,
+        source_sql: str,
+        catalog_name: str,
+        sheet_name: str,
+        conn: Optional[duckdb.DuckDBPyConnection] = None,
+    ) -> Optional[SheetInfo]:
+        """
+        使用 DuckDB 原生读取函数（read_csv_auto / read_xlsx）直接建表，列名清理在 SQL 中完成
+        只建表不登记，调用方负责写入 _registered_tables（便于多线程并行建表后按 Sheet 顺序登记）
+
+        :param source_sql: 数据源表达式，如 read_csv_auto('/tmp/a.csv')
+        :param catalog_name: 目标 catalog 名称
+        :param sheet_name: Sheet 名称（CSV 为文件名）
+        :param conn: DuckDB 连接（多线程时传入各自的 cursor），为空时使用主连接
+        :return: SheetInfo，空表时返回 None
+        """
+        conn = conn or self._get_connection()
+        table_name = self._sanitize_table_name(sheet_name)
+        full_table_name = f'"{catalog_name}"."{table_name}"'
+
+        source_columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source_sql}").fetchall()]
+        if not source_columns:
+            logger.warning(f"表 '{sheet_name}' 为空，跳过注册")
+            return None
+
+        aliases = self._build_column_aliases(source_columns)
+        select_list = ", ".join(
+            f'{self._quote_identifier(column)} AS {self._quote_identifier(alias)}'
+            for column, alias in zip(source_columns, aliases)
+        )
+        # LIMIT 下推到读取函数，超过单 Sheet 行数上限时提前停止读取
+        conn.execute(
+            f"CREATE TABLE {full_table_name} AS SELECT {select_list} FROM {source_sql} LIMIT {EXCEL_SHEET_MAX_ROWS}"
+        )
+
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {full_table_name}").fetchone()[0]
+        if row_count >= EXCEL_SHEET_MAX_ROWS:
+            logger.warning(f"表 '{sheet_name}' 超过 {EXCEL_SHEET_MAX_ROWS} 行，仅导入前 {EXCEL_SHEET_MAX_ROWS} 行")
+        if row_count == 0:
+            logger.warning(f"表 '{sheet_name}' 为空，跳过注册")
+            conn.execute(f"DROP TABLE IF EXISTS {full_table_name}")
+            return None
+
+        # 获取列信息
+        columns_info = {}
+        for column_name, column_type, *_ in conn.execute(f"DESCRIBE {full_table_name}").fetchall():
+            columns_info[column_name] = {"comment": column_name, "type": self._map_duckdb_type_to_sql(column_type)}
+
+        # 列统计信息（不同取值数、最值、空值比例、高频取值）
+        self._profile_table(conn, full_table_name, columns_info)
+
+        # 获取样本数据（前5行）
+        cursor = conn.execute(f"SELECT * FROM {full_table_name} LIMIT 5")
+        sample_columns = [description[0] for description in cursor.description]
+        sample_data = [dict(zip(sample_columns, row)) for row in cursor.fetchall()]
+
+        sheet_info = SheetInfo(
+            sheet_name=sheet_name,
+            table_name=table_name,
+            catalog_name=catalog_name,
+            row_count=row_count,
+            column_count=len(columns_info),
+            columns_info=columns_info,
+            sample_data=sample_data,
+        )
+        logger.debug(f"  注册表: {full_table_name} ({row_count} 行, {len(columns_info)} 列)")
+        return sheet_info
+
+    def _profile_table(self, conn: duckdb.DuckDBPyConnection, full_table_name: str, columns_info: Dict) -> None:
+        """
+        使用 DuckDB SUMMARIZE 一次扫描计算各列统计信息，并为低基数文本列统计高频取值，结果写入 columns_info
+        写入字段：distinct_count（近似）、null_ratio、min、max、top_values（仅低基数文本列）
+        统计失败不影响表注册
+        """
+        try:
+            cursor = conn.execute(f"SUMMARIZE {full_table_name}")
+            field_names = [description[0] for description in cursor.description]
+            summaries = [dict(zip(field_names, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.warning(f"统计表 {full_table_name} 列信息失败: {str(e)[:200]}")
+            return
+
+        def clip(value):
+            if value is None:
+                return None
+            value = str(value)
+            return value if len(value) <= EXCEL_PROFILE_VALUE_MAX_LENGTH else value[:EXCEL_PROFILE_VALUE_MAX_LENGTH] + "..."
+
+        topk_columns = []
+        for summary in summaries:
+            column_info = columns_info.get(summary["column_name"])
+            if column_info is None:
+                continue
+            distinct_count = int(summary.get("approx_unique") or 0)
+            column_info["distinct_count"] = distinct_count
+            column_info["null_ratio"] = round(float(summary.get("null_percentage") or 0) / 100, 4)
+            column_info["min"] = clip(summary.get("min"))
+            column_info["max"] = clip(summary.get("max"))
+            if summary["column_type"] == "VARCHAR" and 0 < distinct_count <= EXCEL_PROFILE_TOPK_MAX_DISTINCT:
+                topk_columns.append(summary["column_name"])
+
+        if not topk_columns:
+            return
+        # 所有低基数列的高频取值合并为一条查询
+        topk_sql = " UNION ALL ".join(
+            f"SELECT * FROM (SELECT {self._quote_literal(column)} AS column_name, "
+            f"{self._quote_identifier(column)}::VARCHAR AS value, COUNT(*) AS cnt FROM {full_table_name} "
+            f"WHERE {self._quote_identifier(column)} IS NOT NULL GROUP BY 2 ORDER BY 3 DESC, 2 LIMIT {EXCEL_PROFILE_TOPK})"
+            for column in topk_columns
+        )
+        try:
+            for column, value, _ in conn.execute(topk_sql).fetchall():
+                columns_info[column].setdefault("top_values", []).append(clip(value))
+        except Exception as e:
+            logger.warning(f"统计表 {full_table_name} 高频取值失败: {str(e)[:200]}")
+
+    @staticmethod
+    def _quote_identifier(name: str) -> str:
+        return '"' + str(name).replace('"', '""') + '"'
+
+    @staticmethod
+    def _quote_literal(value: str) -> str:
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _load_excel_extension(self) -> bool:
+        """
+        加载 DuckDB excel 扩展（read_xlsx），不可用时返回 False，后续走 openpyxl 流式读取
+        """
+        global _excel_extension_available
+        if _excel_extension_available is False:
+            return False
+        try:
+            self._get_connection().execute("LOAD excel")
+            _excel_extension_available = True
+        except Exception as e:
+            logger.info(f"DuckDB excel 扩展不可用，使用 openpyxl 流式读取: {str(e)[:100]}")
+            _excel_extension_available = False
+        return _excel_extension_available
+
+    def _xlsx_sheet_to_csv(self, worksheet, csv_path: str, sheet_name: str) -> bool:
+        """
+        使用 openpyxl 只读模式逐行读取 Sheet 并写入临时 CSV，避免整表加载到内存
+        超过单 Sheet 行数 / 数据量上限时停止读取
+
+        :return: 是否包含表头
+        """
+        has_header = False
+        row_count = 0
+        byte_count = 0
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            for row in worksheet.iter_rows(values_only=True):
+                if not has_header:
+                    if row is None:
+                        continue
+                    # 与 pandas 一致：空表头命名为 Unnamed: {i}
+                    writer.writerow(
+                        [f"Unnamed: {idx}" if value is None else value for idx, value in enumerate(row)]
+                    )
+                    has_header = True
+                    continue
+                # 跳过完全为空的行
+                if all(value is None for value in row):
+                    continue
+                if row_count >= EXCEL_SHEET_MAX_ROWS or byte_count >= EXCEL_SHEET_MAX_BYTES:
+                    logger.warning(
+                        f"表 '{sheet_name}' 超过导入上限（{EXCEL_SHEET_MAX_ROWS} 行 / {EXCEL_SHEET_MAX_BYTES} 字节），"
+                        f"仅导入前 {row_count} 行"
+                    )
+                    break
+                writer.writerow(["" if value is None else value for value in row])
+                row_count += 1
+                byte_count += sum(len(str(value)) + 1 for value in row if value is not None)
+        return has_header
+
+    def _csv_head_to_csv(self, source_path: str, csv_path: str, sheet_name: str):
+        """
+        逐行读取超过数据量上限的 CSV，将上限内的行写入临时 CSV（保留原始表头行）
+        超过单表行数 / 数据量上限时停止读取
+        """
+        row_count = 0
+        byte_count = 0
+        with open(source_path, "r", encoding="utf-8-sig", errors="replace", newline="") as src:
+            try:
+                dialect = csv.Sniffer().sniff(src.read(64 * 1024), delimiters=",\t;|")
+            except csv.Error:
+                dialect = csv.excel
+            src.seek(0)
+            with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                for row in csv.reader(src, dialect):
+                    # 表头行之外的行计入上限
+                    if row_count > EXCEL_SHEET_MAX_ROWS or byte_count >= EXCEL_SHEET_MAX_BYTES:
+                        logger.warning(
+                            f"表 '{sheet_name}' 超过导入上限（{EXCEL_SHEET_MAX_ROWS} 行 / {EXCEL_SHEET_MAX_BYTES} 字节），"
+                            f"仅导入前 {row_count - 1} 行"
+                        )
+                        break
+                    writer.writerow(row)
+                    row_count += 1
+                    byte_count += sum(len(value) + 1 for value in row)
+
+    @staticmethod
+    def _xlsx_sheet_xml_size(worksheet, local_path: str) -> Optional[int]:
+        """
+        Sheet XML 解压后的大小（字节），无法确定时返回 None
+        """
+        worksheet_path = getattr(worksheet, "_worksheet_path", None)
+        if not worksheet_path:
+            return None
+        try:
+            with zipfile.ZipFile(local_path) as archive:
+                return archive.getinfo(worksheet_path.lstrip("/")).file_size
+        except (KeyError, OSError, zipfile.BadZipFile):
+            return None
+
+    def _load_xlsx_sheet(
+        self, workbook, local_path: str, catalog_name: str, sheet_name: str, use_extension: bool
+    ) -> Optional[SheetInfo]:
+        """
+        导入单个 Sheet（在线程池中执行，使用独立的 DuckDB cursor）
+        优先使用 DuckDB excel 扩展 read_xlsx，不可用或失败时使用 openpyxl 流式转换为 CSV 后 read_csv_auto 导入；
+        read_xlsx 不能按数据量截断，Sheet XML 超过（或无法确定是否超过）EXCEL_SHEET_MAX_BYTES 时也使用 openpyxl
+        """
+        conn = self._get_connection().cursor()
+        try:
+            if use_extension:
+                xml_size = self._xlsx_sheet_xml_size(workbook[sheet_name], local_path)
+                if xml_size is None or xml_size > EXCEL_SHEET_MAX_BYTES:
+                    logger.info(f"Sheet '{sheet_name}' 数据量超过上限或无法确定，使用 openpyxl 按上限读取")
+                    use_extension = False
+            if use_extension:
+                try:
+                    source_sql = (
+                        f"read_xlsx({self._quote_literal(local_path)}, "
+                        f"sheet = {self._quote_literal(sheet_name)}, header = true)"
+                    )
+                    return self._create_table_from_source(source_sql, catalog_name, sheet_name, conn)
+                except Exception as e:
+                    logger.warning(f"read_xlsx 读取 Sheet '{sheet_name}' 失败，改用 openpyxl: {str(e)[:200]}")
+
+            fd, csv_path = tempfile.mkstemp(suffix=".csv", dir=EXCEL_INGEST_TEMP_DIR)
+            os.close(fd)
+            try:
+                if not self._xlsx_sheet_to_csv(workbook[sheet_name], csv_path, sheet_name):
+                    logger.warning(f"表 '{sheet_name}' 为空，跳过注册")
+                    return None
+                source_sql = f"read_csv_auto({self._quote_literal(csv_path)}, header = true)"
+                return self._create_table_from_source(source_sql, catalog_name, sheet_name, conn)
+            finally:
+                os.remove(csv_path)
+        except Exception as e:
+            logger.error(f"注册表 '{sheet_name}' 失败: {str(e)}")
+            traceback.print_exception(e)
+            return None
+        finally:
+            conn.close()
+
+    def _register_xlsx_sheets(self, local_path: str, catalog_name: str) -> Dict[str, SheetInfo]:
+        """
+        将 xlsx 文件的所有 Sheet 导入 DuckDB：工作簿只打开一次，各 Sheet 在线程池中并行解析导入，
+        完成后按 Sheet 原始顺序登记
+        """
+        from openpyxl import load_workbook
+
+        use_extension = self._load_excel_extension()
+        workbook = load_workbook(local_path, read_only=True, data_only=True)
+        try:
+            # 清理后表名重复的 Sheet 只导入第一个
+            sheet_names = []
+            table_names = set()
+            for sheet_name in workbook.sheetnames:
+                table_name = self._sanitize_table_name(sheet_name)
+                if table_name in table_names or f'"{catalog_name}"."{table_name}"' in self._registered_tables:
+                    logger.warning(f"表 '{catalog_name}.{table_name}' 已存在，跳过注册")
+                    continue
+                table_names.add(table_name)
+                sheet_names.append(sheet_name)
+
+            if not sheet_names:
+                return {}
+            max_workers = max(1, min(EXCEL_SHEET_LOAD_WORKERS, len(sheet_names)))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="excel-sheet") as executor:
+                results = list(
+                    executor.map(
+                        lambda name: self._load_xlsx_sheet(workbook, local_path, catalog_name, name, use_extension),
+                        sheet_names,
+                    )
+                )
+        finally:
+            workbook.close()
+
+        registered_tables = {}
+        for sheet_info in results:
+            if sheet_info:
+                registered_tables[sheet_info.table_name] = sheet_info
+                self._registered_tables[f'"{catalog_name}"."{sheet_info.table_name}"'] = sheet_info
+        return registered_tables
+
     def _register_dataframes_to_catalog(
         self, dataframes: List[Tuple[str, pd.DataFrame]], catalog_name: str, file_name: str
     ) -> Dict[str, SheetInfo]:
@@ -141,6 +571,9 @@ class ExcelDuckDBManager:
                     sql_type = self._map_pandas_dtype_to_sql(dtype)
                     columns_info[col] = {"comment": col, "type": sql_type}
 
+                # 列统计信息（不同取值数、最值、空值比例、高频取值）
+                self._profile_table(conn, full_table_name, columns_info)
+
                 # 获取样本数据（前5行）
                 sample_data = df.head(5).to_dict("records")
 
@@ -185,6 +618,7 @@ class ExcelDuckDBManager:
 
         return catalog_name
 
+    @_synchronized
     def register_excel_file(self, file_path: str, file_name: str) -> Tuple[str, Dict[str, SheetInfo]]:
         """
         注册 Excel 文件到 DuckDB，返回 catalog 名称和表信息
@@ -197,18 +631,18 @@ class ExcelDuckDBManager:
         logger.info(f"开始注册Excel文件到 catalog '{catalog_name}': {file_name}")
 
         try:
-            # 读取 Excel 文件的所有 sheet
-            excel_file_data = pd.ExcelFile(file_path)
-            sheet_names = excel_file_data.sheet_names
-
-            # 构建数据框列表
-            dataframes = []
-            for sheet_name in sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                dataframes.append((sheet_name, df))
-
-            # 注册到 catalog
-            registered_tables = self._register_dataframes_to_catalog(dataframes, catalog_name, file_name)
+            if file_name.lower().endswith(".xls"):
+                # 旧版 xls 格式 DuckDB / openpyxl 均不支持，仍通过 pandas 读取
+                excel_file_data = pd.ExcelFile(file_path)
+                dataframes = [
+                    (sheet_name, excel_file_data.parse(sheet_name, nrows=EXCEL_SHEET_MAX_ROWS))
+                    for sheet_name in excel_file_data.sheet_names
+                ]
+                registered_tables = self._register_dataframes_to_catalog(dataframes, catalog_name, file_name)
+            else:
+                self._get_connection().execute(f"CREATE SCHEMA IF NOT EXISTS {catalog_name}")
+                with self._local_file(file_path, ".xlsx") as local_path:
+                    registered_tables = self._register_xlsx_sheets(local_path, catalog_name)
 
             # 记录 catalog 信息
             self._registered_catalogs[catalog_name] = file_path
@@ -223,6 +657,7 @@ class ExcelDuckDBManager:
 
         return catalog_name, registered_tables
 
+    @_synchronized
     def register_csv_file(self, file_path: str, file_name: str) -> Tuple[str, Dict[str, SheetInfo]]:
         """
         注册 CSV 文件到 DuckDB
@@ -235,21 +670,32 @@ class ExcelDuckDBManager:
         logger.info(f"开始注册CSV文件到 catalog '{catalog_name}': {file_name}")
 
         try:
-            # 读取 CSV 文件
-            df = pd.read_csv(file_path)
-
-            if df.empty:
-                logger.warning(f"CSV文件 '{file_name}' 为空")
-                return catalog_name, {}
-
             # 生成表名（使用文件名去掉扩展名）
             table_name = self._sanitize_table_name(file_name.rsplit(".", 1)[0])
 
-            # 构建数据框列表
-            dataframes = [(table_name, df)]
+            # 使用 DuckDB read_csv_auto 并行读取并推断类型，直接建表
+            registered_tables = {}
+            self._get_connection().execute(f"CREATE SCHEMA IF NOT EXISTS {catalog_name}")
+            with self._local_file(file_path, ".csv") as local_path:
+                if os.path.getsize(local_path) <= EXCEL_SHEET_MAX_BYTES:
+                    source_sql = f"read_csv_auto({self._quote_literal(local_path)})"
+                    sheet_info = self._create_table_from_source(source_sql, catalog_name, table_name)
+                else:
+                    # 超过数据量上限：先截取上限内的行，再由 read_csv_auto 推断类型建表
+                    fd, csv_path = tempfile.mkstemp(suffix=".csv", dir=EXCEL_INGEST_TEMP_DIR)
+                    os.close(fd)
+                    try:
+                        self._csv_head_to_csv(local_path, csv_path, file_name)
+                        source_sql = f"read_csv_auto({self._quote_literal(csv_path)})"
+                        sheet_info = self._create_table_from_source(source_sql, catalog_name, table_name)
+                    finally:
+                        os.remove(csv_path)
 
-            # 注册到 catalog
-            registered_tables = self._register_dataframes_to_catalog(dataframes, catalog_name, file_name)
+            if not sheet_info:
+                logger.warning(f"CSV文件 '{file_name}' 为空")
+                return catalog_name, {}
+            registered_tables[table_name] = sheet_info
+            self._registered_tables[f'"{catalog_name}"."{table_name}"'] = sheet_info
 
             # 记录 catalog 信息
             self._registered_catalogs[catalog_name] = file_path
@@ -262,6 +708,156 @@ class ExcelDuckDBManager:
 
         return catalog_name, registered_tables
 
+    @_synchronized
+    def register_file(
+        self,
+        file_path: str,
+        file_name: str,
+        extension: str,
+        source_key: Optional[str] = None,
+        etag: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, SheetInfo]]:
+        """
+        注册表格文件：优先使用按 object_key + ETag 缓存的解析结果（仅创建指向 Parquet 的视图），
+        未命中时解析文件并写入缓存
+
+        :param file_path: 文件路径或URL
+        :param file_name: 文件名
+        :param extension: 文件扩展名（xlsx / xls / csv）
+        :param source_key: MinIO object_key（为空时不使用缓存）
+        :param etag: 对象 ETag（为空时不使用缓存）
+        :return: (catalog_name, {table_name: SheetInfo})
+        """
+        cache = get_excel_file_cache()
+        if source_key and etag:
+            manifest = cache.get(source_key, etag)
+            if manifest:
+                catalog_name, registered_tables = self._attach_cached_file(manifest, file_path, file_name)
+                self._registered_sources[source_key] = (etag, catalog_name, registered_tables)
+                self._cached_source_files[source_key] = [sheet["file"] for sheet in manifest.get("sheets", [])]
+                return catalog_name, registered_tables
+
+        if extension == "csv":
+            catalog_name, registered_tables = self.register_csv_file(file_path, file_name)
+        else:
+            catalog_name, registered_tables = self.register_excel_file(file_path, file_name)
+
+        if source_key and etag:
+            self._registered_sources[source_key] = (etag, catalog_name, registered_tables)
+            self._cached_source_files.pop(source_key, None)
+        if source_key and etag and registered_tables:
+            cache.put(
+                source_key,
+                etag,
+                self._get_connection(),
+                [
+                    {
+                        "full_table_name": f'"{catalog_name}"."{table_name}"',
+                        **sheet_info.model_dump(exclude={"catalog_name"}),
+                    }
+                    for table_name, sheet_info in registered_tables.items()
+                ],
+            )
+        return catalog_name, registered_tables
+
+    def _is_source_alive(self, source_key: str) -> bool:
+        """
+        已注册文件的数据是否仍可用：从缓存创建的视图依赖缓存中的 Parquet 文件，
+        文件存在时刷新缓存条目的访问时间（避免被淘汰）；直接导入的表数据在会话数据库中，始终可用
+        """
+        files = self._cached_source_files.get(source_key)
+        if files is None:
+            return True
+        if all(os.path.exists(path) for path in files):
+            return get_excel_file_cache().touch(source_key, self._registered_sources[source_key][0])
+        return False
+
+    def _drop_registered_source(self, source_key: str):
+        """删除已注册文件的 catalog 及登记信息"""
+        entry = self._registered_sources.pop(source_key, None)
+        self._cached_source_files.pop(source_key, None)
+        if not entry:
+            return
+        catalog_name = entry[1]
+        try:
+            self._get_connection().execute(f'DROP SCHEMA IF EXISTS "{catalog_name}" CASCADE')
+        except Exception as e:
+            logger.warning(f"删除 catalog 失败: {catalog_name}, 错误: {str(e)}")
+        self._registered_catalogs.pop(catalog_name, None)
+        for full_table_name in [
+            name for name, info in self._registered_tables.items() if info.catalog_name == catalog_name
+        ]:
+            del self._registered_tables[full_table_name]
+
+    @_synchronized
+    def has_same_sources(self, source_etags: Dict[str, Optional[str]]) -> bool:
+        """
+        当前会话已注册的文件是否与给定文件列表（object_key -> ETag）完全一致且数据仍可用
+        ETag 获取失败时无法判断文件是否变化，视为不一致
+        """
+        if not source_etags or any(not etag for etag in source_etags.values()):
+            return False
+        registered = {source_key: entry[0] for source_key, entry in self._registered_sources.items()}
+        if registered != source_etags:
+            return False
+        missing = [source_key for source_key in registered if not self._is_source_alive(source_key)]
+        if missing:
+            logger.warning(f"已注册文件的缓存数据已被删除，需要重新注册: {missing}")
+            return False
+        return True
+
+    @_synchronized
+    def get_registered_source(
+        self, source_key: str, etag: Optional[str]
+    ) -> Optional[Tuple[str, Dict[str, SheetInfo]]]:
+        """
+        获取当前会话中已注册的文件（ETag 一致且数据仍可用时），返回 (catalog_name, {table_name: SheetInfo})
+        缓存数据已被删除时移除失效的视图，返回 None 以便重新注册
+        """
+        entry = self._registered_sources.get(source_key)
+        if not entry or not etag or entry[0] != etag:
+            return None
+        if not self._is_source_alive(source_key):
+            logger.warning(f"已注册文件的缓存数据已被删除，重新注册: {source_key}")
+            self._drop_registered_source(source_key)
+            return None
+        return entry[1], entry[2]
+
+    def _attach_cached_file(
+        self, manifest: Dict, file_path: str, file_name: str
+    ) -> Tuple[str, Dict[str, SheetInfo]]:
+        """
+        将缓存的 Parquet 以视图形式注册到新的 catalog（不读取数据）
+        """
+        conn = self._get_connection()
+        catalog_name = self._get_unique_catalog_name(file_name)
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS {catalog_name}")
+
+        registered_tables = {}
+        for sheet in manifest.get("sheets", []):
+            table_name = sheet["table_name"]
+            full_table_name = f'"{catalog_name}"."{table_name}"'
+            if full_table_name in self._registered_tables:
+                continue
+            parquet_path = sheet["file"].replace("'", "''")
+            conn.execute(f"CREATE VIEW {full_table_name} AS SELECT * FROM read_parquet('{parquet_path}')")
+
+            sheet_info = SheetInfo(
+                sheet_name=sheet["sheet_name"],
+                table_name=table_name,
+                catalog_name=catalog_name,
+                row_count=sheet["row_count"],
+                column_count=sheet["column_count"],
+                columns_info=sheet["columns_info"],
+                sample_data=sheet.get("sample_data"),
+            )
+            registered_tables[table_name] = sheet_info
+            self._registered_tables[full_table_name] = sheet_info
+
+        self._registered_catalogs[catalog_name] = file_path
+        logger.info(f"命中表格解析缓存: {file_name} -> catalog '{catalog_name}' ({len(registered_tables)} 个表)")
+        return catalog_name, registered_tables
+
     def _extract_table_names_from_sql(self, sql: str) -> List[str]:
         """
         从SQL语句中提取表名
@@ -472,6 +1068,21 @@ class ExcelDuckDBManager:
         :param sql: SQL 查询语句
         :return: (columns, data)
         """
+        columns, column_data, _ = self.execute_sql_columnar(sql)
+        return columns, [dict(zip(columns, row)) for row in zip(*column_data)]
+
+    @_synchronized
+    def execute_sql_columnar(
+        self, sql: str, max_rows: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> Tuple[List[str], List[List[Any]], bool]:
+        """
+        执行 SQL 查询，分批拉取并按列存储结果，超过行数 / 字节上限时停止拉取
+
+        :param sql: SQL 查询语句
+        :param max_rows: 最多返回行数，默认 EXCEL_SQL_RESULT_MAX_ROWS
+        :param max_bytes: 结果集估算字节数上限，默认 EXCEL_SQL_RESULT_MAX_BYTES
+        :return: (columns, column_data, truncated)
+        """
         conn = self._get_connection()
 
         try:
@@ -528,15 +1139,20 @@ class ExcelDuckDBManager:
                     logger.debug(f"SQL执行失败（非表不存在错误），直接抛出")
                     raise first_error
 
-            # 获取列名称和查询结果的数据行
+            # 获取列名称，分批拉取结果并按列存储（不逐行构造字典）
             columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
-
-            # 构建结果字典
-            result = [dict(zip(columns, row)) for row in rows]
+            column_data, truncated = DatasourceConnectionUtil.fetch_bounded_columnar(
+                cursor.fetchmany,
+                columns,
+                max_rows=EXCEL_SQL_RESULT_MAX_ROWS if max_rows is None else max_rows,
+                max_bytes=EXCEL_SQL_RESULT_MAX_BYTES if max_bytes is None else max_bytes,
+            )
+            row_count = len(column_data[0]) if column_data else 0
 
-            logger.info(f"SQL查询执行成功: 返回 {len(result)} 行数据, {len(columns)} 列")
-            return columns, result
+            if truncated:
+                logger.warning(f"SQL查询结果超过返回上限，已截断为 {row_count} 行")
+            logger.info(f"SQL查询执行成功: 返回 {row_count} 行数据, {len(columns)} 列")
+            return columns, column_data, truncated
 
         except Exception as e:
             error_msg = str(e)
@@ -590,15 +1206,41 @@ class ExcelDuckDBManager:
 
         return schema_info
 
+    @property
+    def is_connected(self) -> bool:
+        return self._connection is not None
+
+    @property
+    def last_used(self) -> float:
+        return self._last_used
+
+    @_synchronized
     def close(self):
         """
-        关闭 DuckDB 连接
+        关闭 DuckDB 连接（基于文件的会话数据保留在磁盘上）
         """
         if self._connection is not None:
             self._connection.close()
             self._connection = None
             logger.info("DuckDB 连接已关闭")
 
+    def release_if_idle(self) -> bool:
+        """
+        连接空闲（未在执行注册 / 查询）时关闭连接释放内存，仅用于基于文件的会话
+
+        :return: 是否已释放
+        """
+        if not self._database_path or self._connection is None:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self.close()
+            return True
+        finally:
+            self._lock.release()
+
+    @_synchronized
     def clear_registered_tables(self):
         """
         清理已注册的表（删除DuckDB中的表，但保持连接）
@@ -612,32 +1254,65 @@ class ExcelDuckDBManager:
             conn = self._get_connection()
             table_count = len(self._registered_tables)
             
-            for full_table_name in list(self._registered_tables.keys()):
+            # 删除 catalog 对应的 schema（同时删除其中的表和缓存视图）
+            for catalog_name in list(self._registered_catalogs.keys()):
                 try:
-                    # 删除表
-                    drop_sql = f"DROP TABLE IF EXISTS {full_table_name}"
-                    conn.execute(drop_sql)
-                    logger.debug(f"已删除表: {full_table_name}")
+                    conn.execute(f'DROP SCHEMA IF EXISTS "{catalog_name}" CASCADE')
+                    logger.debug(f"已删除 catalog: {catalog_name}")
                 except Exception as e:
-                    logger.warning(f"删除表失败: {full_table_name}, 错误: {str(e)}")
+                    logger.warning(f"删除 catalog 失败: {catalog_name}, 错误: {str(e)}")
             
             # 清理管理器中的注册信息
             self._registered_tables.clear()
             self._registered_catalogs.clear()
+            self._registered_sources.clear()
+            self._cached_source_files.clear()
             logger.info(f"已清理 {table_count} 个已注册的表")
         except Exception as e:
             logger.error(f"清理已注册表时出错: {str(e)}")
             raise
 
+    @_synchronized
     def clear_session(self):
         """
-        清理当前会话数据
+        清理当前会话数据（同时删除会话数据库文件）
         """
         self.close()
         self._registered_catalogs.clear()
         self._registered_tables.clear()
+        self._registered_sources.clear()
+        self._cached_source_files.clear()
+        if self._database_path:
+            for path in (self._database_path, f"{self._database_path}.wal"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除会话数据库文件失败: {path}, {e}")
+            shutil.rmtree(f"{self._database_path}.tmp", ignore_errors=True)
         logger.info(f"会话 {self._session_id} 数据已清理")
 
+    def _map_duckdb_type_to_sql(self, duckdb_type: str) -> str:
+        """
+        将 DuckDB 数据类型映射到 SQL 数据类型（与 pandas 类型映射结果保持一致）
+        """
+        duckdb_type = str(duckdb_type).upper()
+        if duckdb_type in ("BIGINT", "HUGEINT", "UBIGINT"):
+            return "BIGINT"
+        elif duckdb_type in ("INTEGER", "SMALLINT", "TINYINT", "UINTEGER", "USMALLINT", "UTINYINT"):
+            return "INTEGER"
+        elif duckdb_type in ("DOUBLE", "FLOAT", "REAL") or duckdb_type.startswith("DECIMAL"):
+            return "FLOAT"
+        elif duckdb_type == "BOOLEAN":
+            return "BOOLEAN"
+        elif duckdb_type.startswith("TIMESTAMP"):
+            return "DATETIME"
+        elif duckdb_type == "DATE":
+            return "DATE"
+        else:
+            return "VARCHAR(255)"
+
     def _map_pandas_dtype_to_sql(self, dtype: str) -> str:
         """
         将 pandas 数据类型映射到 SQL 数据类型
@@ -673,17 +1348,28 @@ class ChatDuckDBManager:
     """
     聊天级别的DuckDB管理器
     为每个chat_id维护独立的ExcelDuckDBManager实例
+    - 每个会话使用独立的 DuckDB 数据库文件，连接设置 memory_limit，超出部分溢写到磁盘
+    - 打开的会话连接数超过上限时按 LRU 关闭空闲连接，数据保留在磁盘上，再次访问时重新打开
+    - 后台清理任务定期释放空闲连接并删除过期会话
     """
 
     def __init__(self):
-        # {chat_id: ExcelDuckDBManager}
-        self._chat_managers: Dict[str, ExcelDuckDBManager] = {}
+        # {chat_id: ExcelDuckDBManager}，按最近访问顺序排列
+        self._chat_managers: "OrderedDict[str, ExcelDuckDBManager]" = OrderedDict()
         # 会话清理时间配置（秒）
-        self._session_timeout = 36000  # 10小时
+        self._session_timeout = EXCEL_DUCKDB_SESSION_TIMEOUT
         # {chat_id: 最后访问时间}
         self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._session_dir = os.path.join(os.path.abspath(EXCEL_DUCKDB_SESSION_DIR), str(os.getpid()))
+        self._memory_limit = EXCEL_DUCKDB_MEMORY_BUDGET // max(EXCEL_DUCKDB_MAX_OPEN_SESSIONS, 1)
         logger.info("初始化聊天级别DuckDB管理器")
 
+    def _get_database_path(self, chat_id: str) -> str:
+        safe_chat_id = re.sub(r"[^\w\-]", "_", chat_id)[:64]
+        digest = hashlib.sha1(chat_id.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self._session_dir, f"{safe_chat_id}_{digest}.duckdb")
+
     def get_manager(self, chat_id: str) -> ExcelDuckDBManager:
         """
         获取指定chat_id的DuckDB管理器实例
@@ -691,51 +1377,90 @@ class ChatDuckDBManager:
         :param chat_id: 聊天ID
         :return: ExcelDuckDBManager实例
         """
-        # 检查是否已存在该chat_id的管理器
-        if chat_id not in self._chat_managers:
-            self._chat_managers[chat_id] = ExcelDuckDBManager()
-            logger.info(f"为chat_id '{chat_id}' 创建新的DuckDB管理器实例")
+        with self._lock:
+            # 检查是否已存在该chat_id的管理器
+            if chat_id not in self._chat_managers:
+                self._chat_managers[chat_id] = ExcelDuckDBManager(
+                    database_path=self._get_database_path(chat_id), memory_limit=self._memory_limit
+                )
+                logger.info(f"为chat_id '{chat_id}' 创建新的DuckDB管理器实例")
 
-        # 更新最后访问时间
-        self._last_access[chat_id] = time.time()
+            # 更新最后访问时间
+            self._chat_managers.move_to_end(chat_id)
+            self._last_access[chat_id] = time.time()
+            manager = self._chat_managers[chat_id]
+            self._evict_open_connections(exclude=chat_id)
 
-        return self._chat_managers[chat_id]
+        return manager
+
+    def _evict_open_connections(self, exclude: Optional[str] = None):
+        """
+        打开的会话连接数超过上限时，按最近访问顺序关闭最久未使用的空闲连接（需持有 self._lock）
+        当前访问的会话即将使用连接，始终计入打开数
+        """
+        open_count = 1 + sum(
+            1 for chat_id, manager in self._chat_managers.items() if chat_id != exclude and manager.is_connected
+        )
+        if open_count <= EXCEL_DUCKDB_MAX_OPEN_SESSIONS:
+            return
+        for chat_id, manager in self._chat_managers.items():
+            if open_count <= EXCEL_DUCKDB_MAX_OPEN_SESSIONS:
+                break
+            if chat_id == exclude or not manager.is_connected:
+                continue
+            if manager.release_if_idle():
+                open_count -= 1
+                logger.info(f"会话连接数超过上限，已释放chat_id '{chat_id}' 的DuckDB连接")
+        if open_count > EXCEL_DUCKDB_MAX_OPEN_SESSIONS:
+            logger.warning(f"⚠️ 活跃的DuckDB会话连接数 {open_count} 超过上限 {EXCEL_DUCKDB_MAX_OPEN_SESSIONS}")
 
     def close_manager(self, chat_id: str) -> bool:
         """
-        关闭指定chat_id的DuckDB管理器
+        关闭指定chat_id的DuckDB管理器，并删除会话数据库文件
 
         :param chat_id: 聊天ID
         :return: 是否成功关闭
         """
-        if chat_id in self._chat_managers:
-            try:
-                self._chat_managers[chat_id].close()
-                del self._chat_managers[chat_id]
-                if chat_id in self._last_access:
-                    del self._last_access[chat_id]
-                logger.info(f"已关闭chat_id '{chat_id}' 的DuckDB管理器实例")
-                return True
-            except Exception as e:
-                logger.error(f"关闭chat_id '{chat_id}' 的DuckDB管理器失败: {str(e)}")
-                return False
-        return False
+        with self._lock:
+            manager = self._chat_managers.pop(chat_id, None)
+            self._last_access.pop(chat_id, None)
+        if manager is None:
+            return False
+        try:
+            manager.clear_session()
+            logger.info(f"已关闭chat_id '{chat_id}' 的DuckDB管理器实例")
+            return True
+        except Exception as e:
+            logger.error(f"关闭chat_id '{chat_id}' 的DuckDB管理器失败: {str(e)}")
+            return False
 
     def cleanup_expired_sessions(self):
         """
-        清理过期的会话
+        清理过期的会话，并释放空闲会话的连接内存
         """
         current_time = time.time()
-        expired_chats = []
-
-        for chat_id, last_access in self._last_access.items():
-            if current_time - last_access > self._session_timeout:
-                expired_chats.append(chat_id)
+        with self._lock:
+            expired_chats = [
+                chat_id
+                for chat_id, last_access in self._last_access.items()
+                if current_time - last_access > self._session_timeout
+            ]
+            idle_managers = [
+                (chat_id, manager)
+                for chat_id, manager in self._chat_managers.items()
+                if chat_id not in expired_chats
+                and manager.is_connected
+                and current_time - manager.last_used > EXCEL_DUCKDB_IDLE_RELEASE_SECONDS
+            ]
 
         for chat_id in expired_chats:
             logger.info(f"清理过期会话: {chat_id}")
             self.close_manager(chat_id)
 
+        for chat_id, manager in idle_managers:
+            if manager.release_if_idle():
+                logger.debug(f"释放空闲会话连接: {chat_id}")
+
     def get_active_chat_count(self) -> int:
         """
         获取活跃的聊天数量
@@ -758,6 +1483,7 @@ class ChatDuckDBManager:
         """
         for chat_id in list(self._chat_managers.keys()):
             self.close_manager(chat_id)
+        shutil.rmtree(self._session_dir, ignore_errors=True)
         logger.info("已关闭所有聊天会话的DuckDB管理器实例")
 
 
@@ -765,6 +1491,38 @@ class ChatDuckDBManager:
 _chat_duckdb_manager: Optional[ChatDuckDBManager] = None
 
 
+def _cleanup_orphan_session_dirs():
+    """
+    删除已退出的 worker 进程遗留的会话数据库目录
+    """
+    session_root = os.path.abspath(EXCEL_DUCKDB_SESSION_DIR)
+    if not os.path.isdir(session_root):
+        return
+    for name in os.listdir(session_root):
+        if not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(session_root, name), ignore_errors=True)
+            logger.info(f"已删除遗留的会话数据库目录: {name}")
+        except OSError:
+            continue
+
+
+async def run_session_sweeper():
+    """
+    后台清理任务：定期释放空闲会话连接、删除过期会话（在 worker 启动后通过 app.add_task 注册）
+    """
+    await asyncio.to_thread(_cleanup_orphan_session_dirs)
+    while True:
+        await asyncio.sleep(EXCEL_DUCKDB_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(get_chat_duckdb_manager().cleanup_expired_sessions)
+        except Exception as e:
+            logger.error(f"清理DuckDB会话失败: {str(e)}")
+
+
 def get_chat_duckdb_manager() -> ChatDuckDBManager:
     """
     获取全局聊天级别DuckDB管理器实例（单例模式）
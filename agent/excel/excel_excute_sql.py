@@ -41,17 +41,21 @@ def exe_sql_excel_query(state):
         if registered_catalogs:
             logger.debug(f"  Catalog列表: {list(registered_catalogs.keys())}")
 
-        # 执行SQL查询
-        columns, data = duckdb_manager.execute_sql(sql)
+        # 执行SQL查询（按列存储，超过行数上限时截断）
+        columns, column_data, truncated = duckdb_manager.execute_sql_columnar(sql)
 
         # 成功情况
         state["execution_result"] = ExecutionResult(
             success=True,
             columns=columns,
-            data=data
+            column_data=column_data,
+            truncated=truncated,
         )
 
-        logger.info(f"SQL查询执行成功: 返回 {len(data)} 行数据, {len(columns)} 列")
+        logger.info(
+            f"SQL查询执行成功: 返回 {state['execution_result'].row_count} 行数据, {len(columns)} 列"
+            f"{'（已截断）' if truncated else ''}"
+        )
 
     except Exception as e:
         error_msg = str(e)
@@ -76,8 +80,6 @@ def exe_sql_excel_query(state):
 
         state["execution_result"] = ExecutionResult(
             success=False,
-            columns=[],
-            data=[],
             error=error_msg
         )
 
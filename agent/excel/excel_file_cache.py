@@ -0,0 +1,243 @@
+"""
+表格文件解析结果缓存
+按 MinIO object_key + ETag 对文件内容寻址，每个 Sheet 解析一次后以 Parquet 形式落盘，
+后续问答（包括同一主机上的其它 worker 进程）只需在 DuckDB 中创建指向 Parquet 的视图即可完成注册
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本，结构变化时递增，旧缓存自动失效
+CACHE_FORMAT_VERSION = 2
+# 解析结果缓存目录
+EXCEL_FILE_CACHE_DIR = os.getenv("EXCEL_FILE_CACHE_DIR", "./excel_cache")
+# 缓存总大小上限（字节），超过后按最近访问时间淘汰
+EXCEL_FILE_CACHE_MAX_BYTES = int(
+    os.getenv("EXCEL_FILE_CACHE_MAX_BYTES", str(10 * 1024 * 1024 * 1024))
+)
+# 最近访问时间在该时长内的条目不淘汰（秒）：会话中的视图直接引用缓存的 Parquet 文件，
+# 会话每次复用时都会刷新访问时间，默认与会话过期时间（EXCEL_DUCKDB_SESSION_TIMEOUT）一致
+EXCEL_FILE_CACHE_PIN_SECONDS = int(
+    os.getenv(
+        "EXCEL_FILE_CACHE_PIN_SECONDS", os.getenv("EXCEL_DUCKDB_SESSION_TIMEOUT", 36000)
+    )
+)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _json_default(obj: Any):
+    """样本数据中的时间等类型转换为字符串"""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+class ExcelFileCache:
+    """
+    表格文件解析结果缓存（进程安全：写入临时目录后原子重命名）
+
+    目录结构：
+        {EXCEL_FILE_CACHE_DIR}/{digest}/manifest.json
+        {EXCEL_FILE_CACHE_DIR}/{digest}/sheet_{i}.parquet
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = EXCEL_FILE_CACHE_DIR,
+        max_bytes: int = EXCEL_FILE_CACHE_MAX_BYTES,
+        pin_seconds: int = EXCEL_FILE_CACHE_PIN_SECONDS,
+    ):
+        self._cache_dir = os.path.abspath(cache_dir)
+        self._max_bytes = max_bytes
+        self._pin_seconds = pin_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _digest(source_key: str, etag: str) -> str:
+        return hashlib.sha1(f"{source_key}\n{etag}".encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, source_key: str, etag: str) -> str:
+        return os.path.join(self._cache_dir, self._digest(source_key, etag))
+
+    def get(self, source_key: str, etag: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        获取缓存的解析结果
+
+        Returns:
+            manifest 字典（sheets 中的 file 已转换为绝对路径），未命中返回 None
+        """
+        if not etag:
+            return None
+        entry_dir = self._entry_dir(source_key, etag)
+        manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取表格解析缓存失败，将重新解析: {manifest_path}, {e}")
+            return None
+
+        if manifest.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        for sheet in manifest.get("sheets", []):
+            sheet["file"] = os.path.join(entry_dir, sheet["file"])
+            if not os.path.exists(sheet["file"]):
+                return None
+
+        # 更新访问时间，用于 LRU 淘汰
+        try:
+            os.utime(manifest_path, None)
+        except OSError:
+            pass
+        return manifest
+
+    def touch(self, source_key: str, etag: Optional[str]) -> bool:
+        """
+        刷新缓存条目的访问时间（会话复用指向该条目的视图时调用），避免被淘汰
+
+        Returns:
+            条目是否仍存在
+        """
+        if not etag:
+            return False
+        try:
+            os.utime(
+                os.path.join(self._entry_dir(source_key, etag), MANIFEST_FILE), None
+            )
+            return True
+        except OSError:
+            return False
+
+    def put(
+        self, source_key: str, etag: Optional[str], conn, sheets: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        将已注册到 DuckDB 的表导出为 Parquet 并写入缓存
+
+        Args:
+            source_key: MinIO object_key
+            etag: 对象 ETag
+            conn: DuckDB 连接
+            sheets: [{"full_table_name", "sheet_name", "table_name", "row_count", "column_count",
+                      "columns_info", "sample_data"}, ...]
+
+        Returns:
+            写入后的 manifest（同 get 的返回值），写入失败返回 None
+        """
+        if not etag or not sheets:
+            return None
+
+        entry_dir = self._entry_dir(source_key, etag)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            manifest_sheets = []
+            for idx, sheet in enumerate(sheets):
+                file_name = f"sheet_{idx}.parquet"
+                target = os.path.join(tmp_dir, file_name).replace("'", "''")
+                conn.execute(
+                    f"COPY (SELECT * FROM {sheet['full_table_name']}) TO '{target}' (FORMAT PARQUET)"
+                )
+                manifest_sheet = {
+                    k: v for k, v in sheet.items() if k != "full_table_name"
+                }
+                manifest_sheet["file"] = file_name
+                manifest_sheets.append(manifest_sheet)
+
+            manifest = {
+                "version": CACHE_FORMAT_VERSION,
+                "source_key": source_key,
+                "etag": etag,
+                "created_at": time.time(),
+                "sheets": manifest_sheets,
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, default=_json_default)
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                if self.get(source_key, etag) is None:
+                    # 已有条目不完整（如淘汰时未删除干净），替换为本次结果
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    os.rename(tmp_dir, entry_dir)
+                else:
+                    # 其它进程已写入同一内容的缓存，直接使用已有结果
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.info(
+                f"✅ 表格解析结果已缓存: {source_key} ({len(manifest_sheets)} 个 Sheet)"
+            )
+        except Exception as e:
+            logger.warning(f"写入表格解析缓存失败: {source_key}, {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+        self._evict()
+        return self.get(source_key, etag)
+
+    def _evict(self):
+        """缓存总大小超过上限时，按最近访问时间淘汰最旧的条目（跳过仍可能被会话引用的条目）"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self._cache_dir):
+                entry_dir = os.path.join(self._cache_dir, name)
+                manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+                if not os.path.isfile(manifest_path):
+                    continue
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(entry_dir, f))
+                        for f in os.listdir(entry_dir)
+                    )
+                    entries.append((os.path.getmtime(manifest_path), size, entry_dir))
+                    total += size
+                except OSError:
+                    continue
+
+            if total <= self._max_bytes:
+                return
+            # 最近被会话使用过的条目可能仍被会话中的视图引用，不淘汰
+            pin_before = time.time() - self._pin_seconds
+            for accessed_at, size, entry_dir in sorted(entries):
+                if accessed_at >= pin_before:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+                logger.info(f"淘汰表格解析缓存: {entry_dir}")
+                if total <= self._max_bytes:
+                    break
+            if total > self._max_bytes:
+                logger.warning(
+                    f"表格解析缓存 {total} bytes 超过上限 {self._max_bytes} bytes，"
+                    f"剩余条目均在 {self._pin_seconds}s 内被会话使用过，暂不淘汰"
+                )
+
+
+_excel_file_cache: Optional[ExcelFileCache] = None
+_excel_file_cache_lock = threading.Lock()
+
+
+def get_excel_file_cache() -> ExcelFileCache:
+    """
+    获取表格文件解析结果缓存实例（单例模式）
+    """
+    global _excel_file_cache
+    if _excel_file_cache is None:
+        with _excel_file_cache_lock:
+            if _excel_file_cache is None:
+                _excel_file_cache = ExcelFileCache()
+    return _excel_file_cache
@@ -9,6 +9,7 @@ import pandas as pd
 
 from agent.excel.excel_agent_state import ExcelAgentState, FileInfo
 from agent.excel.excel_duckdb_manager import get_duckdb_manager
+from agent.excel.excel_sheet_retriever import select_relevant_sheets
 from common.minio_util import MinioUtils
 
 minio_utils = MinioUtils()
@@ -47,10 +48,20 @@ def read_excel_columns(state: ExcelAgentState) -> ExcelAgentState:
         # 获取DuckDB管理器实例
         duckdb_manager = get_duckdb_manager(chat_id=chat_id)
 
-        # 重新执行时，先清理旧的表，然后重新注册
-        # 获取已注册的表，如果存在则先清理
+        # 获取文件 ETag：文件未变化时，本会话直接复用已注册的表；
+        # 其它 worker 进程首次处理该会话时，从共享的解析结果缓存（Parquet）创建视图，无需重新下载解析
+        source_etags = {
+            file_info["source_file_key"]: minio_utils.get_object_etag(object_key=file_info["source_file_key"])
+            for file_info in file_list
+            if file_info.get("source_file_key")
+            and file_info["source_file_key"].rsplit(".", 1)[-1].lower() in SUPPORTED_EXTENSIONS
+        }
+
+        # 文件列表有变化时，先清理旧的表，然后重新注册
         registered_tables = duckdb_manager.get_registered_tables()
-        if registered_tables:
+        if registered_tables and duckdb_manager.has_same_sources(source_etags):
+            logger.info(f"会话已注册相同文件（{len(registered_tables)} 个表），直接复用")
+        elif registered_tables:
             logger.info(f"检测到已注册的表（{len(registered_tables)} 个），清理旧表以重新注册")
             # 清理已注册的表
             try:
@@ -91,15 +102,15 @@ def read_excel_columns(state: ExcelAgentState) -> ExcelAgentState:
                     upload_time=datetime.now().isoformat(),
                 )
 
-                registered_tables = {}
-                catalog_name = ""
-                if extension in ["xlsx", "xls"]:
-                    # 注册到 DuckDB 管理器
-                    catalog_name, registered_tables = duckdb_manager.register_excel_file(file_url, file_name)
-
-                elif extension == "csv":
-                    # 注册到 DuckDB 管理器
-                    catalog_name, registered_tables = duckdb_manager.register_csv_file(file_url, file_name)
+                # 注册到 DuckDB 管理器（文件内容未变化时直接复用已注册的表或缓存的解析结果）
+                etag = source_etags.get(source_file_key)
+                registered_source = duckdb_manager.get_registered_source(source_file_key, etag)
+                if registered_source:
+                    catalog_name, registered_tables = registered_source
+                else:
+                    catalog_name, registered_tables = duckdb_manager.register_file(
+                        file_url, file_name, extension, source_key=source_file_key, etag=etag
+                    )
 
                 # 更新文件信息
                 file_info_obj.catalog_name = catalog_name
@@ -135,10 +146,11 @@ def read_excel_columns(state: ExcelAgentState) -> ExcelAgentState:
         state["file_metadata"] = file_metadata
         state["sheet_metadata"] = sheet_metadata
         state["catalog_info"] = catalog_info
-        state["db_info"] = all_db_info
+        # Sheet 较多时按问题筛选最相关的 Sheet 写入提示词
+        state["db_info"] = select_relevant_sheets(state.get("user_query", ""), all_db_info)
 
         logger.info(f"处理完成: {len(file_metadata)} 个文件, {len(sheet_metadata)} 个表")
-        logger.info(f"生成的表结构: {json.dumps(all_db_info, default=json_serializer, ensure_ascii=False, indent=2)}")
+        logger.info(f"生成的表结构: {json.dumps(state['db_info'], default=json_serializer, ensure_ascii=False, indent=2)}")
     except Exception as e:
         traceback.print_exception(e)
         logger.error(f"读取Excel表列信息出错: {str(e)}", exc_info=True)
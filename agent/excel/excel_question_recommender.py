@@ -18,6 +18,10 @@ from common.llm_util import get_llm
 logger = logging.getLogger(__name__)
 
 
+# 作为旁路任务执行时读取的状态字段（只读，不修改其中的对象）
+QUESTION_RECOMMENDER_INPUT_KEYS = ("user_query", "db_info")
+
+
 async def excel_question_recommender(state: ExcelAgentState) -> ExcelAgentState:
     """
     推荐问题生成节点
@@ -0,0 +1,214 @@
+"""
+表格问答 Sheet 检索
+上传的文件 / Sheet 较多时，按用户问题从全部 Sheet 中筛选最相关的 N 个写入提示词，
+检索方式与数据问答的表结构检索一致（BM25 + 向量检索，RRF 融合）
+- Sheet 文档由表名、文件名/Sheet 名、列名和导入时统计的高频取值构成
+- 分词结果与文档 embedding 按文档内容哈希缓存，同一文件的追问不再重复计算；
+  未缓存的文档 embedding 走文档批量接口生成，不进入查询 embedding 缓存
+- 检索语料（BM25 + FAISS）按 Sheet 集合签名缓存
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from agent.text2sql.database.db_service import DatabaseService
+from agent.text2sql.database.retrieval_index import (
+    RetrievalCorpus,
+    build_table_document,
+    tokenize_text,
+)
+
+logger = logging.getLogger(__name__)
+
+# 写入提示词的 Sheet 数量上限，Sheet 总数不超过该值时不做筛选
+EXCEL_SHEET_RETURN_COUNT = int(os.getenv("EXCEL_SHEET_RETURN_COUNT", 8))
+# 缓存的 Sheet 文档分词 / embedding 数量
+EXCEL_SHEET_DOC_CACHE_SIZE = int(os.getenv("EXCEL_SHEET_DOC_CACHE_SIZE", 2048))
+# 缓存的检索语料数量
+EXCEL_SHEET_CORPUS_CACHE_SIZE = int(os.getenv("EXCEL_SHEET_CORPUS_CACHE_SIZE", 32))
+
+_doc_tokens: "OrderedDict[str, List[str]]" = OrderedDict()
+_doc_embeddings: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+_corpora: "OrderedDict[str, RetrievalCorpus]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _text_hash(text_str: str) -> str:
+    return hashlib.sha1(text_str.encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_get(cache: OrderedDict, key: str):
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return True, cache[key]
+    return False, None
+
+
+def _cache_put(cache: OrderedDict, key: str, value: Any, max_size: int):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+def build_sheet_document(table_info: Dict[str, Any]) -> str:
+    """
+    构建 Sheet 检索文档：表名 + 表注释 + 字段名 + 字段注释 + 低基数列的高频取值
+    """
+    document = build_table_document(table_info.get("table_name", ""), table_info)
+    top_values = [
+        str(value)
+        for column_info in table_info.get("columns", {}).values()
+        for value in column_info.get("top_values") or []
+    ]
+    if top_values:
+        document = f"{document} {' '.join(top_values)}"
+    return document
+
+
+def _get_tokens(text_str: str) -> List[str]:
+    key = _text_hash(text_str)
+    found, tokens = _cache_get(_doc_tokens, key)
+    if not found:
+        tokens = tokenize_text(text_str)
+        _cache_put(_doc_tokens, key, tokens, EXCEL_SHEET_DOC_CACHE_SIZE)
+    return tokens
+
+
+def _get_embeddings(doc_texts: List[str]) -> List[Optional[np.ndarray]]:
+    """获取文档 embedding（归一化），未缓存的文档批量生成；失败的文档返回 None 且不缓存"""
+    keys = [_text_hash(text_str) for text_str in doc_texts]
+    vectors: List[Optional[np.ndarray]] = []
+    missing = []
+    for idx, key in enumerate(keys):
+        found, vector = _cache_get(_doc_embeddings, key)
+        vectors.append(vector if found else None)
+        if not found:
+            missing.append(idx)
+    if not missing:
+        return vectors
+
+    from services.embedding_service import generate_document_embeddings_sync
+
+    try:
+        embeddings = generate_document_embeddings_sync(
+            [doc_texts[idx] for idx in missing]
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 生成 Sheet 文档 embedding 失败: {e}")
+        embeddings = None
+    for idx, embedding in zip(missing, embeddings or []):
+        if not embedding:
+            continue
+        vector = np.array([embedding], dtype="float32")
+        faiss.normalize_L2(vector)
+        _cache_put(_doc_embeddings, keys[idx], vector[0], EXCEL_SHEET_DOC_CACHE_SIZE)
+        vectors[idx] = vector[0]
+    return vectors
+
+
+def _build_corpus(
+    table_names: List[str], doc_texts: List[str], comment_texts: List[str]
+) -> RetrievalCorpus:
+    tokenized_corpus = [_get_tokens(doc) for doc in doc_texts]
+    comment_tokens = [set(_get_tokens(comment)) for comment in comment_texts]
+    bm25 = BM25Okapi(tokenized_corpus) if tokenized_corpus else None
+
+    faiss_index = None
+    vectors = _get_embeddings(doc_texts)
+    if any(vec is None for vec in vectors):
+        logger.warning("⚠️ 部分 Sheet 文档 embedding 生成失败，本次仅使用 BM25 检索")
+    elif len({vec.shape[0] for vec in vectors}) > 1:
+        logger.warning("⚠️ Sheet 文档 embedding 维度不一致，本次仅使用 BM25 检索")
+    else:
+        matrix = np.vstack(vectors).astype("float32")
+        faiss_index = faiss.IndexFlatIP(matrix.shape[1])  # 内积 = 余弦相似度
+        faiss_index.add(matrix)
+
+    return RetrievalCorpus(table_names, bm25, comment_tokens, faiss_index, frozenset())
+
+
+def _get_corpus(db_info: List[Dict[str, Any]]) -> RetrievalCorpus:
+    table_names = [
+        f"{info.get('catalog_name', '')}.{info.get('table_name', '')}"
+        for info in db_info
+    ]
+    doc_texts = [build_sheet_document(info) for info in db_info]
+    signature = _text_hash(
+        "\n".join(
+            f"{name}\t{_text_hash(doc)}" for name, doc in zip(table_names, doc_texts)
+        )
+    )
+
+    found, corpus = _cache_get(_corpora, signature)
+    if not found:
+        comment_texts = [info.get("table_comment", "") or "" for info in db_info]
+        corpus = _build_corpus(table_names, doc_texts, comment_texts)
+        _cache_put(_corpora, signature, corpus, EXCEL_SHEET_CORPUS_CACHE_SIZE)
+    return corpus
+
+
+def _retrieve_by_vector(corpus: RetrievalCorpus, user_query: str) -> List[int]:
+    if corpus.faiss_index is None:
+        return []
+    from services.embedding_service import get_query_embedding_sync
+
+    embedding = get_query_embedding_sync(user_query)
+    if not embedding or len(embedding) != corpus.faiss_index.d:
+        return []
+    query_vec = np.array([embedding], dtype="float32")
+    faiss.normalize_L2(query_vec)
+    _, indices = corpus.faiss_index.search(query_vec, len(corpus.table_names))
+    return [idx for idx in indices[0].tolist() if idx >= 0]
+
+
+def select_relevant_sheets(
+    user_query: str,
+    db_info: List[Dict[str, Any]],
+    top_n: int = EXCEL_SHEET_RETURN_COUNT,
+) -> List[Dict[str, Any]]:
+    """
+    按用户问题筛选最相关的 Sheet（BM25 + 向量检索，RRF 融合）
+
+    Args:
+        user_query: 用户问题
+        db_info: 全部 Sheet 的表结构信息（read_excel_columns 生成的列表）
+        top_n: 保留的 Sheet 数量
+
+    Returns:
+        筛选后的表结构信息，保持原有顺序；Sheet 数量不超过 top_n 或检索失败时返回全部
+    """
+    if not user_query or not user_query.strip() or len(db_info) <= top_n:
+        return db_info
+
+    try:
+        corpus = _get_corpus(db_info)
+        bm25_indices = corpus.rank_by_bm25(tokenize_text(user_query))
+        vector_indices = _retrieve_by_vector(corpus, user_query)
+        if vector_indices:
+            ranked_indices = DatabaseService._rrf_fusion(
+                bm25_indices, vector_indices, k=60
+            )
+        else:
+            ranked_indices = bm25_indices
+
+        selected = set(ranked_indices[:top_n])
+        logger.info(
+            f"🎯 Sheet 检索: 从 {len(db_info)} 个 Sheet 中保留 {len(selected)} 个"
+            f"（{'BM25 + 向量' if vector_indices else 'BM25'}）: "
+            f"{[corpus.table_names[i] for i in ranked_indices[:top_n]]}"
+        )
+        return [info for idx, info in enumerate(db_info) if idx in selected]
+    except Exception as e:
+        logger.error(f"Sheet 检索失败，使用全部 Sheet: {e}", exc_info=True)
+        return db_info
@@ -53,6 +53,10 @@ def remove_code_block_markers(text: str) -> str:
     return text
 
 
+# 作为旁路任务执行时读取的状态字段（只读，不修改其中的对象）
+SUMMARIZE_INPUT_KEYS = ("user_query", "execution_result")
+
+
 def summarize(state: ExcelAgentState) -> ExcelAgentState:
     """
     使用模板系统构建提示词并调用LLM进行数据总结
@@ -74,13 +78,10 @@ def summarize(state: ExcelAgentState) -> ExcelAgentState:
             state["report_summary"] = ""
             return state
         
-        data_result = execution_result.data
-        
-        # 如果数据是字典或列表，转换为JSON字符串
-        if isinstance(data_result, (dict, list)):
-            data_result_str = json.dumps(data_result, ensure_ascii=False, indent=2, cls=DecimalEncoder)
-        else:
-            data_result_str = str(data_result)
+        # 按列紧凑序列化（列名只出现一次），减少提示词长度
+        data_result_str = execution_result.to_prompt_json(cls=DecimalEncoder)
+        if execution_result.truncated:
+            data_result_str = f"（注意：查询结果超过返回上限，以下仅为前 {execution_result.row_count} 条数据）\n{data_result_str}"
         
         # 获取当前时间
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
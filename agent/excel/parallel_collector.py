@@ -5,40 +5,52 @@
 """
 
 import logging
-import threading
-from concurrent.futures import ThreadPoolExecutor
-from copy import deepcopy
-from typing import Any, Dict, Optional
+from typing import Any, Dict
 
 from agent.excel.excel_agent_state import ExcelAgentState
-from agent.excel.excel_chart_generator import excel_chart_generator
-from agent.excel.excel_summarizer import summarize
+from agent.excel.excel_chart_generator import CHART_GENERATOR_INPUT_KEYS, excel_chart_generator
+from agent.excel.excel_summarizer import SUMMARIZE_INPUT_KEYS, summarize
+from common.side_task_executor import (
+    SIDE_TASK_CHART,
+    SIDE_TASK_SUMMARY,
+    side_task_input,
+    submit_side_task,
+    wait_side_tasks,
+)
 
 logger = logging.getLogger(__name__)
 
-# 全局线程池，用于并行执行任务
-_executor: Optional[ThreadPoolExecutor] = None
-_executor_lock = threading.Lock()
 
+def merge_summary(state: ExcelAgentState, result: Dict[str, Any]):
+    """合并 summarize 结果：report_summary"""
+    if result.get("report_summary"):
+        state["report_summary"] = result["report_summary"]
+        logger.info("✅ 合并 summarize 结果")
 
-def get_executor() -> ThreadPoolExecutor:
-    """获取或创建线程池"""
-    global _executor
-    if _executor is None:
-        with _executor_lock:
-            if _executor is None:
-                _executor = ThreadPoolExecutor(
-                    max_workers=2, thread_name_prefix="excel_parallel_collector"
-                )
-                logger.info("✅ 创建表格问答并行执行线程池")
-    return _executor
 
+def merge_chart(state: ExcelAgentState, result: Dict[str, Any]):
+    """合并 chart_generator 结果：chart_config / chart_type"""
+    if result.get("chart_config"):
+        state["chart_config"] = result["chart_config"]
+        if "chart_type" in result:
+            state["chart_type"] = result["chart_type"]
+        logger.info("✅ 合并 chart_generator 结果")
 
-def parallel_collect(
+
+# 任务名 → (任务函数, 旁路任务类型, 读取的状态字段, 合并函数)
+# 任务只接收所需字段组成的输入，不再深拷贝整个 state（执行结果全部行、全部 Sheet 结构等）
+TASK_FUNCTIONS = {
+    "chart_generator": (excel_chart_generator, SIDE_TASK_CHART, CHART_GENERATOR_INPUT_KEYS, merge_chart),
+    "summarize": (summarize, SIDE_TASK_SUMMARY, SUMMARIZE_INPUT_KEYS, merge_summary),
+}
+
+
+async def parallel_collect(
     state: ExcelAgentState, tasks: list[str] = None
 ) -> ExcelAgentState:
     """
     并行执行多个任务并收集结果
+    任务提交到进程级旁路任务执行器，在事件循环中等待，不占用图执行线程
 
     Args:
         state: ExcelAgent 状态对象
@@ -52,63 +64,36 @@ def parallel_collect(
 
     logger.info(f"🔄 开始并行执行任务: {tasks}")
 
-    # 创建状态的深拷贝，确保并行任务不会互相影响
-    state_copies = {}
-    for task in tasks:
-        state_copies[task] = deepcopy(state)
-
-    # 定义任务函数映射
-    task_functions = {
-        "chart_generator": excel_chart_generator,
-        "summarize": summarize,
-    }
-
-    # 提交所有任务到线程池
-    executor = get_executor()
+    # 提交所有任务到旁路任务执行器，同一次问答的任务属于同一分组
+    group = state.get("side_task_group")
     futures = {}
-
     for task in tasks:
-        if task in task_functions:
-            task_func = task_functions[task]
-            future = executor.submit(task_func, state_copies[task])
-            futures[task] = future
+        if task in TASK_FUNCTIONS:
+            task_func, kind, input_keys, _ = TASK_FUNCTIONS[task]
+            futures[task] = submit_side_task(kind, task_func, side_task_input(state, input_keys), group=group)
             logger.info(f"📤 提交任务: {task}")
 
     # 等待所有任务完成并收集结果
     results = {}
     errors = {}
 
-    for task, future in futures.items():
-        try:
-            result_state = future.result(timeout=180)  # 最多等待180秒
-            results[task] = result_state
-            logger.info(f"✅ 任务完成: {task}")
-        except Exception as e:
-            logger.error(f"❌ 任务失败: {task}, 错误: {e}", exc_info=True)
-            errors[task] = str(e)
+    for task, outcome in (await wait_side_tasks(futures)).items():
+        if isinstance(outcome, BaseException):
+            logger.error(f"❌ 任务失败: {task}, 错误: {outcome!r}", exc_info=outcome)
+            errors[task] = str(outcome) or type(outcome).__name__
             results[task] = None
+        else:
+            results[task] = outcome
+            logger.info(f"✅ 任务完成: {task}")
 
     # 按顺序合并结果到原始 state
     # 顺序：summarize → chart_config
     merge_order = ["summarize", "chart_generator"]
 
     for task in merge_order:
-        if task in results and results[task] is not None:
-            result_state = results[task]
-
-            if task == "summarize":
-                if "report_summary" in result_state and result_state.get(
-                    "report_summary"
-                ):
-                    state["report_summary"] = result_state["report_summary"]
-                    logger.info(f"✅ 合并 summarize 结果")
-
-            elif task == "chart_generator":
-                if "chart_config" in result_state and result_state.get("chart_config"):
-                    state["chart_config"] = result_state["chart_config"]
-                    if "chart_type" in result_state:
-                        state["chart_type"] = result_state["chart_type"]
-                    logger.info(f"✅ 合并 chart_generator 结果")
+        if results.get(task) is not None:
+            merge = TASK_FUNCTIONS[task][3]
+            merge(state, results[task])
 
     # 记录错误（如果有）
     if errors:
@@ -118,7 +103,7 @@ def parallel_collect(
     return state
 
 
-def parallel_collect_after_sql_executor(state: ExcelAgentState) -> ExcelAgentState:
+async def parallel_collect_after_sql_executor(state: ExcelAgentState) -> ExcelAgentState:
     """
     在 sql_executor 之后并行执行 chart_generator 和 summarize
 
@@ -129,4 +114,4 @@ def parallel_collect_after_sql_executor(state: ExcelAgentState) -> ExcelAgentSta
         更新后的 state
     """
     logger.info("🔄 并行执行 chart_generator 和 summarize")
-    return parallel_collect(state, tasks=["chart_generator", "summarize"])
+    return await parallel_collect(state, tasks=["chart_generator", "summarize"])
@@ -9,6 +9,25 @@ from typing import List, Dict, Any
 logger = logging.getLogger(__name__)
 
 
+def _format_column_profile(column_info: Dict[str, Any]) -> List[str]:
+    """
+    将导入时计算的列统计信息格式化为 M-Schema 字段说明，帮助模型一次写对过滤条件
+    - 低基数文本列：Examples（高频取值）
+    - 其它列：Range（最小值 ~ 最大值）
+    - 存在空值时：Null 比例
+    """
+    parts = []
+    top_values = column_info.get("top_values")
+    if top_values:
+        parts.append(f"Examples: [{', '.join(str(v) for v in top_values)}]")
+    elif column_info.get("min") is not None and not str(column_info.get("type", "")).startswith("VARCHAR"):
+        parts.append(f"Range: [{column_info['min']}, {column_info['max']}]")
+    null_ratio = column_info.get("null_ratio")
+    if null_ratio:
+        parts.append(f"Null: {null_ratio:.1%}")
+    return parts
+
+
 def format_excel_schema_to_m_schema(
     db_info: List[Dict[str, Any]],
 ) -> str:
@@ -66,10 +85,11 @@ def format_excel_schema_to_m_schema(
                 column_type = column_info.get("type", "VARCHAR")
                 column_comment = column_info.get("comment", "").strip()
                 
+                field_parts = [f"{column_name}:{column_type}"]
                 if column_comment:
-                    field_list.append(f"({column_name}:{column_type}, {column_comment})")
-                else:
-                    field_list.append(f"({column_name}:{column_type})")
+                    field_parts.append(column_comment)
+                field_parts.extend(_format_column_profile(column_info))
+                field_list.append(f"({', '.join(field_parts)})")
             
             schema_table += ",\n".join(field_list)
         
@@ -9,34 +9,11 @@ from decimal import Decimal
 from datetime import datetime, date
 from typing import Dict, Any, List, Optional, Tuple
 
-import sqlglot
-from sqlglot import parse
-
 from agent.text2sql.state.agent_state import AgentState, ExecutionResult
+from common.sql_parse_util import ParsedSQL, get_parsed_sql, get_sqlglot_dialect, parse_sql
 
 logger = logging.getLogger(__name__)
 
-# 数据库类型到 sqlglot 方言的映射
-# 对于 sqlglot 不直接支持的数据源，映射到最接近的兼容方言
-DB_TYPE_TO_DIALECT = {
-    "mysql": "mysql",
-    "postgresql": "postgres",
-    "pg": "postgres",
-    "oracle": "oracle",
-    "sqlserver": "tsql",
-    "mssql": "tsql",
-    "clickhouse": "clickhouse",
-    "ck": "clickhouse",
-    "redshift": "redshift",
-    "elasticsearch": "mysql",  # Elasticsearch 使用 MySQL 兼容语法
-    "es": "mysql",
-    "starrocks": "mysql",  # StarRocks 兼容 MySQL 协议
-    "doris": "mysql",  # Doris 兼容 MySQL 协议
-    "dm": "oracle",  # 达梦数据库兼容 Oracle
-    "kingbase": "postgres",  # 人大金仓兼容 PostgreSQL
-    "excel": "postgres",  # Excel 使用 PostgreSQL 规则
-}
-
 
 def convert_value(v):
     """转换数据类型"""
@@ -50,81 +27,43 @@ def convert_value(v):
         return v
 
 
-def extract_table_names_sqlglot(sql: str, db_type: str = "mysql") -> List[str]:
+def extract_table_names_sqlglot(sql: str, db_type: str = "mysql", parsed_sql: Optional[ParsedSQL] = None) -> List[str]:
     """
     使用 sqlglot 提取 SQL 中的所有表名
     
     Args:
         sql: SQL 语句
         db_type: 数据库类型，默认为 mysql
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     """
-    try:
-        # 将数据库类型映射到 sqlglot 方言
-        dialect = DB_TYPE_TO_DIALECT.get(db_type.lower(), "mysql")
-        
-        expression = parse(sql, read=dialect)[0]
-        tables = set()
-        for table in expression.find_all(sqlglot.exp.Table):
-            tables.add(table.name)
-        return list(tables)
-    except Exception as e:
-        logger.warning(f"SQL 解析错误: {e}")
-        return []
+    parsed_sql = parsed_sql or parse_sql(sql, get_sqlglot_dialect(db_type))
+    return parsed_sql.tables
 
 
-def extract_table_alias_mapping(sql: str, db_type: str = "mysql") -> Dict[str, str]:
+def extract_table_alias_mapping(sql: str, db_type: str = "mysql", parsed_sql: Optional[ParsedSQL] = None) -> Dict[str, str]:
     """
     提取SQL中的表别名映射关系
     
     Args:
         sql: SQL语句
         db_type: 数据库类型，默认为 mysql
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     
     Returns:
         别名到真实表名的映射字典 {alias: table_name}
     """
-    alias_mapping = {}
-    try:
-        # 将数据库类型映射到 sqlglot 方言
-        dialect = DB_TYPE_TO_DIALECT.get(db_type.lower(), "mysql")
-        
-        expressions = parse(sql, read=dialect)
-        
-        # 方法1: 直接从表表达式中提取
-        for expression in expressions:
-            if expression:
-                for table_exp in expression.find_all(sqlglot.exp.Table):
-                    if hasattr(table_exp, "alias") and table_exp.alias:
-                        alias_mapping[table_exp.alias] = table_exp.name
-        
-        # 方法2: 从FROM和JOIN子句中提取（更可靠的方法）
-        for expression in expressions:
-            if expression:
-                # 处理 FROM 子句
-                for from_exp in expression.find_all(sqlglot.exp.From):
-                    if hasattr(from_exp, "expressions"):
-                        for expr in from_exp.expressions:
-                            if isinstance(expr, sqlglot.exp.Alias) and hasattr(expr.this, "name"):
-                                alias_mapping[expr.alias] = expr.this.name
-                            elif hasattr(expr, "name") and hasattr(expr, "alias") and expr.alias:
-                                alias_mapping[expr.alias] = expr.name
-                
-                # 处理 JOIN 子句
-                for join_exp in expression.find_all(sqlglot.exp.Join):
-                    if hasattr(join_exp, "this"):
-                        join_table = join_exp.this
-                        if isinstance(join_table, sqlglot.exp.Alias) and hasattr(join_table.this, "name"):
-                            alias_mapping[join_table.alias] = join_table.this.name
-                        elif hasattr(join_table, "name") and hasattr(join_table, "alias") and join_table.alias:
-                            alias_mapping[join_table.alias] = join_table.name
-    except Exception as e:
-        logger.warning(f"提取表别名映射失败: {e}")
-    
+    parsed_sql = parsed_sql or parse_sql(sql, get_sqlglot_dialect(db_type))
+    alias_mapping = parsed_sql.alias_mapping
     logger.debug(f"表别名映射: {alias_mapping}")
     return alias_mapping
 
 
-def extract_select_columns(sql: str, db_type: str = "mysql", table_alias_mapping: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+def extract_select_columns(
+    sql: str,
+    db_type: str = "mysql",
+    table_alias_mapping: Optional[Dict[str, str]] = None,
+    parsed_sql: Optional[ParsedSQL] = None,
+) -> List[Dict[str, Any]]:
     """
     从 SQL 中提取 SELECT 列的详细信息
     返回格式: [{"name": "column_name", "alias": "alias_name", "table": "table_name", "is_aggregate": False}, ...]
@@ -133,85 +72,11 @@ def extract_select_columns(sql: str, db_type: str = "mysql", table_alias_mapping
         sql: SQL 语句
         db_type: 数据库类型，默认为 mysql
         table_alias_mapping: 表别名映射字典，如果提供，会将别名转换为真实表名
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     """
+    parsed_sql = parsed_sql or parse_sql(sql, get_sqlglot_dialect(db_type))
     try:
-        # 将数据库类型映射到 sqlglot 方言
-        dialect = DB_TYPE_TO_DIALECT.get(db_type.lower(), "mysql")
-        
-        expressions = parse(sql, read=dialect)
-        column_info_list = []
-
-        for expression in expressions:
-            if not expression:
-                continue
-
-            # 查找 SELECT 表达式
-            selects = expression.find_all(sqlglot.exp.Select)
-            for select in selects:
-                projections = select.expressions
-                for proj in projections:
-                    col_info = {
-                        "name": "",
-                        "alias": "",
-                        "table": "",
-                        "is_aggregate": False,
-                    }
-
-                    # 检查是否是聚合函数
-                    if isinstance(proj, (sqlglot.exp.AggFunc, sqlglot.exp.Sum, sqlglot.exp.Count, sqlglot.exp.Avg, sqlglot.exp.Max, sqlglot.exp.Min)):
-                        col_info["is_aggregate"] = True
-                        col_info["name"] = str(proj)
-                    elif isinstance(proj, sqlglot.exp.Column):
-                        col_info["name"] = proj.name
-                        table_ref = proj.table or ""
-                        # 如果有表别名映射，将别名转换为真实表名
-                        if table_ref and table_alias_mapping:
-                            col_info["table"] = table_alias_mapping.get(table_ref, table_ref)
-                        else:
-                            col_info["table"] = table_ref
-                    elif isinstance(proj, sqlglot.exp.Star):
-                        col_info["name"] = "*"
-                    else:
-                        col_info["name"] = str(proj)
-
-                    # 获取别名（去掉外层的反引号、双引号、方括号）
-                    def clean_alias(alias_str: str) -> str:
-                        """清理别名：去掉反引号、双引号、方括号"""
-                        if not alias_str:
-                            return alias_str
-                        # 去掉反引号、双引号、方括号
-                        alias_str = alias_str.strip()
-                        # 去掉外层的反引号
-                        if alias_str.startswith('`') and alias_str.endswith('`'):
-                            alias_str = alias_str[1:-1]
-                        # 去掉外层的双引号
-                        if alias_str.startswith('"') and alias_str.endswith('"'):
-                            alias_str = alias_str[1:-1]
-                        # 去掉外层的方括号（SQL Server）
-                        if alias_str.startswith('[') and alias_str.endswith(']'):
-                            alias_str = alias_str[1:-1]
-                        return alias_str.strip()
-                    
-                    if isinstance(proj, sqlglot.exp.Alias):
-                        col_info["alias"] = clean_alias(proj.alias)
-                        # 检查内部的表达式是否为聚合函数
-                        if hasattr(proj, "this"):
-                            if isinstance(proj.this, (sqlglot.exp.AggFunc, sqlglot.exp.Sum, sqlglot.exp.Count, sqlglot.exp.Avg, sqlglot.exp.Max, sqlglot.exp.Min)):
-                                col_info["is_aggregate"] = True
-                                if isinstance(proj.this, sqlglot.exp.Column):
-                                    col_info["name"] = proj.this.name
-                                    table_ref = proj.this.table or ""
-                                    # 如果有表别名映射，将别名转换为真实表名
-                                    if table_ref and table_alias_mapping:
-                                        col_info["table"] = table_alias_mapping.get(table_ref, table_ref)
-                                    else:
-                                        col_info["table"] = table_ref
-                    elif hasattr(proj, "alias") and proj.alias:
-                        col_info["alias"] = clean_alias(proj.alias)
-
-                    column_info_list.append(col_info)
-
-        return column_info_list
+        return parsed_sql.get_select_columns(table_alias_mapping)
     except Exception as e:
         logger.warning(f"提取 SELECT 列信息失败: {e}")
         return []
@@ -307,7 +172,8 @@ def get_column_comment_from_schema(db_info: Dict[str, Dict[str, Any]], table_nam
 
 def map_columns_to_comments(
     sql: str, db_info: Dict[str, Dict[str, Any]], actual_columns: List[str], 
-    db_type: str = "mysql", chart_config: Optional[Dict[str, Any]] = None
+    db_type: str = "mysql", chart_config: Optional[Dict[str, Any]] = None,
+    parsed_sql: Optional[ParsedSQL] = None,
 ) -> Tuple[List[str], Dict[str, str]]:
     """
     将 SQL 查询结果的列名映射为中文注释（优先使用chart_config中的name）
@@ -324,6 +190,7 @@ def map_columns_to_comments(
         actual_columns: 实际列名列表
         db_type: 数据库类型，默认为 mysql
         chart_config: 图表配置（可选），包含columns/axis中的name和value映射
+        parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     
     Returns:
         (column_names_chinese, column_mapping)
@@ -334,14 +201,17 @@ def map_columns_to_comments(
         # 优先从chart_config中提取映射
         chart_config_mapping = extract_chart_config_mapping(chart_config)
         
+        # SQL 只解析一次，表名、别名映射和 SELECT 列都基于同一解析结果
+        parsed_sql = parsed_sql or parse_sql(sql, get_sqlglot_dialect(db_type))
+
         # 提取表别名映射（将别名转换为真实表名）
-        table_alias_mapping = extract_table_alias_mapping(sql, db_type)
+        table_alias_mapping = extract_table_alias_mapping(sql, db_type, parsed_sql)
         
         # 提取 SELECT 列的详细信息（使用表别名映射）
-        column_info_list = extract_select_columns(sql, db_type, table_alias_mapping)
+        column_info_list = extract_select_columns(sql, db_type, table_alias_mapping, parsed_sql)
         
         # 获取表名（真实表名）
-        table_names = extract_table_names_sqlglot(sql, db_type)
+        table_names = extract_table_names_sqlglot(sql, db_type, parsed_sql)
         
         column_mapping = {}
         column_names_chinese = []
@@ -477,8 +347,7 @@ async def data_render_ant(state: AgentState):
             logger.warning("SQL 执行结果为空或失败,跳过数据渲染")
             return state
 
-        data: List[Dict[str, Any]] = execution_result.data
-        if not data:
+        if not execution_result.row_count:
             logger.warning("数据为空,跳过数据渲染")
             return state
 
@@ -503,18 +372,16 @@ async def data_render_ant(state: AgentState):
         db_type = "mysql"  # 默认类型
         if datasource_id:
             try:
-                from model.db_connection_pool import get_db_pool
+                from model.db_connection_pool import run_in_session
                 from services.datasource_service import DatasourceService
-                db_pool = get_db_pool()
-                with db_pool.get_session() as session:
-                    ds = DatasourceService.get_datasource_by_id(session, datasource_id)
-                    if ds:
-                        db_type = ds.type
+
+                # 元数据库查询在专用线程池中执行，避免阻塞事件循环
+                db_type = await run_in_session(DatasourceService.get_datasource_type, datasource_id) or db_type
             except Exception as e:
                 logger.warning(f"获取数据源类型失败: {e}，使用默认值 mysql")
 
-        # 获取实际的列名(从第一条数据中提取)
-        actual_columns = list(data[0].keys()) if data else []
+        # 获取实际的列名
+        actual_columns = list(execution_result.columns)
         
         if not actual_columns:
             logger.warning("无法从数据中提取列名，跳过数据渲染")
@@ -526,8 +393,9 @@ async def data_render_ant(state: AgentState):
         chart_config = state.get("chart_config", {})
         
         # 映射列名为中文注释（优先使用chart_config中的name）
+        parsed_sql = get_parsed_sql(state, generated_sql, get_sqlglot_dialect(db_type))
         column_names_chinese, column_mapping = map_columns_to_comments(
-            generated_sql, db_info, actual_columns, db_type, chart_config
+            generated_sql, db_info, actual_columns, db_type, chart_config, parsed_sql
         )
         
         logger.info(f"列名映射结果: 中文列名数量={len(column_names_chinese)}, 映射字典大小={len(column_mapping)}")
@@ -536,14 +404,11 @@ async def data_render_ant(state: AgentState):
         else:
             logger.warning(f"列名映射失败或返回空，使用原始列名。actual_columns={actual_columns[:3]}")
 
-        # 转换数据格式: 将英文列名映射为中文列名
-        formatted_data = []
-        for row in data:
-            formatted_row = {}
-            for col_name, value in row.items():
-                chinese_col_name = column_mapping.get(col_name, col_name)
-                formatted_row[chinese_col_name] = convert_value(value)
-            formatted_data.append(formatted_row)
+        # 转换数据格式: 将英文列名映射为中文列名（按列批量转换取值）
+        formatted_data = execution_result.to_records(
+            column_names=[column_mapping.get(col_name, col_name) for col_name in actual_columns],
+            convert_value=convert_value,
+        )
 
         # 确保 columns 字段与 formatted_data 的 key 一致（使用中文列名）
         # 从 formatted_data 的第一行提取实际使用的中文列名，确保顺序和内容完全匹配
@@ -2,10 +2,10 @@ import json
 import logging
 import traceback
 from decimal import Decimal
+from typing import Optional
 
 from agent.text2sql.state.agent_state import AgentState, ExecutionResult
-import sqlglot
-from sqlglot import parse
+from common.sql_parse_util import ParsedSQL, get_parsed_sql, get_sqlglot_dialect, parse_sql
 from datetime import datetime, date
 import pandas as pd
 
@@ -19,26 +19,6 @@ Apache EChart数据渲染节点来支撑表格的渲染
 
 logger = logging.getLogger(__name__)
 
-# 数据库类型到 sqlglot 方言的映射（与 data_render_antv.py 保持一致）
-DB_TYPE_TO_DIALECT = {
-    "mysql": "mysql",
-    "postgresql": "postgres",
-    "pg": "postgres",
-    "oracle": "oracle",
-    "sqlserver": "tsql",
-    "mssql": "tsql",
-    "clickhouse": "clickhouse",
-    "ck": "clickhouse",
-    "redshift": "redshift",
-    "elasticsearch": "mysql",
-    "es": "mysql",
-    "starrocks": "mysql",
-    "doris": "mysql",
-    "dm": "oracle",
-    "kingbase": "postgres",
-    "excel": "postgres",
-}
-
 
 def data_render_apache(state: AgentState) -> dict:
     """
@@ -73,7 +53,8 @@ def data_render_apache(state: AgentState) -> dict:
         db_type = db_type or "mysql"
     
     # 获取生成的SQL中的表名
-    generated_table_names = extract_table_names_sqlglot(generated_sql, db_type)
+    parsed_sql = get_parsed_sql(state, generated_sql, get_sqlglot_dialect(db_type))
+    generated_table_names = extract_table_names_sqlglot(generated_sql, db_type, parsed_sql)
     if not generated_table_names:
         logger.info("未从SQL中提取到表名")
         return table_data
@@ -124,26 +105,17 @@ def convert_value(v):
         return v
 
 
-def extract_table_names_sqlglot(sql: str, db_type: str = "mysql") -> list:
+def extract_table_names_sqlglot(sql: str, db_type: str = "mysql", parsed_sql: Optional[ParsedSQL] = None) -> list:
     """
     使用 sqlglot 提取 SQL 中的所有表名（支持复杂语法、多表、子查询、CTE 等）
 
     :param sql: SQL 语句
     :param db_type: 数据库类型，用于选择正确的方言解析
+    :param parsed_sql: 已有的解析结果（可选），不传时按 SQL 文本从解析缓存获取
     :return: 表名列表（去重）
     """
-    try:
-        # 将数据库类型映射到 sqlglot 方言
-        dialect = DB_TYPE_TO_DIALECT.get(db_type.lower() if db_type else "mysql", "mysql")
-        expression = parse(sql, read=dialect)[0]
-        tables = set()
-        for table in expression.find_all(sqlglot.exp.Table):
-            # 取表名（去掉 schema）
-            tables.add(table.name)
-        return list(tables)
-    except Exception as e:
-        logger.info(f"SQL 解析错误: {e}")
-        return []
+    parsed_sql = parsed_sql or parse_sql(sql, get_sqlglot_dialect(db_type))
+    return parsed_sql.tables
 
 
 def get_column_comments(schema_inspector: dict, table_name: str) -> list:
@@ -1,4 +1,5 @@
 import logging
+from threading import Lock
 
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
@@ -10,7 +11,7 @@ from agent.text2sql.analysis.parallel_collector import (
 )
 from agent.text2sql.analysis.early_recommender_helper import start_early_recommender
 from agent.text2sql.analysis.unified_collector import unified_collect
-from agent.text2sql.database.db_service import DatabaseService
+from agent.text2sql.database.db_service import get_database_service
 from agent.text2sql.sql.generator import sql_generate
 from agent.text2sql.permission.filter_injector import permission_filter_injector
 from agent.text2sql.chart.generator import chart_generator
@@ -19,6 +20,10 @@ from agent.text2sql.state.agent_state import AgentState
 
 logger = logging.getLogger(__name__)
 
+# 编译后的图与数据源无关，进程内只编译一次
+_compiled_graph: CompiledStateGraph = None
+_compiled_graph_lock = Lock()
+
 
 def data_render_condition(state: AgentState) -> str:
     """
@@ -59,21 +64,37 @@ def handle_datasource_error(state: AgentState) -> AgentState:
     return state
 
 
-def create_graph(datasource_id: int = None):
+def schema_inspector(state: AgentState) -> AgentState:
+    """
+    表结构检索节点
+    按 state 中的 datasource_id 获取缓存的 DatabaseService（数据源可能由 datasource_selector 动态选择）
+    """
+    return get_database_service(state.get("datasource_id")).get_table_schema(state)
+
+
+def sql_executor(state: AgentState) -> AgentState:
+    """
+    SQL 执行节点
+    """
+    return get_database_service(state.get("datasource_id")).execute_sql(state)
+
+
+def create_graph() -> CompiledStateGraph:
     """
+    构建并编译 Text2SQL 图
+    节点在运行时按 state 解析数据源服务，编译结果可在请求间复用
     :return:
     """
     graph = StateGraph(AgentState)
-    db_service = DatabaseService(datasource_id)
 
     graph.add_node("datasource_selector", datasource_selector)
     graph.add_node("error_handler", handle_datasource_error)
-    graph.add_node("schema_inspector", db_service.get_table_schema)
+    graph.add_node("schema_inspector", schema_inspector)
     # 优化：早期启动推荐问题生成（在后台并行执行）
     graph.add_node("early_recommender", start_early_recommender)
     graph.add_node("sql_generator", sql_generate)
     graph.add_node("permission_filter", permission_filter_injector)
-    graph.add_node("sql_executor", db_service.execute_sql)
+    graph.add_node("sql_executor", sql_executor)
     # 优化：并行执行 chart_generator 和 summarize（如果推荐问题已提前启动，则不包含）
     graph.add_node("parallel_collector", parallel_collect_after_sql_executor)
     # 统一收集节点：按顺序收集 summarize → 图表数据 → 推荐问题
@@ -108,3 +129,17 @@ def create_graph(datasource_id: int = None):
 
     graph_compiled: CompiledStateGraph = graph.compile()
     return graph_compiled
+
+
+def get_compiled_graph() -> CompiledStateGraph:
+    """
+    获取进程内缓存的已编译图（首次调用时编译）
+    :return:
+    """
+    global _compiled_graph
+    if _compiled_graph is None:
+        with _compiled_graph_lock:
+            if _compiled_graph is None:
+                _compiled_graph = create_graph()
+                logger.info("Text2SQL 图编译完成，后续请求将复用")
+    return _compiled_graph
@@ -5,39 +5,67 @@
 """
 
 import logging
-import threading
-from typing import Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor
-from copy import deepcopy
+from typing import Any, Dict
 
 from agent.text2sql.state.agent_state import AgentState
-from agent.text2sql.chart.generator import chart_generator
-from agent.text2sql.analysis.llm_summarizer import summarize
-from agent.text2sql.question.recommender import question_recommender
+from agent.text2sql.chart.generator import CHART_GENERATOR_INPUT_KEYS, chart_generator
+from agent.text2sql.analysis.llm_summarizer import SUMMARIZE_INPUT_KEYS, summarize
+from agent.text2sql.question.recommender import QUESTION_RECOMMENDER_INPUT_KEYS, question_recommender
+from common.side_task_executor import (
+    SIDE_TASK_CHART,
+    SIDE_TASK_RECOMMEND,
+    SIDE_TASK_SUMMARY,
+    side_task_input,
+    submit_side_task,
+    wait_side_tasks,
+)
 
 logger = logging.getLogger(__name__)
 
-# 全局线程池，用于并行执行任务
-_executor: Optional[ThreadPoolExecutor] = None
-_executor_lock = threading.Lock()
 
+def merge_summary(state: AgentState, result: Dict[str, Any]):
+    """合并 summarize 结果：report_summary"""
+    if result.get("report_summary"):
+        state["report_summary"] = result["report_summary"]
+        logger.info("✅ 合并 summarize 结果")
 
-def get_executor() -> ThreadPoolExecutor:
-    """获取或创建线程池"""
-    global _executor
-    if _executor is None:
-        with _executor_lock:
-            if _executor is None:
-                _executor = ThreadPoolExecutor(
-                    max_workers=3, thread_name_prefix="parallel_collector"
-                )
-                logger.info("✅ 创建并行执行线程池")
-    return _executor
 
+def merge_chart(state: AgentState, result: Dict[str, Any]):
+    """合并 chart_generator 结果：chart_config / chart_type"""
+    if result.get("chart_config"):
+        state["chart_config"] = result["chart_config"]
+        if "chart_type" in result:
+            state["chart_type"] = result["chart_type"]
+        logger.info("✅ 合并 chart_generator 结果")
 
-def parallel_collect(state: AgentState, tasks: list[str] = None) -> AgentState:
+
+def merge_recommended_questions(state: AgentState, result: Dict[str, Any]):
+    """合并 question_recommender 结果：recommended_questions"""
+    if "recommended_questions" in result:
+        state["recommended_questions"] = result.get("recommended_questions") or []
+        logger.info(
+            f"✅ 合并 question_recommender 结果，推荐问题数量: {len(state['recommended_questions'])}"
+        )
+
+
+# 任务名 → (任务函数, 旁路任务类型, 读取的状态字段, 合并函数)
+# 任务只接收所需字段组成的输入，不再深拷贝整个 state（执行结果全部行、完整 db_info 等）
+TASK_FUNCTIONS = {
+    "chart_generator": (chart_generator, SIDE_TASK_CHART, CHART_GENERATOR_INPUT_KEYS, merge_chart),
+    "summarize": (summarize, SIDE_TASK_SUMMARY, SUMMARIZE_INPUT_KEYS, merge_summary),
+    "question_recommender": (
+        question_recommender,
+        SIDE_TASK_RECOMMEND,
+        QUESTION_RECOMMENDER_INPUT_KEYS,
+        merge_recommended_questions,
+    ),
+}
+
+
+async def parallel_collect(state: AgentState, tasks: list[str] = None) -> AgentState:
     """
     并行执行多个任务并收集结果
+    任务提交到进程级旁路任务执行器，在事件循环中等待，不占用图执行线程
 
     Args:
         state: Agent 状态对象
@@ -51,73 +79,36 @@ def parallel_collect(state: AgentState, tasks: list[str] = None) -> AgentState:
 
     logger.info(f"🔄 开始并行执行任务: {tasks}")
 
-    # 创建状态的深拷贝，确保并行任务不会互相影响
-    state_copies = {}
-    for task in tasks:
-        state_copies[task] = deepcopy(state)
-
-    # 定义任务函数映射
-    task_functions = {
-        "chart_generator": chart_generator,
-        "summarize": summarize,
-        "question_recommender": question_recommender,
-    }
-
-    # 提交所有任务到线程池
-    executor = get_executor()
+    # 提交所有任务到旁路任务执行器，同一次问答的任务属于同一分组
+    group = state.get("side_task_group")
     futures = {}
-
     for task in tasks:
-        if task in task_functions:
-            task_func = task_functions[task]
-            future = executor.submit(task_func, state_copies[task])
-            futures[task] = future
+        if task in TASK_FUNCTIONS:
+            task_func, kind, input_keys, _ = TASK_FUNCTIONS[task]
+            futures[task] = submit_side_task(kind, task_func, side_task_input(state, input_keys), group=group)
             logger.info(f"📤 提交任务: {task}")
 
     # 等待所有任务完成并收集结果
     results = {}
     errors = {}
 
-    for task, future in futures.items():
-        try:
-            result_state = future.result(timeout=180)  # 最多等待60秒
-            results[task] = result_state
-            logger.info(f"✅ 任务完成: {task}")
-        except Exception as e:
-            logger.error(f"❌ 任务失败: {task}, 错误: {e}", exc_info=True)
-            errors[task] = str(e)
+    for task, outcome in (await wait_side_tasks(futures)).items():
+        if isinstance(outcome, BaseException):
+            logger.error(f"❌ 任务失败: {task}, 错误: {outcome!r}", exc_info=outcome)
+            errors[task] = str(outcome) or type(outcome).__name__
             results[task] = None
+        else:
+            results[task] = outcome
+            logger.info(f"✅ 任务完成: {task}")
 
     # 按顺序合并结果到原始 state
     # 顺序：summarize → chart_config → recommended_questions
     merge_order = ["summarize", "chart_generator", "question_recommender"]
 
     for task in merge_order:
-        if task in results and results[task] is not None:
-            result_state = results[task]
-
-            if task == "summarize":
-                if "report_summary" in result_state and result_state.get(
-                    "report_summary"
-                ):
-                    state["report_summary"] = result_state["report_summary"]
-                    logger.info(f"✅ 合并 summarize 结果")
-
-            elif task == "chart_generator":
-                if "chart_config" in result_state and result_state.get("chart_config"):
-                    state["chart_config"] = result_state["chart_config"]
-                    if "chart_type" in result_state:
-                        state["chart_type"] = result_state["chart_type"]
-                    logger.info(f"✅ 合并 chart_generator 结果")
-
-            elif task == "question_recommender":
-                if "recommended_questions" in result_state:
-                    state["recommended_questions"] = result_state.get(
-                        "recommended_questions", []
-                    )
-                    logger.info(
-                        f"✅ 合并 question_recommender 结果，推荐问题数量: {len(state.get('recommended_questions', []))}"
-                    )
+        if results.get(task) is not None:
+            merge = TASK_FUNCTIONS[task][3]
+            merge(state, results[task])
 
     # 记录错误（如果有）
     if errors:
@@ -127,7 +118,7 @@ def parallel_collect(state: AgentState, tasks: list[str] = None) -> AgentState:
     return state
 
 
-def parallel_collect_after_sql_executor(state: AgentState) -> AgentState:
+async def parallel_collect_after_sql_executor(state: AgentState) -> AgentState:
     """
     在 sql_executor 之后并行执行 chart_generator 和 summarize
 
@@ -147,22 +138,22 @@ def parallel_collect_after_sql_executor(state: AgentState) -> AgentState:
         # 如果有早期启动的任务，只并行执行 chart_generator 和 summarize
         # question_recommender 会在后续节点中等待并合并
         logger.info("🔄 并行执行 chart_generator 和 summarize（推荐问题已在后台执行）")
-        return parallel_collect(state, tasks=["chart_generator", "summarize"])
+        return await parallel_collect(state, tasks=["chart_generator", "summarize"])
     else:
         # 否则并行执行所有三个任务
         logger.info("🔄 并行执行 chart_generator、summarize 和 question_recommender")
-        return parallel_collect(
+        return await parallel_collect(
             state, tasks=["chart_generator", "summarize", "question_recommender"]
         )
 
 
-def wait_and_merge_early_recommender(state: AgentState) -> AgentState:
+async def wait_and_merge_early_recommender(state: AgentState) -> AgentState:
     """
     等待早期启动的推荐问题生成任务并合并结果
 
     如果早期任务已完成，直接合并结果
     如果未完成，等待完成（最多5秒）后合并
-    如果超时或失败，回退到直接调用 question_recommender
+    如果超时或失败，回退生成：同样提交到旁路任务执行器，受推荐问题并发上限约束
 
     Args:
         state: Agent 状态对象
@@ -182,19 +173,10 @@ def wait_and_merge_early_recommender(state: AgentState) -> AgentState:
         if "recommended_questions" in state and state.get("recommended_questions"):
             return state
         # 否则直接生成
-        try:
-            result_state = question_recommender(deepcopy(state))
-            if "recommended_questions" in result_state:
-                state["recommended_questions"] = result_state.get(
-                    "recommended_questions", []
-                )
-        except Exception as e:
-            logger.error(f"生成推荐问题失败: {e}", exc_info=True)
-            state["recommended_questions"] = []
-        return state
+        return await parallel_collect(state, tasks=["question_recommender"])
 
     # 等待早期任务完成
-    recommended_questions = wait_for_early_recommender(task_id, timeout=5)
+    recommended_questions = await wait_for_early_recommender(task_id, timeout=5)
 
     if recommended_questions is not None:
         state["recommended_questions"] = recommended_questions
@@ -202,16 +184,8 @@ def wait_and_merge_early_recommender(state: AgentState) -> AgentState:
     else:
         # 超时或失败，回退到直接生成
         logger.warning("⚠️ 早期推荐问题任务超时或失败，回退到直接生成")
-        try:
-            result_state = question_recommender(deepcopy(state))
-            if "recommended_questions" in result_state:
-                state["recommended_questions"] = result_state.get(
-                    "recommended_questions", []
-                )
-            else:
-                state["recommended_questions"] = []
-        except Exception as e:
-            logger.error(f"回退生成推荐问题失败: {e}", exc_info=True)
+        state = await parallel_collect(state, tasks=["question_recommender"])
+        if "recommended_questions" not in state:
             state["recommended_questions"] = []
 
     return state
@@ -49,7 +49,8 @@ async def unified_collect(state: AgentState) -> AgentState:
     try:
         if "_early_recommender_task_id" in state and state.get("_early_recommender_task_id"):
             logger.info("📋 等待并合并推荐问题...")
-            state = wait_and_merge_early_recommender(state)
+            # 在事件循环中等待早期任务，超时回退生成同样提交到旁路任务执行器
+            state = await wait_and_merge_early_recommender(state)
             logger.info("✅ 推荐问题合并完成")
         else:
             # 如果没有早期任务，推荐问题应该在 parallel_collector 中已经生成
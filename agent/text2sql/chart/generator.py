@@ -53,6 +53,10 @@ def prepare_data_for_json(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return converted_data
 
 
+# 作为旁路任务执行时读取的状态字段（只读，不修改其中的对象）
+CHART_GENERATOR_INPUT_KEYS = ("user_query", "execution_result", "generated_sql", "filtered_sql", "chart_type")
+
+
 def chart_generator(state: AgentState) -> AgentState:
     """
     图表配置生成节点
@@ -71,8 +75,7 @@ def chart_generator(state: AgentState) -> AgentState:
             logger.warning("SQL 执行失败或结果为空，跳过图表生成")
             return state
         
-        data = execution_result.data or []
-        if not data:
+        if not execution_result.row_count:
             logger.warning("SQL 执行结果数据为空，跳过图表生成")
             return state
         
@@ -88,7 +91,7 @@ def chart_generator(state: AgentState) -> AgentState:
         prompt_builder = PromptBuilder()
         
         # 将数据转换为字符串（限制数据量，避免提示词过长）
-        data_preview = data[:10]  # 只使用前10条数据作为示例
+        data_preview = execution_result.to_records(limit=10)  # 只使用前10条数据作为示例
         # 转换Decimal、datetime等类型为JSON可序列化的格式
         data_preview_converted = prepare_data_for_json(data_preview)
         data_str = json.dumps(data_preview_converted, ensure_ascii=False, indent=2)
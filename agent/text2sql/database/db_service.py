@@ -1,8 +1,15 @@
 import warnings
 
-from sqlalchemy import create_engine
-
-from common.datasource_util import DatasourceConfigUtil, DatasourceConnectionUtil, DB, ConnectType
+from common.datasource_util import (
+    DatasourceConfigUtil,
+    DatasourceConnectionUtil,
+    DB,
+    ConnectType,
+    SQL_RESULT_MAX_BYTES,
+    SQL_RESULT_MAX_ROWS,
+    get_datasource_pool_registry,
+    get_datasource_version,
+)
 from model import Datasource
 
 warnings.filterwarnings("ignore", message=".*pkg_resources.*deprecated.*")
@@ -10,27 +17,38 @@ warnings.filterwarnings("ignore", message=".*pkg_resources.*deprecated.*")
 import json
 import logging
 import os
-import re
 import time
 from typing import Dict, List, Tuple, Optional
 from threading import Lock
 from concurrent.futures import ThreadPoolExecutor
 
 import faiss
-import jieba
+import httpx
 import numpy as np
-import pandas as pd
-import requests
 
 # Langfuse OpenAI 延迟导入，避免在模块加载时触发 Langfuse 客户端初始化
 # from langfuse.openai import OpenAI
-from rank_bm25 import BM25Okapi
 from sqlalchemy.inspection import inspect
 from sqlalchemy.sql.expression import text
 
 from agent.text2sql.state.agent_state import AgentState, ExecutionResult
+from agent.text2sql.database.retrieval_index import (
+    RetrievalCorpus,
+    build_table_document,
+    get_table_retrieval_index,
+    tokenize_text,
+)
+from common.model_registry import (
+    MODEL_TYPE_EMBEDDING,
+    MODEL_TYPE_RERANK,
+    config_fingerprint,
+    get_model_client,
+    get_model_config,
+    get_model_registry_version,
+)
+from common.rerank_client import get_rerank_client
 from model.db_connection_pool import get_db_pool
-from model.db_models import TAiModel, TDsPermission, TDsRules
+from model.db_models import TDsPermission, TDsRules
 from model.datasource_models import DatasourceTable, DatasourceField
 from agent.text2sql.permission.permission_retriever import get_user_permission_filters
 from sqlalchemy import select
@@ -50,56 +68,49 @@ _table_info_cache: Dict[Tuple[int, Optional[int]], Tuple[Dict[str, Dict], float]
 _cache_lock = Lock()
 CACHE_TTL = int(os.getenv("TABLE_INFO_CACHE_TTL", "300"))  # 缓存有效期（秒），默认5分钟
 
+# DatabaseService 实例缓存：按数据源复用 engine 和 embedding/rerank 客户端
+# 值为 (实例, 创建时间, (模型配置版本号, 数据源配置版本号))，模型或数据源配置变更（包括其它 worker 上的变更）后重建
+_service_cache: Dict[int, Tuple["DatabaseService", float, Tuple[int, int]]] = {}
+_service_cache_lock = Lock()
+SERVICE_CACHE_TTL = int(os.getenv("DB_SERVICE_CACHE_TTL", "600"))  # 实例缓存有效期（秒），默认10分钟
+
 
 # 嵌入模型配置
 def get_embedding_model_config():
     """
-    获取嵌入模型配置
+    获取嵌入模型配置（配置由模型配置注册表缓存）
     只查找 Embedding 类型的模型（model_type=2），不回退到 LLM
     如果没有配置，返回 None（将使用离线模型）
     """
-    with db_pool.get_session() as session:
-        # model_type: 2 -> Embedding
-        model = session.query(TAiModel).filter(TAiModel.model_type == 2, TAiModel.default_model == True).first()
-        
-        if not model:
-            # 尝试查找任何 embedding 模型
-            model = session.query(TAiModel).filter(TAiModel.model_type == 2).first()
-        
-        if not model:
-            # 没有找到在线模型，返回 None（将使用离线模型）
-            return None
-        
-        # 处理 base_url，确保包含协议前缀
-        base_url = (model.api_domain or "").strip()
-        if not base_url:
-            logger.warning("表结构检索使用的 embedding 模型 API Domain 为空，将使用离线模型")
-            return None
-        
-        if not base_url.startswith(("http://", "https://")):
-            # 本地地址默认 http，其它默认 https
-            if base_url.startswith(("localhost", "127.0.0.1", "0.0.0.0")):
-                base_url = f"http://{base_url}"
-            else:
-                base_url = f"https://{base_url}"
-        
-        return {"name": model.base_model, "api_key": model.api_key, "base_url": base_url}
+    model = get_model_config(MODEL_TYPE_EMBEDDING)
+    if not model:
+        # 没有找到在线模型，返回 None（将使用离线模型）
+        return None
+
+    # 处理 base_url，确保包含协议前缀
+    base_url = (model["api_domain"] or "").strip()
+    if not base_url:
+        logger.warning("表结构检索使用的 embedding 模型 API Domain 为空，将使用离线模型")
+        return None
+
+    if not base_url.startswith(("http://", "https://")):
+        # 本地地址默认 http，其它默认 https
+        if base_url.startswith(("localhost", "127.0.0.1", "0.0.0.0")):
+            base_url = f"http://{base_url}"
+        else:
+            base_url = f"https://{base_url}"
+
+    return {"name": model["base_model"], "api_key": model["api_key"], "base_url": base_url}
 
 
 # 重排模型配置
 def get_rerank_model_config():
-    with db_pool.get_session() as session:
-        # model_type: 3 -> Rerank
-        model = session.query(TAiModel).filter(TAiModel.model_type == 3, TAiModel.default_model == True).first()
-
-        if not model:
-            # Fallback
-            model = session.query(TAiModel).filter(TAiModel.model_type == 3).first()
+    """获取重排模型配置（配置由模型配置注册表缓存）"""
+    model = get_model_config(MODEL_TYPE_RERANK)
+    if not model:
+        return None
 
-        if not model:
-            return None
-
-        return {"name": model.base_model, "api_key": model.api_key, "base_url": model.api_domain}
+    return {"name": model["base_model"], "api_key": model["api_key"], "base_url": model["api_domain"]}
 
 
 # 全局变量占位，实际使用时动态获取或在 init 中初始化
@@ -131,12 +142,8 @@ class DatabaseService:
                         db_enum = DB.get_db(ds.type, default_if_none=True)
                         if db_enum.connect_type == ConnectType.sqlalchemy:
                             config = DatasourceConfigUtil.decrypt_config(ds.configuration)
-                            uri = DatasourceConnectionUtil.build_connection_uri(ds.type, config)
-                            # SQL Server 2022 需要禁用加密以兼容 pymssql
-                            if ds.type == "sqlServer":
-                                self._engine = create_engine(uri, connect_args={"encryption": "off"})
-                            else:
-                                self._engine = create_engine(uri)
+                            # 从进程级连接池注册表复用 engine，避免每次问答重新建立连接
+                            self._engine = get_datasource_pool_registry().get_engine(ds.type, config, datasource_id)
                             logger.info(f"Initialized DatabaseService with datasource_id: {datasource_id}")
                         else:
                             # 对于使用原生驱动的数据库（如 Doris），不创建 SQLAlchemy engine
@@ -147,11 +154,6 @@ class DatabaseService:
         if not self._engine:
             self._engine = db_pool.get_engine()
 
-        self._faiss_index: Optional[faiss.Index] = None
-        self._table_names: List[str] = []
-        self._corpus: List[str] = []
-        self._tokenized_corpus: List[List[str]] = []
-        self._index_initialized: bool = False
         self.USE_RERANKER: bool = True  # 是否启用重排序器
 
         # Initialize clients lazily or now
@@ -162,7 +164,10 @@ class DatabaseService:
                 # 延迟导入，避免在模块加载时触发 Langfuse 客户端初始化
                 from langfuse.openai import OpenAI
                 self.embedding_model_name = emb_config["name"]
-                self.embedding_client = OpenAI(api_key=emb_config["api_key"] or "empty", base_url=emb_config["base_url"])
+                self.embedding_client = get_model_client(
+                    ("langfuse-openai", emb_config["base_url"], config_fingerprint(emb_config)),
+                    lambda: OpenAI(api_key=emb_config["api_key"] or "empty", base_url=emb_config["base_url"]),
+                )
                 self.use_local_embedding = False
                 logger.info(f"✅ 使用在线 embedding 模型: {self.embedding_model_name}")
             except Exception as e:
@@ -177,17 +182,16 @@ class DatabaseService:
             self.use_local_embedding = True
 
         try:
-            rerank_config = get_rerank_model_config()
-            if rerank_config:
-                self.rerank_model_name = rerank_config["name"]
-                self.rerank_api_key = rerank_config["api_key"]
-                self.rerank_base_url = rerank_config["base_url"]
+            # 未配置在线重排模型时，若设置了 RERANK_LOCAL_MODEL 则使用离线 CrossEncoder
+            self.reranker = get_rerank_client(get_rerank_model_config())
+            if self.reranker is not None:
                 self.USE_RERANKER = True
             else:
                 self.USE_RERANKER = False
                 logger.warning("未配置重排模型，重排功能将被禁用")
         except Exception as e:
             logger.error(f"初始化重排模型失败: {e}")
+            self.reranker = None
             self.USE_RERANKER = False
 
     @staticmethod
@@ -195,9 +199,7 @@ class DatabaseService:
         """
         对中文/英文文本进行分词，过滤标点符号。
         """
-        filtered_text = re.sub(r"[^\u4e00-\u9fa5a-zA-Z0-9]", " ", text_str)
-        tokens = jieba.lcut(filtered_text, cut_all=False)
-        return [token.strip() for token in tokens if token.strip()]
+        return tokenize_text(text_str)
 
     def _get_table_comment(self, table_name: str) -> str:
         """
@@ -336,14 +338,7 @@ class DatabaseService:
         """
         构建用于检索的文档文本（表名 + 注释 + 字段名 + 字段注释）。
         """
-        parts = [table_name]
-        if table_info.get("table_comment"):
-            parts.append(table_info["table_comment"])
-        for col_name, col_info in table_info.get("columns", {}).items():
-            parts.append(col_name)
-            if col_info.get("comment"):
-                parts.append(col_info["comment"])
-        return " ".join(parts)
+        return build_table_document(table_name, table_info)
 
     def _fetch_all_table_info(self, user_id: Optional[int] = None, use_cache: bool = True) -> Dict[str, Dict]:
         """
@@ -588,64 +583,6 @@ class DatabaseService:
 
         return table_info
 
-    def _get_precomputed_embeddings(self, table_info: Dict[str, Dict]) -> Tuple[Optional[np.ndarray], List[str], List[str]]:
-        """
-        尝试从数据库获取预计算的 embedding。
-        仅从 t_datasource_table.embedding 字段读取，不做任何实时计算。
-
-        Returns:
-            (预计算的 embedding 数组, 有预计算 embedding 的表名列表, 需要计算的表名列表)
-        """
-        if not self._datasource_id:
-            return None, [], list(table_info.keys())
-        
-        try:
-            with db_pool.get_session() as session:
-                # 查询数据源下的所有表（不再按表名过滤，避免大小写不一致导致漏查）
-                tables = (
-                    session.query(DatasourceTable)
-                    .filter(DatasourceTable.ds_id == self._datasource_id)
-                    .all()
-                )
-                
-                # 构建表名到表的映射（不区分大小写，兼容 Oracle 等会返回大写表名的数据库）
-                table_map = {str(table.table_name).upper(): table for table in tables}
-                
-                # 收集有预计算 embedding 的表
-                precomputed_embeddings = []
-                precomputed_table_names = []
-                missing_table_names = []
-                
-                for table_name, info in table_info.items():
-                    # 统一按大写匹配，避免 T_ALARM_INFO / t_alarm_info 不一致导致无法命中
-                    table = table_map.get(str(table_name).upper())
-                    # 检查是否有 embedding 字段（通过 hasattr 检查，避免字段不存在时报错）
-                    if table and hasattr(table, 'embedding') and table.embedding:
-                        try:
-                            embedding_vec = json.loads(table.embedding)
-                            if isinstance(embedding_vec, list) and len(embedding_vec) > 0:
-                                precomputed_embeddings.append(embedding_vec)
-                                precomputed_table_names.append(table_name)
-                            else:
-                                missing_table_names.append(table_name)
-                        except Exception as e:
-                            logger.debug(f"解析表 {table_name} 的 embedding 失败: {e}")
-                            missing_table_names.append(table_name)
-                    else:
-                        missing_table_names.append(table_name)
-                
-                if precomputed_embeddings:
-                    embeddings_array = np.array(precomputed_embeddings).astype("float32")
-                    faiss.normalize_L2(embeddings_array)
-                    logger.info(f"✅ 从数据库加载了 {len(precomputed_embeddings)} 个预计算的 embedding")
-                    return embeddings_array, precomputed_table_names, missing_table_names
-                else:
-                    return None, [], missing_table_names
-                    
-        except Exception as e:
-            logger.warning(f"⚠️ 获取预计算 embedding 失败: {e}")
-            return None, [], list(table_info.keys())
-
     def _create_embeddings_with_dashscope(self, texts: List[str]) -> np.ndarray:
         """
         生成文本嵌入向量。
@@ -706,87 +643,35 @@ class DatabaseService:
         logger.info(f"✅ 在线模型嵌入生成完成，耗时 {time.time() - start_time:.2f}s")
         return embeddings
 
-    def _initialize_vector_index(self, table_info: Dict[str, Dict]):
+    def _get_retrieval_corpus(self, table_info: Dict[str, Dict]) -> RetrievalCorpus:
         """
-        初始化 FAISS 向量索引：从数据库读取预计算的 embedding 并构建内存索引。
-        仅使用预计算的 embedding，不在检索时做实时计算。
+        获取检索语料：分词结果、BM25 统计和 FAISS 索引由数据源级检索索引统一维护并持久化，
+        表结构未变化时直接复用。语料中表的顺序与 table_info 的键顺序一致。
         """
-        if self._index_initialized:
-            return
+        return get_table_retrieval_index(self._datasource_id).get_corpus(table_info)
 
-        # 构建新索引
-        logger.info("🏗️ 开始构建向量索引（从数据库读取 embedding）...")
-        start_time = time.time()
-
-        # 记录所有表名和语料（用于 BM25 等）
-        self._table_names = list(table_info.keys())
-        self._corpus = [self._build_document(name, info) for name, info in table_info.items()]
-
-        # 从数据库获取预计算的 embedding（不会做任何实时计算）
-        precomputed_embeddings, precomputed_table_names, missing_table_names = self._get_precomputed_embeddings(
-            table_info
-        )
-
-        # 如果没有任何预计算 embedding，则禁用向量索引（仅使用 BM25）
-        if precomputed_embeddings is None or len(precomputed_table_names) == 0:
-            logger.warning("⚠️ 未找到任何预计算的表结构 embedding，向量检索将被禁用，仅使用 BM25")
-            self._faiss_index = None
-            self._index_initialized = True
-            return
-
-        # 如果存在缺失的 embedding，为避免索引和表顺序不一致，这里直接禁用向量检索
-        if len(missing_table_names) > 0:
-            logger.warning(
-                f"⚠️ 共有 {len(missing_table_names)} 张表缺少预计算 embedding，"
-                "为保证索引与表顺序一致，本次禁用向量检索，仅使用 BM25"
-            )
-            self._faiss_index = None
-            self._index_initialized = True
-            return
-
-        # 此时说明所有表都存在预计算 embedding，顺序与 self._table_names 一致
-        embeddings = precomputed_embeddings
-
-        if embeddings.size == 0:
-            logger.error("❌ 无法生成嵌入，索引构建失败")
-            return
-
-        # 初始化 FAISS 索引（仅在内存中）
-        dimension = embeddings.shape[1]
-        self._faiss_index = faiss.IndexFlatIP(dimension)  # 内积 = 余弦相似度
-        self._faiss_index.add(embeddings)
-
-        elapsed = time.time() - start_time
-        logger.info(f"🎉 向量索引构建完成，共 {len(self._table_names)} 张表，耗时 {elapsed:.2f}s")
-        self._index_initialized = True
-
-    def _retrieve_by_vector(self, query: str, top_k: int = 10) -> List[int]:
+    def _retrieve_by_vector(self, query: str, top_k: int = 10, faiss_index: Optional[faiss.Index] = None) -> List[int]:
         """
         使用向量相似度检索最相关的表。
         优先使用在线模型，如果没有配置则使用离线模型。
         """
-        if not self._faiss_index:
+        if not faiss_index:
             logger.error("❌ 向量索引未初始化")
             return []
 
         try:
-            # 生成查询向量
-            if self.use_local_embedding or not self.embedding_client:
-                # 使用离线模型
-                from common.local_embedding import generate_embedding_local_sync
-                embedding = generate_embedding_local_sync(query)
-                if not embedding:
-                    logger.warning("⚠️ 离线模型生成 embedding 失败，跳过向量检索")
-                    return []
-                query_vec = np.array([embedding]).astype("float32")
-            else:
-                # 使用在线模型
-                response = self.embedding_client.embeddings.create(model=self.embedding_model_name, input=query)
-                query_vec = np.array([response.data[0].embedding]).astype("float32")
+            # 生成查询向量（与术语、训练示例检索共用查询 embedding 缓存，同一问题只调用一次模型）
+            from services.embedding_service import get_query_embedding_sync
+
+            embedding = get_query_embedding_sync(query)
+            if not embedding:
+                logger.warning("⚠️ 生成查询 embedding 失败，跳过向量检索")
+                return []
+            query_vec = np.array([embedding]).astype("float32")
             
             # 检查维度是否匹配
             query_dim = query_vec.shape[1]
-            index_dim = self._faiss_index.d
+            index_dim = faiss_index.d
             if query_dim != index_dim:
                 logger.error(
                     f"❌ 向量维度不匹配：查询向量维度={query_dim}，索引维度={index_dim}。"
@@ -796,41 +681,22 @@ class DatabaseService:
                 return []
             
             faiss.normalize_L2(query_vec)
-            _, indices = self._faiss_index.search(query_vec, top_k)
+            _, indices = faiss_index.search(query_vec, top_k)
             return indices[0].tolist()
         except Exception as e:
             logger.error(f"❌ 向量检索失败: {e}", exc_info=True)
             return []
 
-    def _retrieve_by_bm25(self, table_info: Dict[str, Dict], user_query: str) -> List[int]:
+    def _retrieve_by_bm25(self, corpus: RetrievalCorpus, user_query: str) -> List[int]:
         """
         使用 BM25 算法进行关键词匹配检索。
         """
-        if not user_query or not table_info:
-            return list(range(len(table_info)))
+        if not user_query or not corpus.table_names:
+            return list(range(len(corpus.table_names)))
 
         logger.info("🔄 执行 BM25 检索...")
-        self._corpus = [self._build_document(name, info) for name, info in table_info.items()]
-        self._tokenized_corpus = [self._tokenize_text(doc) for doc in self._corpus]
         query_tokens = self._tokenize_text(user_query)
-
-        bm25 = BM25Okapi(self._tokenized_corpus)
-        doc_scores = bm25.get_scores(query_tokens)
-
-        # 增强：若查询词出现在表注释中，则提升分数
-        enhanced_scores = doc_scores.copy()
-        table_comments = [info.get("table_comment", "") for info in table_info.values()]
-        for i, (comment, score) in enumerate(zip(table_comments, doc_scores)):
-            if score <= 0:
-                continue
-            comment_tokens = self._tokenize_text(comment)
-            overlap = set(query_tokens) & set(comment_tokens)
-            if overlap:
-                overlap_ratio = len(overlap) / len(set(query_tokens))
-                enhanced_scores[i] += score * overlap_ratio * 1.5
-
-        scored_indices = sorted(enumerate(enhanced_scores), key=lambda x: x[1], reverse=True)
-        return [idx for idx, _ in scored_indices]
+        return corpus.rank_by_bm25(query_tokens)
 
     @staticmethod
     def _rrf_fusion(bm25_indices: List[int], vector_indices: List[int], k: int = 60) -> List[int]:
@@ -847,99 +713,29 @@ class DatabaseService:
 
     def _rerank_with_dashscope(self, query: str, candidate_tables: Dict[str, Dict]) -> List[Tuple[str, float]]:
         """
-        使用 DashScope 重排 API 对候选表进行重排序。
+        使用重排模型（DashScope / 通用 rerank API / 离线 CrossEncoder）对候选表进行重排序。
+        重排结果按文档下标映射回表名，并由 RerankClient 按问题与候选集合缓存。
         """
-        if not self.USE_RERANKER:
+        if not self.USE_RERANKER or self.reranker is None:
             logger.debug("⏭️ Reranker 已禁用或配置不完整，跳过重排序")
             return [(name, 1.0) for name in candidate_tables.keys()]
 
         try:
-            documents = []
-            name_to_text = {}
-            for table_name, info in candidate_tables.items():
-                doc_text = self._build_document(table_name, info)
-                documents.append(doc_text)
-                name_to_text[table_name] = doc_text
-
+            table_names = list(candidate_tables.keys())
+            documents = [self._build_document(name, candidate_tables[name]) for name in table_names]
             if not documents:
                 return []
 
-            logger.info(f"🔁 调用重排模型 {self.rerank_model_name} 进行重排序...")
+            logger.info(f"🔁 调用重排模型 {self.reranker.model_name} 进行重排序...")
+            ranked = self.reranker.rerank(query, documents)
+            if not ranked:
+                logger.warning("⚠️ Rerank API 返回格式异常")
+                return [(name, 1.0) for name in table_names]
 
-            # 根据API类型选择不同的请求结构
-            if "aliyuncs" in self.rerank_base_url or "Qwen" in self.rerank_model_name:
-                # 阿里云 DashScope 格式
-                payload = {
-                    "model": self.rerank_model_name,
-                    "input": {"query": query, "documents": documents},
-                    "parameters": {"top_n": len(documents), "return_documents": False},
-                }
-            else:
-                # 其他格式（如本地模型或通用rerank API）
-                payload = {"query": query, "documents": documents}
-
-            # 设置请求头
-            headers = {"Authorization": f"Bearer {self.rerank_api_key}", "Content-Type": "application/json"}
-
-            # 调用重排 API
-            response = requests.post(self.rerank_base_url, headers=headers, json=payload, timeout=30)
-
-            # 检查响应状态
-            if response.status_code != 200:
-                logger.warning(f"⚠️ Rerank API 调用失败: {response.status_code} - {response.text}")
-                return [(name, 1.0) for name in candidate_tables.keys()]
-
-            # 解析响应
-            result_data = response.json()
-
-            # 根据API类型解析响应
-            if "aliyuncs" in self.rerank_base_url or "Qwen" in self.rerank_model_name:
-                # 阿里云格式响应
-                if "output" in result_data and "results" in result_data["output"]:
-                    results = []
-                    for item in result_data["output"]["results"]:
-                        idx = item["index"]
-                        score = item["relevance_score"]
-                        table_name = next(name for name, text in name_to_text.items() if text == documents[idx])
-                        results.append((table_name, score))
-
-                    results.sort(key=lambda x: x[1], reverse=True)
-                    logger.info("✅ Rerank 完成")
-                    return results
-            else:
-                # 通用格式响应 - 假设直接返回排序结果
-                if "results" in result_data:
-                    results = []
-                    for item in result_data["results"]:
-                        if "index" in item and "relevance_score" in item:  # 使用relevance_score
-                            idx = item["index"]
-                            score = item["relevance_score"]  # 使用relevance_score字段
-                            # 从document对象中提取文本
-                            if "document" in item and "text" in item["document"]:
-                                doc_text = item["document"]["text"]
-                                table_name = next(name for name, text in name_to_text.items() if text == doc_text)
-                            else:
-                                table_name = next(name for name, text in name_to_text.items() if text == documents[idx])
-                            results.append((table_name, score))
-                    results.sort(key=lambda x: x[1], reverse=True)
-                    logger.info("✅ Rerank 完成")
-                    return results
-                elif isinstance(result_data, list):
-                    # 假设直接返回了排序后的索引列表
-                    results = []
-                    for i, item in enumerate(result_data):
-                        if isinstance(item, dict) and "index" in item:
-                            idx = item["index"]
-                            score = item.get("score", 1.0 - i * 0.01)  # 默认分数递减
-                            table_name = next(name for name, text in name_to_text.items() if text == documents[idx])
-                            results.append((table_name, score))
-                    logger.info("✅ Rerank 完成")
-                    return results
-
-            logger.warning("⚠️ Rerank API 返回格式异常")
-            return [(name, 1.0) for name in candidate_tables.keys()]
+            logger.info("✅ Rerank 完成")
+            return [(table_names[idx], score) for idx, score in ranked]
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"❌ Rerank API 请求失败: {e}")
             return [(name, 1.0) for name in candidate_tables.keys()]
         except Exception as e:
@@ -1177,16 +973,17 @@ class DatabaseService:
             # 确保 user_query 也在返回的 state 中（虽然它应该已经在初始 state 中了）
             state["user_query"] = user_query
 
-            # 初始化向量索引
-            self._initialize_vector_index(all_table_info)
+            # 获取检索语料（语料中表的顺序与 table_names 一致）
+            table_names = list(all_table_info.keys())
+            corpus = self._get_retrieval_corpus(all_table_info)
 
             # 混合检索 - 并行执行 BM25 和向量检索以提高性能
             logger.info("🔍 开始混合检索：BM25 + 向量检索（并行执行）")
             
             # 使用线程池并行执行 BM25 和向量检索
             with ThreadPoolExecutor(max_workers=2) as executor:
-                bm25_future = executor.submit(self._retrieve_by_bm25, all_table_info, user_query)
-                vector_future = executor.submit(self._retrieve_by_vector, user_query, 20)
+                bm25_future = executor.submit(self._retrieve_by_bm25, corpus, user_query)
+                vector_future = executor.submit(self._retrieve_by_vector, user_query, 20, corpus.faiss_index)
                 
                 # 等待两个任务完成
                 bm25_top_indices = bm25_future.result()
@@ -1218,7 +1015,7 @@ class DatabaseService:
                 if score >= 0.01 and len(selected_indices) < 10:
                     selected_indices.append(idx)
 
-            candidate_table_names = [self._table_names[i] for i in selected_indices]
+            candidate_table_names = [table_names[i] for i in selected_indices]
             candidate_table_info = {name: all_table_info[name] for name in candidate_table_names}
 
             # 重排序
@@ -1235,8 +1032,8 @@ class DatabaseService:
             logger.info("🔍 用户查询: %s", user_query)
             logger.info("📊 检索与排序结果:")
             for i, table_name in enumerate(final_table_names[:TABLE_RETURN_COUNT]):
-                if table_name in self._table_names:
-                    bm25_idx = self._table_names.index(table_name)
+                if table_name in table_names:
+                    bm25_idx = table_names.index(table_name)
                     bm25_rank = bm25_top_indices.index(bm25_idx) + 1 if bm25_idx in bm25_top_indices else "-"
                     vector_rank = vector_top_indices.index(bm25_idx) + 1 if bm25_idx in vector_top_indices else "-"
                     rerank_score = next((score for name, score in reranked_results if name == table_name), 0.0)
@@ -1298,22 +1095,70 @@ class DatabaseService:
                 # 对于原生驱动的数据库，使用 DatasourceConnectionUtil.execute_query
                 logger.info(f"使用原生驱动执行 SQL（数据源类型: {self._datasource_type}）")
                 config = DatasourceConfigUtil.decrypt_config(self._datasource_config)
-                result_data = DatasourceConnectionUtil.execute_query(
-                    self._datasource_type, config, sql_to_execute
+                columns, column_data, truncated = DatasourceConnectionUtil.execute_query_columnar(
+                    self._datasource_type, config, sql_to_execute, self._datasource_id
                 )
-                state["execution_result"] = ExecutionResult(success=True, data=result_data)
-                logger.info(f"✅ SQL 执行成功（原生驱动），返回 {len(result_data)} 条记录")
             else:
-                # 对于 SQLAlchemy 驱动的数据库，使用 engine 执行
+                # 对于 SQLAlchemy 驱动的数据库，使用服务端游标分批拉取，避免大结果集一次性载入内存；
+                # 结果被截断时作废连接，而不是关闭结果集（关闭时会读完剩余结果）
                 with self._engine.connect() as connection:
-                    result = connection.execute(text(sql_to_execute))
-                    result_data = result.fetchall()
-                    columns = result.keys()
-                    frame = pd.DataFrame(result_data, columns=columns)
-                    state["execution_result"] = ExecutionResult(success=True, data=frame.to_dict(orient="records"))
-                    logger.info(f"✅ SQL 执行成功，返回 {len(result_data)} 条记录")
+                    columns, column_data, truncated = DatasourceConnectionUtil.stream_query_columnar(
+                        connection, sql_to_execute
+                    )
+
+            execution_result = ExecutionResult(
+                success=True, columns=columns, column_data=column_data, truncated=truncated
+            )
+            state["execution_result"] = execution_result
+            logger.info(f"✅ SQL 执行成功，返回 {execution_result.row_count} 条记录")
+            if truncated:
+                logger.warning(
+                    f"⚠️ 查询结果超过上限（{SQL_RESULT_MAX_ROWS} 行 / {SQL_RESULT_MAX_BYTES} 字节），已截断为 {execution_result.row_count} 条"
+                )
         except Exception as e:
             error_msg = f"执行 SQL 失败: {e}"
             logger.error(error_msg, exc_info=True)
             state["execution_result"] = ExecutionResult(success=False, error=str(e))
         return state
+
+
+def get_database_service(datasource_id: Optional[int] = None) -> DatabaseService:
+    """
+    获取数据源对应的 DatabaseService（进程内缓存）
+    避免每次问答都重新查询 embedding/rerank 模型配置、创建客户端和构建向量索引
+    """
+    cache_key = datasource_id or 0
+    # 实例在初始化时解析 embedding 客户端和重排客户端，模型配置版本变化后必须重建，
+    # 否则文档 embedding 仍使用旧模型，而查询 embedding 已切换到新模型；
+    # 实例还持有数据源配置和 engine，数据源配置在任一 worker 中变更后（共享版本号递增）同样重建
+    version = (get_model_registry_version(), get_datasource_version(datasource_id))
+    with _service_cache_lock:
+        cached = _service_cache.get(cache_key)
+        if cached and cached[2] == version and time.time() - cached[1] < SERVICE_CACHE_TTL:
+            return cached[0]
+
+    # 实例初始化涉及数据库查询，放在锁外执行；并发创建时以后写入的为准
+    service = DatabaseService(datasource_id)
+    with _service_cache_lock:
+        _service_cache[cache_key] = (service, time.time(), version)
+    return service
+
+
+def invalidate_database_service(datasource_id: Optional[int] = None):
+    """
+    失效 DatabaseService 实例缓存和表结构缓存
+    :param datasource_id: 数据源ID，为空时清空全部缓存（如模型配置变更）
+    """
+    with _service_cache_lock:
+        if datasource_id is None:
+            _service_cache.clear()
+        else:
+            _service_cache.pop(datasource_id, None)
+
+    with _cache_lock:
+        if datasource_id is None:
+            _table_info_cache.clear()
+        else:
+            for key in [key for key in _table_info_cache if key[0] == datasource_id]:
+                _table_info_cache.pop(key, None)
+    logger.info(f"已失效 DatabaseService 缓存 (datasource_id={datasource_id if datasource_id is not None else 'ALL'})")
@@ -0,0 +1,647 @@
+"""
+表结构混合检索索引（BM25 + FAISS）
+
+按数据源维护一份可持久化的检索索引：
+- 分词结果按文本内容哈希缓存，表结构不变时不再重复调用 jieba 分词
+- 表 embedding 只在首次使用或被标记失效时从 t_datasource_table 一次性批量读取
+- BM25 统计与 FAISS 矩阵按语料签名（表名 + 文档哈希）缓存，语料不变时直接复用
+- 索引持久化到 VECTOR_INDEX_DIR 下，多 worker 之间通过文件修改时间感知彼此的更新
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional
+
+import faiss
+import jieba
+import numpy as np
+from rank_bm25 import BM25Okapi
+from sqlalchemy import text
+
+from model.db_connection_pool import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+db_pool = get_db_pool()
+
+# 索引文件格式版本，格式变化时递增，旧文件会被忽略并重建
+INDEX_FORMAT_VERSION = 1
+# 持久化目录（与会话历史向量索引共用根目录）
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+TABLE_INDEX_DIR = os.path.join(VECTOR_INDEX_DIR, "table_index")
+# 每个数据源缓存的语料数量（不同用户的权限过滤结果可能不同）
+VECTOR_INDEX_CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "16"))
+
+
+def tokenize_text(text_str: str) -> List[str]:
+    """
+    对中文/英文文本进行分词，过滤标点符号。
+    """
+    filtered_text = re.sub(r"[^\u4e00-\u9fa5a-zA-Z0-9]", " ", text_str)
+    tokens = jieba.lcut(filtered_text, cut_all=False)
+    return [token.strip() for token in tokens if token.strip()]
+
+
+def build_table_document(table_name: str, table_info: dict) -> str:
+    """
+    构建用于检索的文档文本（表名 + 注释 + 字段名 + 字段注释）。
+    """
+    parts = [table_name]
+    if table_info.get("table_comment"):
+        parts.append(table_info["table_comment"])
+    for col_name, col_info in table_info.get("columns", {}).items():
+        parts.append(col_name)
+        if col_info.get("comment"):
+            parts.append(col_info["comment"])
+    return " ".join(parts)
+
+
+def _text_hash(text_str: str) -> str:
+    return hashlib.sha1(text_str.encode("utf-8")).hexdigest()[:16]
+
+
+def _decode_vector_send(blobs: List[bytes]) -> List[np.ndarray]:
+    """
+    解析 pgvector vector_send 的二进制格式：2 字节维度 + 2 字节保留位 + 维度个大端 float32。
+    维度一致时拼成一块连续缓冲区一次性解析，避免逐行拷贝。
+    """
+    sizes = {len(blob) for blob in blobs}
+    if len(sizes) == 1:
+        width = sizes.pop() // 4
+        matrix = np.frombuffer(b"".join(blobs), dtype=">f4").reshape(len(blobs), width)[
+            :, 1:
+        ]
+        matrix = np.ascontiguousarray(matrix, dtype="float32")
+        faiss.normalize_L2(matrix)
+        return list(matrix)
+
+    vectors = []
+    for blob in blobs:
+        vec = (
+            np.frombuffer(blob, dtype=">f4", offset=4).astype("float32").reshape(1, -1)
+        )
+        faiss.normalize_L2(vec)
+        vectors.append(vec[0])
+    return vectors
+
+
+def load_table_embeddings(datasource_id: int) -> Optional[Dict[str, np.ndarray]]:
+    """
+    一次查询读取数据源下全部表的 embedding，返回 大写表名 -> 归一化向量。
+    优先以 pgvector 二进制格式读取；列尚未迁移为 VECTOR 类型时回退为解析 JSON 文本。
+
+    Returns:
+        读取失败时返回 None
+    """
+    try:
+        with db_pool.get_session() as session:
+            rows = session.execute(
+                text("""
+                    SELECT table_name, vector_send(embedding)
+                    FROM t_datasource_table
+                    WHERE ds_id = :ds_id AND embedding IS NOT NULL
+                    """),
+                {"ds_id": datasource_id},
+            ).all()
+        names = [str(name).upper() for name, _ in rows]
+        # 统一按大写匹配，兼容 Oracle 等会返回大写表名的数据库
+        return (
+            dict(zip(names, _decode_vector_send([bytes(blob) for _, blob in rows])))
+            if rows
+            else {}
+        )
+    except Exception as e:
+        logger.debug(f"以二进制格式读取表 embedding 失败，回退为 JSON 文本: {e}")
+
+    try:
+        with db_pool.get_session() as session:
+            rows = session.execute(
+                text("""
+                    SELECT table_name, CAST(embedding AS TEXT)
+                    FROM t_datasource_table
+                    WHERE ds_id = :ds_id AND embedding IS NOT NULL
+                    """),
+                {"ds_id": datasource_id},
+            ).all()
+    except Exception as e:
+        logger.warning(f"⚠️ 获取预计算 embedding 失败: {e}")
+        return None
+
+    result = {}
+    for name, raw in rows:
+        try:
+            values = json.loads(raw)
+            if isinstance(values, list) and len(values) > 0:
+                vec = np.array([values], dtype="float32")
+                faiss.normalize_L2(vec)
+                result[str(name).upper()] = vec[0]
+        except Exception as e:
+            logger.debug(f"解析表 {name} 的 embedding 失败: {e}")
+    return result
+
+
+class RetrievalCorpus:
+    """
+    某一组表（语料）对应的检索结构，创建后只读，可在多个请求间并发使用。
+    表的顺序与构建时传入的 table_info 键顺序一致。
+    """
+
+    __slots__ = ("table_names", "bm25", "comment_tokens", "faiss_index", "token_keys")
+
+    def __init__(
+        self,
+        table_names: List[str],
+        bm25: Optional[BM25Okapi],
+        comment_tokens: List[set],
+        faiss_index: Optional[faiss.Index],
+        token_keys: frozenset,
+    ):
+        self.table_names = table_names
+        self.bm25 = bm25
+        self.comment_tokens = comment_tokens
+        self.faiss_index = faiss_index
+        # 该语料引用的分词缓存键，用于清理不再使用的分词结果
+        self.token_keys = token_keys
+
+    def rank_by_bm25(self, query_tokens: List[str]) -> List[int]:
+        """
+        BM25 检索，返回按得分降序排列的表下标；查询词出现在表注释中时提升分数。
+        """
+        if not self.bm25 or not query_tokens:
+            return list(range(len(self.table_names)))
+
+        doc_scores = self.bm25.get_scores(query_tokens)
+        enhanced_scores = doc_scores.copy()
+        query_set = set(query_tokens)
+        for i, score in enumerate(doc_scores):
+            if score <= 0:
+                continue
+            overlap = query_set & self.comment_tokens[i]
+            if overlap:
+                overlap_ratio = len(overlap) / len(query_set)
+                enhanced_scores[i] += score * overlap_ratio * 1.5
+
+        scored_indices = sorted(
+            enumerate(enhanced_scores), key=lambda x: x[1], reverse=True
+        )
+        return [idx for idx, _ in scored_indices]
+
+
+class TableRetrievalIndex:
+    """
+    单个数据源的表结构检索索引。
+
+    - _tokens：文本哈希 -> 分词结果（表文档与表注释共用）
+    - _embeddings：表名（大写） -> 归一化后的向量；值为 None 表示数据库中没有可用 embedding
+    - _corpora：语料签名 -> RetrievalCorpus（LRU）
+    """
+
+    def __init__(self, datasource_id: Optional[int]):
+        self.datasource_id = datasource_id
+        self._lock = Lock()
+        # 串行化写盘（在 _lock 之外执行），_save_seq / _saved_seq 保证旧快照不会覆盖新快照
+        self._save_lock = Lock()
+        self._save_seq = 0
+        self._saved_seq = 0
+        self._tokens: Dict[str, List[str]] = {}
+        self._embeddings: Dict[str, Optional[np.ndarray]] = {}
+        self._corpora: "OrderedDict[str, RetrievalCorpus]" = OrderedDict()
+        # 最近一次请求的 table_info 及其语料签名（_fetch_all_table_info 在缓存有效期内返回同一个对象）
+        self._last_table_info: Optional[Dict[str, Dict]] = None
+        self._last_signature: Optional[str] = None
+        self._persisted_mtime: Optional[int] = None
+        self._dirty = False
+        self._load()
+
+    # ---------------------------------------------------------------- 持久化
+
+    @property
+    def _meta_path(self) -> Optional[str]:
+        if not self.datasource_id:
+            return None
+        return os.path.join(TABLE_INDEX_DIR, f"ds_{self.datasource_id}.json")
+
+    def _matrix_files(self) -> List[str]:
+        """该数据源的向量文件（文件名带内容哈希，元数据中记录当前使用的文件）"""
+        if not self.datasource_id or not os.path.isdir(TABLE_INDEX_DIR):
+            return []
+        prefix = f"ds_{self.datasource_id}."
+        return [
+            os.path.join(TABLE_INDEX_DIR, name)
+            for name in os.listdir(TABLE_INDEX_DIR)
+            if name.startswith(prefix) and name.endswith(".npy")
+        ]
+
+    @staticmethod
+    def _schema_hash(tokens: Dict[str, List[str]], embedding_names: List[str]) -> str:
+        """索引内容的版本哈希，用于校验索引文件的完整性"""
+        payload = json.dumps(
+            {
+                "version": INDEX_FORMAT_VERSION,
+                "tokens": sorted(tokens.keys()),
+                "embeddings": embedding_names,
+            },
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _current_mtime(self) -> Optional[int]:
+        meta_path = self._meta_path
+        if not meta_path:
+            return None
+        try:
+            return os.stat(meta_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reset(self):
+        self._tokens = {}
+        self._embeddings = {}
+        self._corpora.clear()
+        self._last_table_info = None
+        self._last_signature = None
+
+    def _load(self):
+        """从磁盘加载索引，文件不存在、版本不一致或校验失败时从空索引开始"""
+        meta_path = self._meta_path
+        mtime = self._current_mtime()
+        self._persisted_mtime = mtime
+        if mtime is None:
+            return
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                logger.info(
+                    f"ℹ️ 数据源 {self.datasource_id} 的检索索引版本不一致，将重新构建"
+                )
+                return
+
+            tokens = meta.get("tokens") or {}
+            embedding_names = meta.get("embedding_names") or []
+            missing_names = meta.get("missing_embedding_names") or []
+            if meta.get("schema_hash") != self._schema_hash(tokens, embedding_names):
+                logger.warning(
+                    f"⚠️ 数据源 {self.datasource_id} 的检索索引校验失败，将重新构建"
+                )
+                return
+
+            embeddings: Dict[str, Optional[np.ndarray]] = {
+                name: None for name in missing_names
+            }
+            if embedding_names:
+                matrix = np.load(os.path.join(TABLE_INDEX_DIR, meta["matrix_file"]))
+                if matrix.shape[0] == len(embedding_names):
+                    for name, row in zip(embedding_names, matrix):
+                        embeddings[name] = row
+                else:
+                    # 向量文件与元数据不匹配（写入过程中被并发替换），丢弃向量，稍后从数据库重新读取
+                    logger.warning(
+                        f"⚠️ 数据源 {self.datasource_id} 的向量文件与元数据不一致，将重新读取 embedding"
+                    )
+                    embeddings = {}
+
+            self._tokens = tokens
+            self._embeddings = embeddings
+            self._corpora.clear()
+            self._last_table_info = None
+            self._last_signature = None
+            logger.info(
+                f"✅ 已加载数据源 {self.datasource_id} 的检索索引："
+                f"{len(tokens)} 条分词缓存，{len(embedding_names)} 个表向量"
+            )
+        except Exception as e:
+            logger.warning(
+                f"⚠️ 加载数据源 {self.datasource_id} 的检索索引失败，将重新构建: {e}"
+            )
+
+    def _snapshot(self) -> Optional[dict]:
+        """
+        在持有 _lock 时调用：分词或 embedding 有变化时返回待持久化的快照，否则返回 None。
+        快照只引用当前的分词结果与向量（均不会被原地修改），实际写盘在锁外由 _save 完成。
+        """
+        if not self._meta_path or not self._dirty:
+            return None
+
+        # 表结构多次变更后会留下旧文档的分词结果，超过引用量的两倍时清理
+        if self._corpora:
+            referenced = frozenset().union(
+                *(c.token_keys for c in self._corpora.values())
+            )
+            if len(self._tokens) > 2 * len(referenced):
+                self._tokens = {
+                    k: v for k, v in self._tokens.items() if k in referenced
+                }
+
+        # 只持久化维度一致的向量
+        embedding_names, rows, missing_names = [], [], []
+        dimension = None
+        for name, vec in self._embeddings.items():
+            if vec is None:
+                missing_names.append(name)
+                continue
+            if dimension is None:
+                dimension = vec.shape[0]
+            if vec.shape[0] == dimension:
+                embedding_names.append(name)
+                rows.append(vec)
+
+        self._dirty = False
+        self._save_seq += 1
+        return {
+            "seq": self._save_seq,
+            "tokens": dict(self._tokens),
+            "embedding_names": embedding_names,
+            "rows": rows,
+            "missing_names": missing_names,
+        }
+
+    def _save(self, snapshot: Optional[dict]):
+        """原子写入索引文件（先写临时文件再替换），在 _lock 之外调用，避免写盘阻塞检索"""
+        if snapshot is None:
+            return
+
+        meta_path = self._meta_path
+        with self._save_lock:
+            # 并发保存时，较旧的快照不能覆盖已写入的较新快照
+            if snapshot["seq"] <= self._saved_seq:
+                return
+            try:
+                os.makedirs(TABLE_INDEX_DIR, exist_ok=True)
+
+                tokens = snapshot["tokens"]
+                embedding_names = snapshot["embedding_names"]
+                rows = snapshot["rows"]
+                schema_hash = self._schema_hash(tokens, embedding_names)
+                suffix = f".{os.getpid()}.tmp"
+                # 向量文件名带上版本哈希，避免其它 worker 读到新向量配旧元数据
+                matrix_file = (
+                    f"ds_{self.datasource_id}.{schema_hash}.npy" if rows else None
+                )
+                if matrix_file:
+                    matrix_path = os.path.join(TABLE_INDEX_DIR, matrix_file)
+                    with open(matrix_path + suffix, "wb") as f:
+                        np.save(f, np.vstack(rows).astype("float32"))
+                    os.replace(matrix_path + suffix, matrix_path)
+
+                meta = {
+                    "version": INDEX_FORMAT_VERSION,
+                    "datasource_id": self.datasource_id,
+                    "schema_hash": schema_hash,
+                    "updated_at": time.time(),
+                    "tokens": tokens,
+                    "matrix_file": matrix_file,
+                    "embedding_names": embedding_names,
+                    "missing_embedding_names": snapshot["missing_names"],
+                }
+                with open(meta_path + suffix, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(meta_path + suffix, meta_path)
+
+                # 清理旧版本的向量文件
+                for path in self._matrix_files():
+                    if os.path.basename(path) != matrix_file:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+
+                self._saved_seq = snapshot["seq"]
+                mtime = self._current_mtime()
+                with self._lock:
+                    self._persisted_mtime = mtime
+            except Exception as e:
+                logger.warning(
+                    f"⚠️ 持久化数据源 {self.datasource_id} 的检索索引失败: {e}"
+                )
+                with self._lock:
+                    # 下次有变化时重新写入
+                    self._dirty = True
+
+    def _reload_if_changed(self):
+        """其它 worker 更新了索引文件时重新加载"""
+        if not self.datasource_id:
+            return
+        mtime = self._current_mtime()
+        if mtime == self._persisted_mtime:
+            return
+        if mtime is None:
+            # 索引文件被删除（数据源被删除或重建），丢弃内存中的索引
+            self._reset()
+            self._persisted_mtime = None
+            return
+        self._load()
+
+    # ---------------------------------------------------------------- 构建
+
+    def _get_tokens(self, text_str: str) -> List[str]:
+        key = _text_hash(text_str)
+        tokens = self._tokens.get(key)
+        if tokens is None:
+            tokens = tokenize_text(text_str)
+            self._tokens[key] = tokens
+            self._dirty = True
+        return tokens
+
+    def _load_embeddings(self, table_names: List[str]):
+        """从 t_datasource_table 读取尚未缓存的表 embedding"""
+        missing = [
+            name for name in table_names if str(name).upper() not in self._embeddings
+        ]
+        if not missing or not self.datasource_id:
+            return
+
+        start_time = time.time()
+        loaded_map = load_table_embeddings(self.datasource_id)
+        if loaded_map is None:
+            return
+
+        loaded = 0
+        for name in missing:
+            key = str(name).upper()
+            vec = loaded_map.get(key)
+            if vec is not None:
+                loaded += 1
+            self._embeddings[key] = vec
+        self._dirty = True
+        logger.info(
+            f"✅ 从数据库加载了 {loaded} 个预计算的 embedding，耗时 {time.time() - start_time:.2f}s"
+        )
+
+    def _build_corpus(
+        self, table_info: Dict[str, Dict], doc_texts: List[str]
+    ) -> RetrievalCorpus:
+        start_time = time.time()
+        table_names = list(table_info.keys())
+
+        comment_texts = [
+            info.get("table_comment", "") or "" for info in table_info.values()
+        ]
+        tokenized_corpus = [self._get_tokens(doc) for doc in doc_texts]
+        comment_tokens = [set(self._get_tokens(comment)) for comment in comment_texts]
+        token_keys = frozenset(_text_hash(t) for t in doc_texts + comment_texts)
+        bm25 = BM25Okapi(tokenized_corpus) if tokenized_corpus else None
+
+        faiss_index = None
+        self._load_embeddings(table_names)
+        vectors = [self._embeddings.get(str(name).upper()) for name in table_names]
+        missing_count = sum(1 for vec in vectors if vec is None)
+        if not vectors or missing_count == len(vectors):
+            logger.warning(
+                "⚠️ 未找到任何预计算的表结构 embedding，向量检索将被禁用，仅使用 BM25"
+            )
+        elif missing_count > 0:
+            # 为保证索引与表顺序一致，存在缺失 embedding 时禁用向量检索
+            logger.warning(
+                f"⚠️ 共有 {missing_count} 张表缺少预计算 embedding，"
+                "为保证索引与表顺序一致，本次禁用向量检索，仅使用 BM25"
+            )
+        elif len({vec.shape[0] for vec in vectors}) > 1:
+            logger.warning(
+                "⚠️ 表结构 embedding 维度不一致，向量检索将被禁用，请重新计算表的 embedding"
+            )
+        else:
+            matrix = np.vstack(vectors).astype("float32")
+            faiss_index = faiss.IndexFlatIP(matrix.shape[1])  # 内积 = 余弦相似度
+            faiss_index.add(matrix)
+
+        logger.info(
+            f"🎉 检索语料构建完成，共 {len(table_names)} 张表，耗时 {time.time() - start_time:.2f}s"
+        )
+        return RetrievalCorpus(
+            table_names, bm25, comment_tokens, faiss_index, token_keys
+        )
+
+    def get_corpus(self, table_info: Dict[str, Dict]) -> RetrievalCorpus:
+        """
+        获取 table_info 对应的检索语料，表结构未变化时直接复用已构建的 BM25 与 FAISS 索引。
+        """
+        snapshot = None
+        with self._lock:
+            self._reload_if_changed()
+
+            if (
+                table_info is self._last_table_info
+                and self._last_signature in self._corpora
+            ):
+                signature = self._last_signature
+                self._corpora.move_to_end(signature)
+                return self._corpora[signature]
+
+            doc_texts = [
+                build_table_document(name, info) for name, info in table_info.items()
+            ]
+            signature = _text_hash(
+                "\n".join(
+                    f"{name}\t{_text_hash(doc)}"
+                    for name, doc in zip(table_info.keys(), doc_texts)
+                )
+            )
+
+            corpus = self._corpora.get(signature)
+            if corpus is None:
+                corpus = self._build_corpus(table_info, doc_texts)
+                # 限制缓存的语料数量，淘汰最久未使用的语料
+                while len(self._corpora) >= VECTOR_INDEX_CACHE_SIZE:
+                    self._corpora.popitem(last=False)
+                self._corpora[signature] = corpus
+                # 只有新增了分词结果或 embedding 时才需要持久化
+                snapshot = self._snapshot()
+            self._corpora.move_to_end(signature)
+
+            self._last_table_info = table_info
+            self._last_signature = signature
+        self._save(snapshot)
+        return corpus
+
+    # ---------------------------------------------------------------- 失效
+
+    def invalidate(self, table_names: Optional[List[str]] = None):
+        """
+        表元数据变更后调用：丢弃相关表的 embedding 与已构建的语料。
+        分词缓存按文本内容寻址，表结构变化会自然产生新的哈希，因此无需清理。
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if table_names is None:
+                removed = bool(self._embeddings)
+                self._embeddings = {}
+            else:
+                removed = False
+                for name in table_names:
+                    key = str(name).upper()
+                    if key in self._embeddings:
+                        del self._embeddings[key]
+                        removed = True
+            self._corpora.clear()
+            self._last_table_info = None
+            self._last_signature = None
+            # 没有缓存相关表的 embedding 时无需重写索引文件
+            self._dirty = self._dirty or removed
+            snapshot = self._snapshot()
+        self._save(snapshot)
+
+    def remove(self):
+        """删除索引文件（数据源被删除时调用）"""
+        # 先获取写盘锁，避免尚未完成的保存在删除后重新写入索引文件
+        with self._save_lock, self._lock:
+            self._saved_seq = self._save_seq
+            self._reset()
+            for path in [self._meta_path] + self._matrix_files():
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"⚠️ 删除检索索引文件 {path} 失败: {e}")
+            self._persisted_mtime = None
+            self._dirty = False
+
+
+# 进程级索引注册表：datasource_id -> TableRetrievalIndex
+_retrieval_indexes: Dict[int, TableRetrievalIndex] = {}
+_retrieval_indexes_lock = Lock()
+
+
+def get_table_retrieval_index(datasource_id: Optional[int]) -> TableRetrievalIndex:
+    """
+    获取数据源的检索索引（进程内单例，首次访问时从磁盘加载）
+    """
+    key = datasource_id or 0
+    with _retrieval_indexes_lock:
+        index = _retrieval_indexes.get(key)
+        if index is None:
+            index = TableRetrievalIndex(datasource_id)
+            _retrieval_indexes[key] = index
+        return index
+
+
+def invalidate_table_retrieval_index(
+    datasource_id: int, table_names: Optional[List[str]] = None
+):
+    """
+    表/字段元数据或 embedding 变更后失效检索索引
+
+    Args:
+        datasource_id: 数据源ID
+        table_names: 发生变化的表名，None 表示该数据源的全部表
+    """
+    get_table_retrieval_index(datasource_id).invalidate(table_names)
+
+
+def remove_table_retrieval_index(datasource_id: int):
+    """
+    删除数据源的检索索引（包括磁盘文件）
+    """
+    with _retrieval_indexes_lock:
+        index = _retrieval_indexes.pop(datasource_id or 0, None)
+    if index is None:
+        index = TableRetrievalIndex(datasource_id)
+    index.remove()
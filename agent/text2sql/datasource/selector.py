@@ -13,12 +13,24 @@ from langchain_core.messages import SystemMessage, HumanMessage
 from agent.text2sql.state.agent_state import AgentState
 from agent.text2sql.template import PromptBuilder
 from common.llm_util import get_llm
-from model.db_connection_pool import get_db_pool
+from model.db_connection_pool import run_in_session
 from services.datasource_service import DatasourceService
 
 logger = logging.getLogger(__name__)
 
 
+def _load_datasource_list(session, user_id) -> List[Dict[str, Any]]:
+    """获取用户有权限的数据源列表（id、name、description）"""
+    return [
+        {
+            "id": ds.id,
+            "name": ds.name or "",
+            "description": ds.description or "",
+        }
+        for ds in DatasourceService.get_datasource_list(session, user_id)
+    ]
+
+
 async def datasource_selector(state: AgentState) -> AgentState:
     """
     数据源选择节点
@@ -36,36 +48,21 @@ async def datasource_selector(state: AgentState) -> AgentState:
     if datasource_id:
         logger.info(f"数据源已指定: {datasource_id}，检查用户权限")
         
-        # 检查用户是否有该数据源的权限
-        from model.datasource_models import DatasourceAuth
-        from common.permission_util import is_admin
-        from sqlalchemy import and_
-        
+        # 检查用户是否有该数据源的权限（管理员跳过），查询在元数据库线程池中执行
+        from common.permission_util import check_datasource_permission
+
         try:
-            db_pool = get_db_pool()
-            with db_pool.get_session() as session:
-                # 管理员跳过权限检查
-                if not is_admin(user_id):
-                    # 检查用户是否有该数据源的权限
-                    auth = session.query(DatasourceAuth).filter(
-                        and_(
-                            DatasourceAuth.datasource_id == datasource_id,
-                            DatasourceAuth.user_id == user_id,
-                            DatasourceAuth.enable == True
-                        )
-                    ).first()
-                    
-                    if not auth:
-                        # 无权限，设置错误消息并清空 datasource_id，让流程进入 error_handler
-                        error_msg = "您没有访问该数据源的权限，请联系管理员授权。"
-                        logger.warning(f"用户 {user_id} 尝试访问未授权的数据源 {datasource_id}")
-                        state["error_message"] = error_msg
-                        state["datasource_id"] = None  # 清空 datasource_id，让流程进入 error_handler
-                        return state
-                
-                # 有权限，继续执行
-                logger.info(f"用户 {user_id} 有数据源 {datasource_id} 的访问权限")
+            if not await check_datasource_permission(user_id, datasource_id):
+                # 无权限，设置错误消息并清空 datasource_id，让流程进入 error_handler
+                error_msg = "您没有访问该数据源的权限，请联系管理员授权。"
+                logger.warning(f"用户 {user_id} 尝试访问未授权的数据源 {datasource_id}")
+                state["error_message"] = error_msg
+                state["datasource_id"] = None  # 清空 datasource_id，让流程进入 error_handler
                 return state
+
+            # 有权限，继续执行
+            logger.info(f"用户 {user_id} 有数据源 {datasource_id} 的访问权限")
+            return state
         except Exception as e:
             logger.error(f"检查数据源权限失败: {e}", exc_info=True)
             state["error_message"] = "检查数据源权限时发生错误，请稍后重试。"
@@ -79,30 +76,19 @@ async def datasource_selector(state: AgentState) -> AgentState:
 
     # 获取数据源列表（根据用户权限过滤）
     try:
-        db_pool = get_db_pool()
-        with db_pool.get_session() as session:
-            # 从state中获取用户ID，如果没有则默认为管理员
-            user_id = state.get("user_id")
-            datasources = DatasourceService.get_datasource_list(session, user_id)
-
-            if not datasources:
-                # 典型场景：原对话绑定的数据源已被删除，或当前空间下无可用数据源
-                msg = "当前对话关联的数据源已不存在或无可用的数据源，请重新选择数据源后再尝试。"
-                logger.warning(f"没有可用的数据源: {msg}")
-                # 将提示信息写入状态，由后续异常节点统一输出给用户
-                state["error_message"] = msg
-                return state
-
-            # 构建数据源列表（包含 id、name、description）
-            datasource_list: List[Dict[str, Any]] = []
-            for ds in datasources:
-                datasource_list.append({
-                    "id": ds.id,
-                    "name": ds.name or "",
-                    "description": ds.description or "",
-                })
+        # 从state中获取用户ID，如果没有则默认为管理员
+        user_id = state.get("user_id")
+        datasource_list = await run_in_session(_load_datasource_list, user_id)
+
+        if not datasource_list:
+            # 典型场景：原对话绑定的数据源已被删除，或当前空间下无可用数据源
+            msg = "当前对话关联的数据源已不存在或无可用的数据源，请重新选择数据源后再尝试。"
+            logger.warning(f"没有可用的数据源: {msg}")
+            # 将提示信息写入状态，由后续异常节点统一输出给用户
+            state["error_message"] = msg
+            return state
 
-            logger.info(f"获取到 {len(datasource_list)} 个数据源")
+        logger.info(f"获取到 {len(datasource_list)} 个数据源")
 
     except Exception as e:
         logger.error(f"获取数据源列表失败: {e}", exc_info=True)
@@ -126,7 +112,7 @@ async def datasource_selector(state: AgentState) -> AgentState:
 
         # 调用 LLM
         llm = get_llm(0)
-        response = llm.invoke(messages)
+        response = await llm.ainvoke(messages)
 
         # 解析响应（JSON 格式）
         response_content = response.content.strip()
@@ -46,14 +46,11 @@ async def dynamic_sql_generator(
 
     if datasource_id:
         try:
-            from model.db_connection_pool import get_db_pool
+            from model.db_connection_pool import run_in_session
             from services.datasource_service import DatasourceService
 
-            db_pool = get_db_pool()
-            with db_pool.get_session() as session:
-                ds = DatasourceService.get_datasource_by_id(session, datasource_id)
-                if ds:
-                    db_type = ds.type
+            # 元数据库查询在专用线程池中执行，避免阻塞事件循环
+            db_type = await run_in_session(DatasourceService.get_datasource_type, datasource_id) or db_type
         except Exception as e:
             logger.warning(f"获取数据源信息失败: {e}，使用默认值")
 
@@ -79,7 +76,7 @@ async def dynamic_sql_generator(
 
         # 调用 LLM
         llm = get_llm(0)
-        response = llm.invoke(messages)
+        response = await llm.ainvoke(messages)
 
         # 解析响应（JSON 格式）
         response_content = response.content.strip()
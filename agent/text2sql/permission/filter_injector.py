@@ -1,6 +1,7 @@
 """
 权限过滤注入节点
-使用 LLM 将权限条件注入到 SQL 语句中
+优先基于 sqlglot AST 将行权限条件注入到 SQL 语句中（将受限表改写为带过滤条件的子查询），
+仅当 SQL 无法安全解析/改写时才回退到 LLM 注入
 """
 
 import json
@@ -17,13 +18,12 @@ from agent.text2sql.permission.permission_retriever import (
 )
 from agent.text2sql.template.prompt_builder import PromptBuilder
 from agent.text2sql.template.schema_formatter import get_database_engine_info
-from agent.text2sql.analysis.data_render_antv import extract_table_names_sqlglot, extract_table_alias_mapping, DB_TYPE_TO_DIALECT
 from common.llm_util import get_llm
+from common.sql_parse_util import ParsedSQL, get_parsed_sql, get_sqlglot_dialect, parse_sql
 from services.datasource_service import DatasourceService
 from model.db_connection_pool import get_db_pool
 
 import sqlglot
-from sqlglot import parse
 
 logger = logging.getLogger(__name__)
 pool = get_db_pool()
@@ -34,22 +34,25 @@ def _apply_column_permissions_to_sql(
     db_type: str,
     table_allowed_fields: Dict[str, set],
     alias_to_table: Dict[str, str],
+    parsed_sql: Optional[ParsedSQL] = None,
 ) -> str:
     """
     基于列权限重写 SELECT 列：移除 enable=false 的字段。
     - 仅处理显式列选择（Column），不强行展开 SELECT *（遇到 * 仅 warning，返回原 SQL）。
     - 支持表别名：若列引用的是别名，使用 alias_to_table 映射回真实表名进行权限判断。
+    - parsed_sql 与 sql 对应时直接复用其 AST（在副本上改写），否则按 SQL 文本从解析缓存获取。
     """
     if not table_allowed_fields:
         return sql
 
     # 使用数据库类型到 sqlglot 方言的映射，确保所有数据源类型都能正确解析
-    dialect = DB_TYPE_TO_DIALECT.get(db_type.lower() if db_type else "mysql", "mysql")
-    try:
-        expressions = parse(sql, read=dialect)
-    except Exception as e:
-        logger.warning(f"列权限：SQL 解析失败，跳过列过滤: {e}")
+    dialect = get_sqlglot_dialect(db_type)
+    if parsed_sql is None or not parsed_sql.matches(sql, dialect):
+        parsed_sql = parse_sql(sql, dialect)
+    if not parsed_sql.ok:
+        logger.warning(f"列权限：SQL 解析失败，跳过列过滤: {parsed_sql.error}")
         return sql
+    expressions = parsed_sql.copy_expressions()
 
     # 反向映射：table_name -> alias（可能为空）
     table_to_alias = {v: k for k, v in (alias_to_table or {}).items()}
@@ -115,11 +118,111 @@ def _apply_column_permissions_to_sql(
         return sql
 
 
+def inject_row_filters_sqlglot(
+    sql: str,
+    db_type: str,
+    filters: List[Dict[str, str]],
+    parsed_sql: Optional[ParsedSQL] = None,
+) -> Optional[str]:
+    """
+    基于 sqlglot AST 确定性地注入行权限条件。
+    - 将 FROM / JOIN 中引用的每个受限表改写为 (SELECT * FROM 表 WHERE 过滤条件) AS 原别名，
+      外层对别名/表名的引用保持不变，因此同样适用于子查询、CTE 内部和多表 JOIN。
+    - 与 CTE 同名的引用不做改写（CTE 内部引用的真实表已被改写）。
+    - 过滤条件需以真实表名作为限定符（即 get_user_permission_filters 不传别名映射时的输出）。
+
+    Args:
+        sql: 原始 SQL
+        db_type: 数据库类型
+        filters: 权限过滤条件列表，格式为 [{"table": "表名", "filter": "SQL WHERE条件字符串"}, ...]
+        parsed_sql: 已有的解析结果（可选），在其 AST 副本上改写
+
+    Returns:
+        注入后的 SQL；无法安全改写时返回 None（由调用方回退到 LLM 注入）
+    """
+    dialect = get_sqlglot_dialect(db_type)
+
+    try:
+        # 同一张表的多个过滤条件按 AND 合并
+        table_conditions: Dict[str, List[sqlglot.exp.Expression]] = {}
+        for item in filters or []:
+            table_name = (item.get("table") or "").strip()
+            filter_str = (item.get("filter") or "").strip()
+            if not table_name or not filter_str:
+                continue
+            condition = sqlglot.parse_one(filter_str, read=dialect)
+            table_conditions.setdefault(table_name.lower(), []).append(condition)
+    except Exception as e:
+        logger.warning(f"行权限：过滤条件解析失败，回退到 LLM 注入: {e}")
+        return None
+    if not table_conditions:
+        return sql
+
+    if parsed_sql is None or not parsed_sql.matches(sql, dialect):
+        parsed_sql = parse_sql(sql, dialect)
+    if not parsed_sql.ok:
+        logger.warning(f"行权限：SQL 解析失败，回退到 LLM 注入: {parsed_sql.error}")
+        return None
+    expressions = parsed_sql.copy_expressions()
+
+    injected_tables = set()
+    for expression in expressions:
+        cte_names = {
+            cte.alias_or_name.lower() for cte in expression.find_all(sqlglot.exp.CTE) if cte.alias_or_name
+        }
+
+        # 先收集再替换，避免遍历过程中修改语法树
+        for table in list(expression.find_all(sqlglot.exp.Table)):
+            name = table.name
+            if not name:
+                continue
+            full_name = f"{table.db}.{name}" if table.db else name
+            key = name.lower() if name.lower() in table_conditions else full_name.lower()
+            if key not in table_conditions:
+                continue
+            if not table.db and name.lower() in cte_names:
+                continue
+
+            # 仅改写 FROM / JOIN 中的表引用；其它位置（如 INSERT/UPDATE 目标表、PIVOT、带列别名）无法安全改写
+            if not isinstance(table.parent, (sqlglot.exp.From, sqlglot.exp.Join)):
+                logger.warning(f"行权限：表 {full_name} 出现在无法改写的位置，回退到 LLM 注入")
+                return None
+            table_alias = table.args.get("alias")
+            if table.args.get("pivots") or (table_alias and table_alias.columns):
+                logger.warning(f"行权限：表 {full_name} 带有 PIVOT 或列别名，回退到 LLM 注入")
+                return None
+
+            alias_identifier = table_alias.this.copy() if table_alias and table_alias.this else table.this.copy()
+
+            inner_table = table.copy()
+            inner_table.set("alias", None)
+            condition = sqlglot.exp.and_(*[c.copy() for c in table_conditions[key]])
+            subquery = (
+                sqlglot.exp.select("*")
+                .from_(inner_table)
+                .where(condition)
+                .subquery(alias_identifier)
+            )
+            table.replace(subquery)
+            injected_tables.add(key)
+
+    if not injected_tables:
+        # 受限表未被 SQL 引用，无需注入
+        logger.info("行权限：SQL 中未引用受限表，无需注入过滤条件")
+        return sql
+
+    try:
+        return "; ".join([e.sql(dialect=dialect) for e in expressions])
+    except Exception as e:
+        logger.warning(f"行权限：SQL 序列化失败，回退到 LLM 注入: {e}")
+        return None
+
+
 def permission_filter_injector(state: AgentState) -> AgentState:
     """
     权限过滤注入节点
     1. 获取用户的权限过滤条件
-    2. 使用 LLM 将权限条件注入 SQL
+    2. 基于 sqlglot AST 将权限条件注入 SQL，解析失败时回退到 LLM 注入
     3. 返回过滤后的 SQL
     
     Args:
@@ -168,13 +271,16 @@ def permission_filter_injector(state: AgentState) -> AgentState:
         # 获取数据库引擎信息
         engine = get_database_engine_info(db_type)
         
+        # SQL 只解析一次，解析结果写入 state 供后续节点复用
+        parsed_sql = get_parsed_sql(state, generated_sql, get_sqlglot_dialect(db_type))
+
         # 获取表名列表：优先使用 state 中的 used_tables，如果为空则从 SQL 中提取
         table_names: Optional[List[str]] = state.get("used_tables")
         
         if not table_names:
             # 从 SQL 中提取表名
             logger.info("state 中没有 used_tables，尝试从 SQL 中提取表名")
-            table_names = extract_table_names_sqlglot(generated_sql, db_type)
+            table_names = parsed_sql.tables
             if table_names:
                 logger.info(f"从 SQL 中提取到表名: {table_names}")
             else:
@@ -184,18 +290,17 @@ def permission_filter_injector(state: AgentState) -> AgentState:
             logger.info(f"使用 state 中的表名: {table_names}")
 
         # 提取 SQL 中的表别名映射，并构建 table_name -> alias 映射
-        # data_render_antv.extract_table_alias_mapping 返回的是 {alias: table_name}
-        alias_to_table = extract_table_alias_mapping(generated_sql, db_type)
+        # parsed_sql.alias_mapping 为 {alias: table_name}
+        alias_to_table = parsed_sql.alias_mapping
         table_to_alias: Dict[str, str] = {v: k for k, v in (alias_to_table or {}).items() if v and k}
         if table_to_alias:
             logger.info(f"SQL 表别名映射(table->alias): {table_to_alias}")
         
-        # 获取权限过滤条件
+        # 获取权限过滤条件（以真实表名作为限定符，AST 注入时表会被改写为同名子查询）
         filters = get_user_permission_filters(
             datasource_id=datasource_id,
             user_id=user_id,
             table_names=table_names,
-            table_alias_map=table_to_alias,
         )
         
         logger.info(f"获取到权限过滤条件数量: {len(filters) if filters else 0}")
@@ -219,11 +324,31 @@ def permission_filter_injector(state: AgentState) -> AgentState:
             logger.info(f"没有权限过滤条件（datasource_id={datasource_id}, user_id={user_id}, table_names={table_names}），直接返回原始SQL")
             # 仍然应用列权限（如果有）
             final_sql = _apply_column_permissions_to_sql(
-                generated_sql, db_type, column_allowed, alias_to_table
+                generated_sql, db_type, column_allowed, alias_to_table, parsed_sql
             )
             state["filtered_sql"] = final_sql
             return state
         
+        # 优先使用 AST 确定性注入，避免一次 LLM 调用
+        injected_sql = inject_row_filters_sqlglot(generated_sql, db_type, filters, parsed_sql)
+        if injected_sql is not None:
+            filtered_sql = _apply_column_permissions_to_sql(
+                injected_sql, db_type, column_allowed, alias_to_table
+            )
+            state["filtered_sql"] = filtered_sql
+            logger.info(f"权限过滤成功（AST 注入），原始SQL: {generated_sql[:100]}...")
+            logger.info(f"过滤后SQL: {filtered_sql[:100]}...")
+            return state
+
+        # 回退到 LLM 注入：LLM 直接在原 SQL 上追加条件，需使用别名作为限定符
+        if table_to_alias:
+            filters = get_user_permission_filters(
+                datasource_id=datasource_id,
+                user_id=user_id,
+                table_names=table_names,
+                table_alias_map=table_to_alias,
+            )
+
         # 使用 PromptBuilder 构建权限过滤提示词
         prompt_builder = PromptBuilder()
         
@@ -272,7 +397,7 @@ def permission_filter_injector(state: AgentState) -> AgentState:
                 logger.warning(f"权限过滤失败: {error_message}")
                 # 如果权限过滤失败，使用原始SQL
                 final_sql = _apply_column_permissions_to_sql(
-                    generated_sql, db_type, column_allowed, alias_to_table
+                    generated_sql, db_type, column_allowed, alias_to_table, parsed_sql
                 )
                 state["filtered_sql"] = final_sql
                 
@@ -281,7 +406,7 @@ def permission_filter_injector(state: AgentState) -> AgentState:
             logger.error(f"响应内容: {response_content[:500]}")
             # 如果解析失败，使用原始SQL
             final_sql = _apply_column_permissions_to_sql(
-                generated_sql, db_type, column_allowed, alias_to_table
+                generated_sql, db_type, column_allowed, alias_to_table, parsed_sql
             )
             state["filtered_sql"] = final_sql
         
@@ -19,6 +19,10 @@ from services.datasource_service import DatasourceService
 logger = logging.getLogger(__name__)
 
 
+# 作为旁路任务执行时读取的状态字段（只读，不修改其中的对象）
+QUESTION_RECOMMENDER_INPUT_KEYS = ("user_query", "datasource_id", "db_info")
+
+
 def question_recommender(state: AgentState) -> AgentState:
     """
     推荐问题生成节点
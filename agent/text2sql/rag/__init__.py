@@ -5,6 +5,7 @@ RAG 增强检索模块
 
 from agent.text2sql.rag.terminology_retriever import retrieve_terminologies
 from agent.text2sql.rag.training_retriever import retrieve_training_examples
+from agent.text2sql.rag.rag_context import retrieve_rag_context
 
-__all__ = ["retrieve_terminologies", "retrieve_training_examples"]
+__all__ = ["retrieve_terminologies", "retrieve_training_examples", "retrieve_rag_context"]
 
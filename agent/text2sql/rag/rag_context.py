@@ -0,0 +1,113 @@
+"""
+RAG 上下文检索
+为 SQL 生成一次性检索术语和训练示例：
+- 查询 embedding 在共享的后台线程池中计算，与关键词匹配 SQL 并行执行
+- 术语与训练示例共用同一个数据库 session 和同一个查询 embedding
+"""
+
+import logging
+from typing import Optional, Tuple
+
+from agent.text2sql.rag.terminology_retriever import (
+    USE_EMBEDDING as USE_TERMINOLOGY_EMBEDDING,
+    format_terminologies,
+    load_terminologies,
+    select_terminology_ids_by_embedding,
+    select_terminology_ids_by_keyword,
+)
+from agent.text2sql.rag.training_retriever import (
+    format_training_examples,
+    load_training_examples,
+    select_training_ids_by_embedding,
+    select_training_ids_by_keyword,
+)
+from model.db_connection_pool import get_db_pool
+from services.embedding_service import submit_query_embedding
+
+logger = logging.getLogger(__name__)
+pool = get_db_pool()
+
+
+def retrieve_rag_context(
+    question: str,
+    datasource_id: Optional[int] = None,
+    oid: int = 1,
+    terminology_top_k: int = 10,
+    training_top_k: int = 5,
+) -> Tuple[str, str]:
+    """
+    检索术语和训练示例，耗时约为 max(embedding, 关键词匹配) + 向量检索，而不是两个检索器串行之和
+
+    Args:
+        question: 用户问题
+        datasource_id: 数据源ID（没有数据源时不检索训练示例）
+        oid: 组织ID（默认：1）
+        terminology_top_k: 返回的最大术语数量
+        training_top_k: 返回的最大训练示例数量
+
+    Returns:
+        (术语模板片段, 训练示例模板片段)，未检索到或失败时为空字符串
+    """
+    if not question or not question.strip():
+        return "", ""
+
+    use_training = bool(datasource_id)
+    terminology_ids, training_ids = set(), set()
+    terminologies, data_training = "", ""
+
+    # 先在后台计算查询 embedding（远程模型或本地 CPU 模型，通常是最慢的一步）
+    embedding_future = None
+    if USE_TERMINOLOGY_EMBEDDING or use_training:
+        embedding_future = submit_query_embedding(question)
+
+    with pool.get_session() as session:
+        # 1. 关键词匹配（与 embedding 计算并行）
+        try:
+            terminology_ids = select_terminology_ids_by_keyword(
+                session, question, oid, datasource_id, terminology_top_k
+            )
+        except Exception as e:
+            logger.warning(f"术语关键词检索失败: {e}")
+            session.rollback()
+        if use_training:
+            try:
+                training_ids = select_training_ids_by_keyword(
+                    session, question, oid, datasource_id, training_top_k
+                )
+            except Exception as e:
+                logger.warning(f"训练示例关键词检索失败: {e}")
+                session.rollback()
+
+        # 2. 向量检索（共用同一个查询 embedding）
+        embedding = None
+        if embedding_future is not None:
+            try:
+                embedding = embedding_future.result()
+            except Exception as e:
+                logger.warning(f"生成查询 embedding 失败，仅使用关键词匹配: {e}")
+        if USE_TERMINOLOGY_EMBEDDING:
+            terminology_ids |= select_terminology_ids_by_embedding(
+                session, embedding, oid, datasource_id
+            )
+        if use_training:
+            training_ids |= select_training_ids_by_embedding(
+                session, embedding, oid, datasource_id, training_top_k
+            )
+
+        # 3. 加载完整信息并格式化
+        try:
+            terminologies = format_terminologies(
+                load_terminologies(session, terminology_ids, terminology_top_k)
+            )
+        except Exception as e:
+            logger.error(f"检索术语失败: {e}", exc_info=True)
+            session.rollback()
+        if use_training:
+            try:
+                data_training = format_training_examples(
+                    load_training_examples(session, training_ids, training_top_k)
+                )
+            except Exception as e:
+                logger.error(f"检索训练示例失败: {e}", exc_info=True)
+
+    return terminologies, data_training
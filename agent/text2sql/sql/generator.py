@@ -72,11 +72,11 @@ def sql_generate(state: AgentState) -> AgentState:
         # 表关系补充：在 SQL 生成阶段补充缺失的关联表，并生成外键关系信息
         # 这样可以在 SQL 生成时根据实际需要补充关联表，而不是在检索阶段就补充
         try:
-            from agent.text2sql.database.db_service import DatabaseService
+            from agent.text2sql.database.db_service import get_database_service
             user_id = state.get("user_id")
             
-            # 创建 DatabaseService 实例用于表关系补充
-            db_service = DatabaseService(datasource_id)
+            # 获取缓存的 DatabaseService 实例用于表关系补充
+            db_service = get_database_service(datasource_id)
             
             # 获取所有表信息（用于补充关联表，使用缓存避免重复查询）
             all_table_info = db_service._fetch_all_table_info(user_id=user_id, use_cache=True)
@@ -122,26 +122,16 @@ def sql_generate(state: AgentState) -> AgentState:
         # 使用 PromptBuilder 构建提示词
         prompt_builder = PromptBuilder()
         
-        # RAG 增强检索：检索术语和训练示例
+        # RAG 增强检索：检索术语和训练示例（共用查询 embedding 和数据库 session）
         try:
-            from agent.text2sql.rag.terminology_retriever import retrieve_terminologies
-            import asyncio
-            
-            # 检索术语（同步调用）
-            terminologies = retrieve_terminologies(
-                question=state["user_query"],
-                datasource_id=datasource_id,
-                oid=1,  # 默认组织ID，后续可以从用户信息获取
-                top_k=10,
-            )
-            
-            # 检索训练示例
-            from agent.text2sql.rag.training_retriever import retrieve_training_examples
-            data_training = retrieve_training_examples(
+            from agent.text2sql.rag.rag_context import retrieve_rag_context
+
+            terminologies, data_training = retrieve_rag_context(
                 question=state["user_query"],
                 datasource_id=datasource_id,
                 oid=1,  # 默认组织ID，后续可以从用户信息获取
-                top_k=5,
+                terminology_top_k=10,
+                training_top_k=5,
             )
         except Exception as e:
             logger.warning(f"RAG 检索失败: {e}，使用空字符串")
@@ -1,16 +1,120 @@
-from typing import Optional, Dict, List, Any
-from pydantic import BaseModel
+import json
+from typing import Optional, Dict, List, Any, Callable, Iterator, Sequence
+from pydantic import BaseModel, model_validator
 from typing_extensions import TypedDict
 
 
+class RowsView(Sequence):
+    """
+    按列存储结果的只读行视图：按需将某一行组装为字典，兼容按行处理的旧代码
+    """
+
+    __slots__ = ("_columns", "_column_data", "_row_count")
+
+    def __init__(self, columns: List[str], column_data: List[List[Any]]):
+        self._columns = columns
+        self._column_data = column_data
+        self._row_count = len(column_data[0]) if column_data else 0
+
+    def __len__(self) -> int:
+        return self._row_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._row_count))]
+        if index < 0:
+            index += self._row_count
+        if not 0 <= index < self._row_count:
+            raise IndexError("row index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = self._columns
+        for row in zip(*self._column_data):
+            yield dict(zip(columns, row))
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        return {col: values[index] for col, values in zip(self._columns, self._column_data)}
+
+
 class ExecutionResult(BaseModel):
     """
     sql执行结果
+    按列存储（columns + column_data），避免每行重复列名；data 属性提供按行访问的字典视图
     """
 
     success: bool
-    data: Optional[List[Dict[str, Any]]] = None  # 执行结果
+    columns: List[str] = []  # 列名
+    column_data: List[List[Any]] = []  # 各列取值，与 columns 一一对应
     error: Optional[str] = None
+    truncated: bool = False  # 结果集是否超过行数/字节上限被截断
+
+    @model_validator(mode="before")
+    @classmethod
+    def _convert_row_data(cls, values: Any) -> Any:
+        # 兼容 ExecutionResult(data=[{...}, ...]) 的按行构造方式；
+        # 同时传入 columns 时按 columns 的顺序取值，行也可以是与 columns 对应的列表/元组
+        if isinstance(values, dict) and "data" in values:
+            values = dict(values)
+            rows = list(values.pop("data") or [])
+            columns = values.get("columns")
+            if not columns:
+                names: Dict[str, None] = {}
+                for row in rows:
+                    if not isinstance(row, dict):
+                        raise ValueError("按行构造 ExecutionResult 时，非字典行需要同时传入 columns")
+                    names.update(dict.fromkeys(row))
+                columns = values["columns"] = list(names)
+            if "column_data" not in values:
+                values["column_data"] = [
+                    [
+                        row.get(col) if isinstance(row, dict) else (row[idx] if idx < len(row) else None)
+                        for row in rows
+                    ]
+                    for idx, col in enumerate(columns)
+                ]
+        return values
+
+    def __deepcopy__(self, memo=None):
+        # 单元格均为标量，按列浅拷贝即可，避免逐个对象深拷贝
+        return self.model_copy(update={"column_data": [list(values) for values in self.column_data]})
+
+    @property
+    def row_count(self) -> int:
+        return len(self.column_data[0]) if self.column_data else 0
+
+    @property
+    def data(self) -> RowsView:
+        """按行访问的只读视图（每行按需组装为字典）"""
+        return RowsView(self.columns, self.column_data)
+
+    def to_records(
+        self,
+        limit: Optional[int] = None,
+        column_names: Optional[List[str]] = None,
+        convert_value: Optional[Callable[[Any], Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        序列化为字典列表（用于 SSE 推送等前端协议）
+
+        Args:
+            limit: 最多返回的行数
+            column_names: 输出使用的列名（如中文列名），与 columns 一一对应，默认使用原列名
+            convert_value: 单元格值转换函数，按列批量执行
+        """
+        names = column_names or self.columns
+        column_data = [values[:limit] for values in self.column_data] if limit is not None else self.column_data
+        if convert_value:
+            column_data = [[convert_value(v) for v in values] for values in column_data]
+        return [dict(zip(names, row)) for row in zip(*column_data)]
+
+    def to_prompt_json(self, limit: Optional[int] = None, cls: Optional[type] = None) -> str:
+        """
+        序列化为紧凑的 JSON 文本（用于 LLM 提示词）：列名只出现一次，每行为一个数组
+        """
+        column_data = [values[:limit] for values in self.column_data] if limit is not None else self.column_data
+        payload = {"columns": self.columns, "rows": [list(row) for row in zip(*column_data)]}
+        return json.dumps(payload, ensure_ascii=False, cls=cls)
 
 
 class AgentState(TypedDict):
@@ -32,7 +136,10 @@ class AgentState(TypedDict):
     datasource_id: Optional[int]  # 数据源ID
     user_id: Optional[int]  # 用户ID（用于权限过滤）
     filtered_sql: Optional[str]  # 权限过滤后的SQL
+    parsed_sql: Optional[Any]  # generated_sql 的解析结果（common.sql_parse_util.ParsedSQL），各节点共享
     recommended_questions: Optional[List[str]]  # 推荐问题列表
     used_tables: Optional[List[str]]  # SQL 使用的表名列表
     bm25_tokens: Optional[List[str]]  # BM25 对用户问题的分词结果
     error_message: Optional[str]  # 异常信息（如数据源选择失败时的提示）
+    side_task_group: Optional[str]  # 旁路任务分组（一次问答），用于取消总结/图表/推荐问题任务
+    _early_recommender_task_id: Optional[str]  # 早期推荐问题任务ID（未声明的键不会在节点间传递）
@@ -8,8 +8,9 @@ from typing import Any, Dict, Optional, Union
 
 from langgraph.graph.state import CompiledStateGraph
 
-from agent.text2sql.analysis.graph import create_graph
+from agent.text2sql.analysis.graph import get_compiled_graph
 from agent.text2sql.state.agent_state import AgentState
+from common.side_task_executor import cancel_side_tasks
 from constants.code_enum import DataTypeEnum, IntentEnum
 from services.user_service import add_user_record, decode_jwt_token
 
@@ -76,6 +77,8 @@ class Text2SqlAgent:
         t04_answer_data = {}
         current_step = None
         final_filtered_sql = ""  # 用于保存最终的SQL语句
+        # 本次问答的旁路任务分组，问答结束、停止或客户端断开时取消尚未开始的旁路任务
+        side_task_group = uuid.uuid4().hex
 
         try:
             # 获取用户信息（只调用一次）
@@ -89,45 +92,22 @@ class Text2SqlAgent:
                 correct_attempts=0,
                 datasource_id=datasource_id,
                 user_id=user_id,
+                side_task_group=side_task_group,
             )
 
             # 检查数据源权限（如果指定了 datasource_id）
             # 权限检查结果会通过 datasource_selector 节点处理，统一通过 error_handler 节点流式输出
             if datasource_id:
-                from sqlalchemy import and_
-
-                from common.permission_util import is_admin
-                from model.datasource_models import DatasourceAuth
-                from model.db_connection_pool import get_db_pool
-
-                db_pool = get_db_pool()
-                with db_pool.get_session() as session:
-                    # 管理员跳过权限检查
-                    if not is_admin(user_id):
-                        # 检查用户是否有该数据源的权限
-                        auth = (
-                            session.query(DatasourceAuth)
-                            .filter(
-                                and_(
-                                    DatasourceAuth.datasource_id == datasource_id,
-                                    DatasourceAuth.user_id == user_id,
-                                    DatasourceAuth.enable == True,
-                                )
-                            )
-                            .first()
-                        )
+                from common.permission_util import check_datasource_permission
 
-                        if not auth:
-                            # 无权限，设置错误消息，让 error_handler 节点统一处理
-                            error_msg = "您没有访问该数据源的权限，请联系管理员授权。"
-                            logger.warning(
-                                f"用户 {user_id} 尝试访问未授权的数据源 {datasource_id}"
-                            )
-                            initial_state["error_message"] = error_msg
-                            initial_state["datasource_id"] = (
-                                None  # 清空 datasource_id，让流程进入 error_handler
-                            )
-            graph: CompiledStateGraph = create_graph(datasource_id)
+                # 权限查询在元数据库线程池中执行，避免阻塞事件循环
+                if not await check_datasource_permission(user_id, datasource_id):
+                    # 无权限，设置错误消息，让 error_handler 节点统一处理
+                    error_msg = "您没有访问该数据源的权限，请联系管理员授权。"
+                    logger.warning(f"用户 {user_id} 尝试访问未授权的数据源 {datasource_id}")
+                    initial_state["error_message"] = error_msg
+                    initial_state["datasource_id"] = None  # 清空 datasource_id，让流程进入 error_handler
+            graph: CompiledStateGraph = get_compiled_graph()
 
             # 标识对话状态
             task_context = {"cancelled": False}
@@ -236,6 +216,8 @@ class Text2SqlAgent:
             logger.error(f"Error in run_agent: {str(e)}", exc_info=True)
             error_msg = f"处理过程中发生错误: {str(e)}"
             await self._send_response(response, error_msg, "error")
+        finally:
+            cancel_side_tasks(side_task_group)
 
     async def _process_chunk(
         self,
@@ -2,21 +2,29 @@
 数据源工具类
 """
 
+import hashlib
 import json
 import logging
+import os
 import platform
+import time
 import urllib.parse
 from base64 import b64encode
+from collections import OrderedDict
+from contextlib import contextmanager
 from decimal import Decimal
 from enum import Enum
+from threading import Lock
 from typing import Dict, Any, List, Optional, Tuple
 
 import pymysql
 import psycopg2
 import requests
 from elasticsearch import Elasticsearch
-from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import create_engine, event, text, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError, SQLAlchemyError
+from sqlalchemy.pool import QueuePool
 
 # 达梦数据库驱动（可选依赖）
 try:
@@ -32,6 +40,21 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 用户数据源连接池配置（每个进程、每个数据源独立计算）
+DATASOURCE_POOL_SIZE = int(os.getenv("DATASOURCE_POOL_SIZE", "5"))  # 常驻连接数
+DATASOURCE_POOL_MAX_OVERFLOW = int(os.getenv("DATASOURCE_POOL_MAX_OVERFLOW", "10"))  # 最大溢出连接数
+DATASOURCE_POOL_TIMEOUT = int(os.getenv("DATASOURCE_POOL_TIMEOUT", "30"))  # 等待可用连接的超时时间（秒）
+DATASOURCE_POOL_RECYCLE = int(os.getenv("DATASOURCE_POOL_RECYCLE", "1800"))  # 连接回收时间（秒）
+DATASOURCE_POOL_IDLE_TIMEOUT = int(os.getenv("DATASOURCE_POOL_IDLE_TIMEOUT", "600"))  # 连接池空闲多久后释放（秒）
+DATASOURCE_POOL_MAX_ENTRIES = int(os.getenv("DATASOURCE_POOL_MAX_ENTRIES", "32"))  # 最多同时保留的连接池数量
+# 跨 worker 共享的数据源配置版本号槽位数（按 数据源ID % 槽位数 映射，槽位冲突只会导致多余的重建）
+DATASOURCE_VERSION_SLOTS = int(os.getenv("DATASOURCE_VERSION_SLOTS", "1024"))
+
+# 查询结果拉取上限（每个查询、每个进程），超过后停止拉取并标记结果被截断
+SQL_RESULT_MAX_ROWS = int(os.getenv("SQL_RESULT_MAX_ROWS", "10000"))  # 最多返回行数
+SQL_RESULT_MAX_BYTES = int(os.getenv("SQL_RESULT_MAX_BYTES", str(64 * 1024 * 1024)))  # 结果集估算字节数上限
+SQL_FETCH_BATCH_SIZE = int(os.getenv("SQL_FETCH_BATCH_SIZE", "1000"))  # 服务端游标每批拉取行数
+
 
 class ConnectType(Enum):
     """数据库连接类型"""
@@ -170,102 +193,137 @@ class DatasourceConnectionUtil:
         )
         return es_client
 
+    @staticmethod
+    def _create_engine(ds_type: str, config: Dict[str, Any], **pool_kwargs) -> Engine:
+        """创建 SQLAlchemy engine（按数据源类型设置驱动连接参数）"""
+        timeout = config.get("timeout", 30)
+        uri = DatasourceConnectionUtil.build_connection_uri(ds_type, config)
+        # 注意：部分驱动（如 oracledb）不支持 connect_timeout 关键字参数
+        if ds_type == "oracle":
+            return create_engine(uri, pool_pre_ping=True, **pool_kwargs)
+        elif ds_type == "sqlServer":
+            # SQL Server 2022 需要禁用加密以兼容 pymssql
+            # pymssql 不支持 connect_timeout，使用 login_timeout 和 timeout
+            return create_engine(
+                uri,
+                pool_pre_ping=True,
+                connect_args={"timeout": timeout, "login_timeout": timeout, "encryption": "off"},
+                **pool_kwargs,
+            )
+        return create_engine(uri, pool_pre_ping=True, connect_args={"connect_timeout": timeout}, **pool_kwargs)
+
+    @staticmethod
+    def _create_native_connection(ds_type: str, config: Dict[str, Any]):
+        """创建 Python 原生驱动的 DBAPI 连接（达梦 / Doris / StarRocks / Redshift / Kingbase）"""
+        host = config.get("host", "")
+        port = config.get("port", 3306)
+        username = config.get("username", "")
+        password = config.get("password", "")
+        database = config.get("database", "")
+        timeout = config.get("timeout", 30)
+        extra_config = DatasourceConnectionUtil._get_extra_config(config)
+
+        if ds_type == "dm":
+            if dmPython is None:
+                raise Exception("未安装达梦数据库驱动 dmPython")
+            return dmPython.connect(user=username, password=password, server=host, port=port, **extra_config)
+
+        elif ds_type in ("doris", "starrocks"):
+            # StarRocks/Doris 连接参数优化：
+            # 1. 增加 connect_timeout 到至少 60 秒（连接建立可能需要更长时间）
+            # 2. 添加 write_timeout 防止写入超时
+            # 3. 设置 charset 确保编码正确
+            # 4. 设置 autocommit 提高兼容性
+            connect_timeout = max(timeout, 60)  # 至少 60 秒连接超时
+            return pymysql.connect(
+                user=username,
+                passwd=password,
+                host=host,
+                port=port,
+                db=database,
+                connect_timeout=connect_timeout,
+                read_timeout=timeout,
+                write_timeout=timeout,
+                charset='utf8mb4',
+                autocommit=True,
+                **extra_config
+            )
+
+        elif ds_type == "redshift":
+            if redshift_connector is None:
+                raise Exception("未安装 redshift_connector 驱动")
+            return redshift_connector.connect(host=host, port=port, database=database,
+                                              user=username, password=password,
+                                              timeout=timeout, **extra_config)
+
+        elif ds_type == "kingbase":
+            # 人大金仓（使用 PostgreSQL 协议）
+            return psycopg2.connect(host=host, port=port, database=database,
+                                    user=username, password=password,
+                                    connect_timeout=timeout,
+                                    options=f"-c statement_timeout={timeout * 1000}",
+                                    **extra_config)
+
+        raise Exception(f"不支持的数据源类型: {ds_type}")
+
+    @staticmethod
+    @contextmanager
+    def native_connection(ds_type: str, config: Dict[str, Any], ds_id: Optional[int] = None):
+        """
+        从连接池注册表中检出原生驱动连接，退出上下文时归还连接池（而不是关闭）
+        用法:
+        with DatasourceConnectionUtil.native_connection(ds_type, config, ds_id) as conn:
+            with conn.cursor() as cursor:
+                ...
+        """
+        pool = get_datasource_pool_registry().get_native_pool(ds_type, config, ds_id)
+        conn = pool.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
     @staticmethod
     def test_connection(ds_type: str, config: Dict[str, Any]) -> Tuple[bool, str]:
-        """测试数据库连接"""
+        """测试数据库连接（使用独立连接，不进入连接池，确保校验的是最新配置）"""
         try:
             db = DB.get_db(ds_type)
             timeout = config.get("timeout", 30)
-            extra_config = DatasourceConnectionUtil._get_extra_config(config)
 
             if db.connect_type == ConnectType.sqlalchemy:
                 # SQLAlchemy 驱动的数据库
-                uri = DatasourceConnectionUtil.build_connection_uri(ds_type, config)
-                # 注意：部分驱动（如 oracledb）不支持 connect_timeout 关键字参数
-                if ds_type == "oracle":
-                    engine = create_engine(uri, pool_pre_ping=True)
-                elif ds_type == "sqlServer":
-                    # SQL Server 2022 需要禁用加密以兼容 pymssql
-                    # pymssql 不支持 connect_timeout，使用 login_timeout 和 timeout
-                    engine = create_engine(
-                        uri, pool_pre_ping=True, connect_args={"timeout": timeout, "login_timeout": timeout, "encryption": "off"}
-                    )
-                else:
-                    engine = create_engine(uri, pool_pre_ping=True, connect_args={"connect_timeout": timeout})
-                with engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
+                engine = DatasourceConnectionUtil._create_engine(ds_type, config)
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+                finally:
+                    engine.dispose()
                 return True, ""
 
+            elif ds_type == "es":
+                # Elasticsearch
+                es_client = DatasourceConnectionUtil._get_es_connect(config)
+                if es_client.ping():
+                    return True, ""
+                else:
+                    return False, "Elasticsearch 连接失败"
+
             else:
                 # Python 原生驱动的数据库
-                host = config.get("host", "")
-                port = config.get("port", 3306)
-                username = config.get("username", "")
-                password = config.get("password", "")
-                database = config.get("database", "")
-
-                if ds_type == "dm":
-                    # 达梦数据库
-                    if dmPython is None:
-                        return False, "未安装达梦数据库驱动 dmPython"
-                    with dmPython.connect(user=username, password=password, server=host,
-                                          port=port, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                conn = DatasourceConnectionUtil._create_native_connection(ds_type, config)
+                try:
+                    cursor = conn.cursor()
+                    try:
+                        if ds_type == "dm":
                             cursor.execute('SELECT 1', timeout=timeout)
-                            cursor.fetchall()
-                    return True, ""
-
-                elif ds_type in ("doris", "starrocks"):
-                    # Apache Doris / StarRocks（使用 MySQL 协议）
-                    # 使用优化的连接参数以提高连接稳定性
-                    connect_timeout = max(timeout, 60)  # 至少 60 秒连接超时
-                    with pymysql.connect(
-                        user=username, 
-                        passwd=password, 
-                        host=host,
-                        port=port, 
-                        db=database, 
-                        connect_timeout=connect_timeout,
-                        read_timeout=timeout,
-                        write_timeout=timeout,
-                        charset='utf8mb4',
-                        autocommit=True,
-                        **extra_config
-                    ) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute('SELECT 1')
-                    return True, ""
-
-                elif ds_type == "redshift":
-                    # AWS Redshift
-                    if redshift_connector is None:
-                        return False, "未安装 redshift_connector 驱动"
-                    with redshift_connector.connect(host=host, port=port, database=database,
-                                                    user=username, password=password,
-                                                    timeout=timeout, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                        else:
                             cursor.execute('SELECT 1')
-                    return True, ""
-
-                elif ds_type == "kingbase":
-                    # 人大金仓（使用 PostgreSQL 协议）
-                    with psycopg2.connect(host=host, port=port, database=database,
-                                          user=username, password=password,
-                                          connect_timeout=timeout, **extra_config) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute('SELECT 1')
-                    return True, ""
-
-                elif ds_type == "es":
-                    # Elasticsearch
-                    es_client = DatasourceConnectionUtil._get_es_connect(config)
-                    if es_client.ping():
-                        return True, ""
-                    else:
-                        return False, "Elasticsearch 连接失败"
-
-                else:
-                    return False, f"不支持的数据源类型: {ds_type}"
+                        cursor.fetchall()
+                    finally:
+                        cursor.close()
+                finally:
+                    conn.close()
+                return True, ""
 
         except Exception as e:
             logger.error(f"连接测试失败: {e}")
@@ -385,29 +443,18 @@ class DatasourceConnectionUtil:
             raise ValueError(f"不支持的数据源类型: {ds_type}")
 
     @staticmethod
-    def get_tables(ds_type: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def get_tables(ds_type: str, config: Dict[str, Any], ds_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """获取数据库表列表"""
         try:
             db = DB.get_db(ds_type)
             timeout = config.get("timeout", 30)
-            extra_config = DatasourceConnectionUtil._get_extra_config(config)
             sql, sql_param = DatasourceConnectionUtil._get_table_sql(ds_type, config)
 
             tables = []
 
             if db.connect_type == ConnectType.sqlalchemy:
                 # SQLAlchemy 驱动的数据库
-                uri = DatasourceConnectionUtil.build_connection_uri(ds_type, config)
-                if ds_type == "oracle":
-                    engine = create_engine(uri, pool_pre_ping=True)
-                elif ds_type == "sqlServer":
-                    # SQL Server 2022 需要禁用加密以兼容 pymssql
-                    # pymssql 不支持 connect_timeout，使用 login_timeout 和 timeout
-                    engine = create_engine(
-                        uri, pool_pre_ping=True, connect_args={"timeout": timeout, "login_timeout": timeout, "encryption": "off"}
-                    )
-                else:
-                    engine = create_engine(uri, pool_pre_ping=True, connect_args={"connect_timeout": timeout})
+                engine = get_datasource_pool_registry().get_engine(ds_type, config, ds_id)
                 with engine.connect() as conn:
                     result = conn.execute(text(sql), {"param": sql_param})
                     for row in result.fetchall():
@@ -434,98 +481,43 @@ class DatasourceConnectionUtil:
                             "tableName": table_name,
                             "tableComment": table_comment,
                         })
+
+            elif ds_type == "es":
+                # Elasticsearch：获取索引列表
+                es_client = DatasourceConnectionUtil._get_es_connect(config)
+                indices = es_client.cat.indices(format="json")
+                if indices:
+                    for idx in indices:
+                        index_name = idx.get('index')
+                        desc = ''
+                        # 获取 mapping 中的描述
+                        try:
+                            mapping = es_client.indices.get_mapping(index=index_name)
+                            mappings = mapping.get(index_name, {}).get("mappings", {})
+                            if mappings.get('_meta'):
+                                desc = mappings.get('_meta', {}).get('description', '')
+                        except Exception:
+                            pass
+                        tables.append({
+                            "tableName": index_name,
+                            "tableComment": desc,
+                        })
+
             else:
-                # Python 原生驱动的数据库
-                host = config.get("host", "")
-                port = config.get("port", 3306)
-                username = config.get("username", "")
-                password = config.get("password", "")
-                database = config.get("database", "")
-
-                if ds_type == "dm":
-                    if dmPython is None:
-                        raise Exception("未安装达梦数据库驱动 dmPython")
-                    with dmPython.connect(user=username, password=password, server=host,
-                                          port=port, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                # Python 原生驱动的数据库（从连接池检出连接）
+                with DatasourceConnectionUtil.native_connection(ds_type, config, ds_id) as conn:
+                    with conn.cursor() as cursor:
+                        if ds_type == "dm":
                             cursor.execute(sql, {"param": sql_param}, timeout=timeout)
-                            for row in cursor.fetchall():
-                                tables.append({
-                                    "tableName": row[0],
-                                    "tableComment": row[1] or "",
-                                })
-
-                elif ds_type in ("doris", "starrocks"):
-                    # 使用优化的连接参数以提高连接稳定性
-                    connect_timeout = max(timeout, 60)  # 至少 60 秒连接超时
-                    with pymysql.connect(
-                        user=username, 
-                        passwd=password, 
-                        host=host,
-                        port=port, 
-                        db=database, 
-                        connect_timeout=connect_timeout,
-                        read_timeout=timeout,
-                        write_timeout=timeout,
-                        charset='utf8mb4',
-                        autocommit=True,
-                        **extra_config
-                    ) as conn:
-                        with conn.cursor() as cursor:
+                        elif ds_type == "kingbase":
+                            cursor.execute(sql.format(sql_param))
+                        else:
+                            # Doris / StarRocks / Redshift
                             cursor.execute(sql, (sql_param,))
-                            for row in cursor.fetchall():
-                                tables.append({
-                                    "tableName": row[0],
-                                    "tableComment": row[1] or "",
-                                })
-
-                elif ds_type == "redshift":
-                    if redshift_connector is None:
-                        raise Exception("未安装 redshift_connector 驱动")
-                    with redshift_connector.connect(host=host, port=port, database=database,
-                                                    user=username, password=password,
-                                                    timeout=timeout, **extra_config) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute(sql, (sql_param,))
-                            for row in cursor.fetchall():
-                                tables.append({
-                                    "tableName": row[0],
-                                    "tableComment": row[1] or "",
-                                })
-
-                elif ds_type == "kingbase":
-                    db_schema = config.get("dbSchema") or database
-                    with psycopg2.connect(host=host, port=port, database=database,
-                                          user=username, password=password,
-                                          options=f"-c statement_timeout={timeout * 1000}",
-                                          **extra_config) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute(sql.format(db_schema))
-                            for row in cursor.fetchall():
-                                tables.append({
-                                    "tableName": row[0],
-                                    "tableComment": row[1] or "",
-                                })
-
-                elif ds_type == "es":
-                    # Elasticsearch：获取索引列表
-                    es_client = DatasourceConnectionUtil._get_es_connect(config)
-                    indices = es_client.cat.indices(format="json")
-                    if indices:
-                        for idx in indices:
-                            index_name = idx.get('index')
-                            desc = ''
-                            # 获取 mapping 中的描述
-                            try:
-                                mapping = es_client.indices.get_mapping(index=index_name)
-                                mappings = mapping.get(index_name, {}).get("mappings", {})
-                                if mappings.get('_meta'):
-                                    desc = mappings.get('_meta', {}).get('description', '')
-                            except Exception:
-                                pass
+                        for row in cursor.fetchall():
                             tables.append({
-                                "tableName": index_name,
-                                "tableComment": desc,
+                                "tableName": row[0],
+                                "tableComment": row[1] or "",
                             })
 
             return tables
@@ -682,29 +674,18 @@ class DatasourceConnectionUtil:
             raise ValueError(f"不支持的数据源类型: {ds_type}")
 
     @staticmethod
-    def get_fields(ds_type: str, config: Dict[str, Any], table_name: str) -> List[Dict[str, Any]]:
+    def get_fields(ds_type: str, config: Dict[str, Any], table_name: str, ds_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """获取指定表的字段列表（名称/类型/注释）"""
         try:
             db = DB.get_db(ds_type)
             timeout = config.get("timeout", 30)
-            extra_config = DatasourceConnectionUtil._get_extra_config(config)
             sql, p1, p2 = DatasourceConnectionUtil._get_field_sql(ds_type, config, table_name)
 
             fields = []
 
             if db.connect_type == ConnectType.sqlalchemy:
                 # SQLAlchemy 驱动的数据库
-                uri = DatasourceConnectionUtil.build_connection_uri(ds_type, config)
-                if ds_type == "oracle":
-                    engine = create_engine(uri, pool_pre_ping=True)
-                elif ds_type == "sqlServer":
-                    # SQL Server 2022 需要禁用加密以兼容 pymssql
-                    # pymssql 不支持 connect_timeout，使用 login_timeout 和 timeout
-                    engine = create_engine(
-                        uri, pool_pre_ping=True, connect_args={"timeout": timeout, "login_timeout": timeout, "encryption": "off"}
-                    )
-                else:
-                    engine = create_engine(uri, pool_pre_ping=True, connect_args={"connect_timeout": timeout})
+                engine = get_datasource_pool_registry().get_engine(ds_type, config, ds_id)
                 with engine.connect() as conn:
                     result = conn.execute(text(sql), {"param1": p1, "param2": p2})
                     for idx, row in enumerate(result.fetchall()):
@@ -726,108 +707,47 @@ class DatasourceConnectionUtil:
                             "fieldComment": _decode_value(row[2]),
                             "fieldIndex": idx
                         })
+
+            elif ds_type == "es":
+                # Elasticsearch：获取索引的字段
+                es_client = DatasourceConnectionUtil._get_es_connect(config)
+                mapping = es_client.indices.get_mapping(index=table_name)
+                properties = mapping.get(table_name, {}).get("mappings", {}).get("properties", {})
+                for idx, (field, field_config) in enumerate(properties.items()):
+                    field_type = field_config.get("type", "")
+                    desc = ""
+                    if field_config.get("_meta"):
+                        desc = field_config.get("_meta", {}).get('description', '')
+                    if not field_type:
+                        # object、nested 等类型
+                        field_type = ','.join(list(field_config.keys()))
+                    fields.append({
+                        "fieldName": field,
+                        "fieldType": field_type,
+                        "fieldComment": desc,
+                        "fieldIndex": idx
+                    })
+
             else:
-                # Python 原生驱动的数据库
-                host = config.get("host", "")
-                port = config.get("port", 3306)
-                username = config.get("username", "")
-                password = config.get("password", "")
-                database = config.get("database", "")
-
-                if ds_type == "dm":
-                    if dmPython is None:
-                        raise Exception("未安装达梦数据库驱动 dmPython")
-                    with dmPython.connect(user=username, password=password, server=host,
-                                          port=port, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                # Python 原生驱动的数据库（从连接池检出连接）
+                with DatasourceConnectionUtil.native_connection(ds_type, config, ds_id) as conn:
+                    with conn.cursor() as cursor:
+                        if ds_type == "dm":
                             cursor.execute(sql, {"param1": p1, "param2": p2}, timeout=timeout)
-                            for idx, row in enumerate(cursor.fetchall()):
-                                fields.append({
-                                    "fieldName": row[0],
-                                    "fieldType": row[1] or "",
-                                    "fieldComment": row[2] or "",
-                                    "fieldIndex": idx
-                                })
-
-                elif ds_type in ("doris", "starrocks"):
-                    # 使用优化的连接参数以提高连接稳定性
-                    connect_timeout = max(timeout, 60)  # 至少 60 秒连接超时
-                    with pymysql.connect(
-                        user=username, 
-                        passwd=password, 
-                        host=host,
-                        port=port, 
-                        db=database, 
-                        connect_timeout=connect_timeout,
-                        read_timeout=timeout,
-                        write_timeout=timeout,
-                        charset='utf8mb4',
-                        autocommit=True,
-                        **extra_config
-                    ) as conn:
-                        with conn.cursor() as cursor:
-                            params = (p1, p2) if p2 else (p1,)
-                            cursor.execute(sql, params)
-                            for idx, row in enumerate(cursor.fetchall()):
-                                fields.append({
-                                    "fieldName": row[0],
-                                    "fieldType": row[1] or "",
-                                    "fieldComment": row[2] or "",
-                                    "fieldIndex": idx
-                                })
-
-                elif ds_type == "redshift":
-                    if redshift_connector is None:
-                        raise Exception("未安装 redshift_connector 驱动")
-                    with redshift_connector.connect(host=host, port=port, database=database,
-                                                    user=username, password=password,
-                                                    timeout=timeout, **extra_config) as conn:
-                        with conn.cursor() as cursor:
-                            params = (p1, p2) if p2 else (p1,)
-                            cursor.execute(sql, params)
-                            for idx, row in enumerate(cursor.fetchall()):
-                                fields.append({
-                                    "fieldName": row[0],
-                                    "fieldType": row[1] or "",
-                                    "fieldComment": row[2] or "",
-                                    "fieldIndex": idx
-                                })
-
-                elif ds_type == "kingbase":
-                    with psycopg2.connect(host=host, port=port, database=database,
-                                          user=username, password=password,
-                                          options=f"-c statement_timeout={timeout * 1000}",
-                                          **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                        elif ds_type == "kingbase":
                             formatted_sql = sql.format(p1, p2) if p2 else sql.format(p1)
                             cursor.execute(formatted_sql)
-                            for idx, row in enumerate(cursor.fetchall()):
-                                fields.append({
-                                    "fieldName": row[0],
-                                    "fieldType": row[1] or "",
-                                    "fieldComment": row[2] or "",
-                                    "fieldIndex": idx
-                                })
-
-                elif ds_type == "es":
-                    # Elasticsearch：获取索引的字段
-                    es_client = DatasourceConnectionUtil._get_es_connect(config)
-                    mapping = es_client.indices.get_mapping(index=table_name)
-                    properties = mapping.get(table_name, {}).get("mappings", {}).get("properties", {})
-                    for idx, (field, field_config) in enumerate(properties.items()):
-                        field_type = field_config.get("type", "")
-                        desc = ""
-                        if field_config.get("_meta"):
-                            desc = field_config.get("_meta", {}).get('description', '')
-                        if not field_type:
-                            # object、nested 等类型
-                            field_type = ','.join(list(field_config.keys()))
-                        fields.append({
-                            "fieldName": field,
-                            "fieldType": field_type,
-                            "fieldComment": desc,
-                            "fieldIndex": idx
-                        })
+                        else:
+                            # Doris / StarRocks / Redshift
+                            params = (p1, p2) if p2 else (p1,)
+                            cursor.execute(sql, params)
+                        for idx, row in enumerate(cursor.fetchall()):
+                            fields.append({
+                                "fieldName": row[0],
+                                "fieldType": row[1] or "",
+                                "fieldComment": row[2] or "",
+                                "fieldIndex": idx
+                            })
 
             return fields
         except Exception as e:
@@ -848,160 +768,237 @@ class DatasourceConnectionUtil:
         return value
 
     @staticmethod
-    def execute_query(ds_type: str, config: Dict[str, Any], sql: str) -> List[Dict[str, Any]]:
-        """执行SQL查询并返回结果"""
+    def _estimate_value_size(value: Any) -> int:
+        """粗略估算单个值占用的字节数（用于结果集字节上限判断）"""
+        if isinstance(value, (str, bytes)):
+            return len(value) + 8
+        return 8
+
+    @staticmethod
+    def fetch_bounded_columnar(
+        fetchmany,
+        columns: List[str],
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        convert_value=None,
+    ) -> Tuple[List[List[Any]], bool]:
+        """
+        分批拉取游标结果并按列存储，超过行数或字节上限时停止拉取
+        每批数据整体转置后按列转换、追加，避免逐行构造字典
+
+        Args:
+            fetchmany: 游标的 fetchmany 方法（DBAPI cursor 或 SQLAlchemy Result）
+            columns: 列名列表
+            max_rows: 最多返回行数，默认 SQL_RESULT_MAX_ROWS
+            max_bytes: 结果集估算字节数上限，默认 SQL_RESULT_MAX_BYTES（按批次检查）
+            convert_value: 单元格值转换函数（可选）
+
+        Returns:
+            (column_data, truncated)，column_data 与 columns 一一对应；truncated 为 True 表示还有未拉取的数据
+        """
+        max_rows = SQL_RESULT_MAX_ROWS if max_rows is None else max_rows
+        max_bytes = SQL_RESULT_MAX_BYTES if max_bytes is None else max_bytes
+        estimate = DatasourceConnectionUtil._estimate_value_size
+
+        column_data: List[List[Any]] = [[] for _ in columns]
+        row_count = 0
+        total_bytes = 0
+        while True:
+            batch = fetchmany(SQL_FETCH_BATCH_SIZE)
+            if not batch:
+                return column_data, False
+            if row_count >= max_rows or total_bytes >= max_bytes:
+                return column_data, True
+
+            truncated = len(batch) > max_rows - row_count
+            if truncated:
+                batch = batch[:max_rows - row_count]
+            for idx, values in enumerate(zip(*batch)):
+                if convert_value:
+                    values = [convert_value(v) for v in values]
+                column_data[idx].extend(values)
+                total_bytes += sum(estimate(v) for v in values)
+            row_count += len(batch)
+            if truncated:
+                return column_data, True
+
+    @staticmethod
+    def fetch_bounded(
+        fetchmany,
+        columns: List[str],
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        convert_value=None,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        分批拉取游标结果并转换为字典列表，超过行数或字节上限时停止拉取
+
+        Returns:
+            (data, truncated)，truncated 为 True 表示还有未拉取的数据
+        """
+        column_data, truncated = DatasourceConnectionUtil.fetch_bounded_columnar(
+            fetchmany, columns, max_rows, max_bytes, convert_value
+        )
+        return [dict(zip(columns, row)) for row in zip(*column_data)], truncated
+
+    @staticmethod
+    def stream_query_columnar(
+        connection,
+        sql: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        convert_value=None,
+    ) -> Tuple[List[str], List[List[Any]], bool]:
+        """
+        在 SQLAlchemy 连接上使用服务端游标（stream_results）流式执行查询，超过上限时停止拉取
+
+        结果未读完（截断或拉取出错）时不关闭结果集：pymysql 等驱动的服务端游标关闭时会读完剩余结果，
+        改为作废连接（关闭底层连接，不归还连接池）
+
+        Returns:
+            (columns, column_data, truncated)
+        """
+        result = connection.execution_options(
+            stream_results=True, max_row_buffer=SQL_FETCH_BATCH_SIZE
+        ).execute(text(sql))
+        drained = False
+        try:
+            columns = list(result.keys())
+            column_data, truncated = DatasourceConnectionUtil.fetch_bounded_columnar(
+                result.fetchmany, columns, max_rows, max_bytes, convert_value
+            )
+            drained = not truncated
+            return columns, column_data, truncated
+        finally:
+            if drained:
+                result.close()
+            else:
+                connection.invalidate()
+
+    @staticmethod
+    def _open_streaming_cursor(ds_type: str, conn):
+        """为原生驱动打开服务端游标（驱动不支持时使用普通游标）"""
+        if ds_type in ("doris", "starrocks"):
+            return conn.cursor(pymysql.cursors.SSCursor)
+        if ds_type == "kingbase" and not getattr(conn, "autocommit", False):
+            # psycopg2 命名游标即服务端游标，需要在事务中使用
+            cursor = conn.cursor(name=f"aix_stream_{int(time.time() * 1000000)}")
+            cursor.itersize = SQL_FETCH_BATCH_SIZE
+            return cursor
+        return conn.cursor()
+
+    @staticmethod
+    def execute_query(ds_type: str, config: Dict[str, Any], sql: str, ds_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """执行SQL查询并返回结果（超过 SQL_RESULT_MAX_ROWS / SQL_RESULT_MAX_BYTES 时截断）"""
+        data, truncated = DatasourceConnectionUtil.execute_query_bounded(ds_type, config, sql, ds_id)
+        if truncated:
+            logger.warning(f"查询结果超过上限，已截断为 {len(data)} 行")
+        return data
+
+    @staticmethod
+    def execute_query_bounded(
+        ds_type: str,
+        config: Dict[str, Any],
+        sql: str,
+        ds_id: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        流式执行SQL查询并返回字典列表，内存占用受行数/字节上限约束
+
+        Returns:
+            (data, truncated)，truncated 为 True 表示结果超过上限被截断
+        """
+        columns, column_data, truncated = DatasourceConnectionUtil.execute_query_columnar(
+            ds_type, config, sql, ds_id, max_rows, max_bytes
+        )
+        return [dict(zip(columns, row)) for row in zip(*column_data)], truncated
+
+    @staticmethod
+    def execute_query_columnar(
+        ds_type: str,
+        config: Dict[str, Any],
+        sql: str,
+        ds_id: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Tuple[List[str], List[List[Any]], bool]:
+        """
+        使用服务端游标流式执行SQL查询，分批拉取并按列转换，内存占用受行数/字节上限约束
+
+        Returns:
+            (columns, column_data, truncated)，truncated 为 True 表示结果超过上限被截断
+        """
         # 移除末尾的分号
         while sql.endswith(';'):
             sql = sql[:-1]
 
+        convert_value = DatasourceConnectionUtil._process_row_value
         try:
             db = DB.get_db(ds_type)
             timeout = config.get("timeout", 30)
-            extra_config = DatasourceConnectionUtil._get_extra_config(config)
 
             if db.connect_type == ConnectType.sqlalchemy:
-                # SQLAlchemy 驱动的数据库
-                uri = DatasourceConnectionUtil.build_connection_uri(ds_type, config)
-                if ds_type == "oracle":
-                    engine = create_engine(uri, pool_pre_ping=True)
-                elif ds_type == "sqlServer":
-                    # SQL Server 2022 需要禁用加密以兼容 pymssql
-                    # pymssql 不支持 connect_timeout，使用 login_timeout 和 timeout
-                    engine = create_engine(
-                        uri, pool_pre_ping=True, connect_args={"timeout": timeout, "login_timeout": timeout, "encryption": "off"}
-                    )
-                else:
-                    engine = create_engine(uri, pool_pre_ping=True, connect_args={"connect_timeout": timeout})
+                # SQLAlchemy 驱动的数据库：stream_results 使用服务端游标
+                engine = get_datasource_pool_registry().get_engine(ds_type, config, ds_id)
                 with engine.connect() as conn:
-                    result = conn.execute(text(sql))
-                    rows = result.fetchall()
-                    columns = list(result.keys())
-                    data = []
-                    for row in rows:
-                        row_dict = {}
-                        for i, col in enumerate(columns):
-                            row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                        data.append(row_dict)
-                    return data
+                    return DatasourceConnectionUtil.stream_query_columnar(
+                        conn, sql, max_rows, max_bytes, convert_value
+                    )
+
+            elif ds_type == "es":
+                # Elasticsearch：通过 SQL API 执行查询
+                host_url = config.get("host", "")
+                while host_url.endswith('/'):
+                    host_url = host_url[:-1]
+                url = f'{host_url}/_sql?format=json'
+                response = requests.post(
+                    url,
+                    data=json.dumps({"query": sql}),
+                    headers=DatasourceConnectionUtil._get_es_auth(config),
+                    verify=False
+                )
+                res = response.json()
+                if res.get('error'):
+                    raise Exception(json.dumps(res))
+                columns = [col.get('name') for col in res.get('columns', [])]
+                rows = iter(res.get('rows', []))
+                column_data, truncated = DatasourceConnectionUtil.fetch_bounded_columnar(
+                    lambda size: [row for _, row in zip(range(size), rows)],
+                    columns, max_rows, max_bytes, convert_value,
+                )
+                # ES SQL 分页返回，存在 cursor 说明还有后续数据未拉取
+                return columns, column_data, truncated or bool(res.get('cursor'))
+
             else:
-                # Python 原生驱动的数据库
-                host = config.get("host", "")
-                port = config.get("port", 3306)
-                username = config.get("username", "")
-                password = config.get("password", "")
-                database = config.get("database", "")
-
-                if ds_type == "dm":
-                    if dmPython is None:
-                        raise Exception("未安装达梦数据库驱动 dmPython")
-                    with dmPython.connect(user=username, password=password, server=host,
-                                          port=port, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                # Python 原生驱动的数据库（从连接池检出连接）
+                with DatasourceConnectionUtil.native_connection(ds_type, config, ds_id) as conn:
+                    cursor = DatasourceConnectionUtil._open_streaming_cursor(ds_type, conn)
+                    # 执行失败（语法、权限错误等）时没有待读取的结果，正常关闭游标并归还连接
+                    drained = True
+                    try:
+                        if ds_type == "dm":
                             cursor.execute(sql, timeout=timeout)
-                            rows = cursor.fetchall()
-                            columns = [field[0] for field in cursor.description]
-                            data = []
-                            for row in rows:
-                                row_dict = {}
-                                for i, col in enumerate(columns):
-                                    row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                                data.append(row_dict)
-                            return data
-
-                elif ds_type in ("doris", "starrocks"):
-                    # StarRocks/Doris 连接参数优化：
-                    # 1. 增加 connect_timeout 到至少 60 秒（连接建立可能需要更长时间）
-                    # 2. 添加 write_timeout 防止写入超时
-                    # 3. 设置 charset 确保编码正确
-                    # 4. 设置 autocommit 提高兼容性
-                    connect_timeout = max(timeout, 60)  # 至少 60 秒连接超时
-                    with pymysql.connect(
-                        user=username, 
-                        passwd=password, 
-                        host=host,
-                        port=port, 
-                        db=database, 
-                        connect_timeout=connect_timeout,
-                        read_timeout=timeout,
-                        write_timeout=timeout,
-                        charset='utf8mb4',
-                        autocommit=True,
-                        **extra_config
-                    ) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute(sql)
-                            rows = cursor.fetchall()
-                            columns = [field[0] for field in cursor.description]
-                            data = []
-                            for row in rows:
-                                row_dict = {}
-                                for i, col in enumerate(columns):
-                                    row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                                data.append(row_dict)
-                            return data
-
-                elif ds_type == "redshift":
-                    if redshift_connector is None:
-                        raise Exception("未安装 redshift_connector 驱动")
-                    with redshift_connector.connect(host=host, port=port, database=database,
-                                                    user=username, password=password,
-                                                    timeout=timeout, **extra_config) as conn:
-                        with conn.cursor() as cursor:
+                        else:
                             cursor.execute(sql)
-                            rows = cursor.fetchall()
-                            columns = [field[0] for field in cursor.description]
-                            data = []
-                            for row in rows:
-                                row_dict = {}
-                                for i, col in enumerate(columns):
-                                    row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                                data.append(row_dict)
-                            return data
-
-                elif ds_type == "kingbase":
-                    with psycopg2.connect(host=host, port=port, database=database,
-                                          user=username, password=password,
-                                          options=f"-c statement_timeout={timeout * 1000}",
-                                          **extra_config) as conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute(sql)
-                            rows = cursor.fetchall()
-                            columns = [field[0] for field in cursor.description]
-                            data = []
-                            for row in rows:
-                                row_dict = {}
-                                for i, col in enumerate(columns):
-                                    row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                                data.append(row_dict)
-                            return data
-
-                elif ds_type == "es":
-                    # Elasticsearch：通过 SQL API 执行查询
-                    host_url = config.get("host", "")
-                    while host_url.endswith('/'):
-                        host_url = host_url[:-1]
-                    url = f'{host_url}/_sql?format=json'
-                    response = requests.post(
-                        url,
-                        data=json.dumps({"query": sql}),
-                        headers=DatasourceConnectionUtil._get_es_auth(config),
-                        verify=False
-                    )
-                    res = response.json()
-                    if res.get('error'):
-                        raise Exception(json.dumps(res))
-                    columns = [col.get('name') for col in res.get('columns', [])]
-                    rows = res.get('rows', [])
-                    data = []
-                    for row in rows:
-                        row_dict = {}
-                        for i, col in enumerate(columns):
-                            row_dict[col] = DatasourceConnectionUtil._process_row_value(row[i])
-                        data.append(row_dict)
-                    return data
-
-                else:
-                    raise Exception(f"不支持的数据源类型: {ds_type}")
+                        drained = False
+                        # 服务端游标（如 psycopg2 命名游标）在首次拉取后才有 description
+                        pending = [cursor.fetchmany(SQL_FETCH_BATCH_SIZE)]
+                        columns = [field[0] for field in cursor.description or []]
+                        column_data, truncated = DatasourceConnectionUtil.fetch_bounded_columnar(
+                            lambda size: pending.pop() if pending else cursor.fetchmany(size),
+                            columns, max_rows, max_bytes, convert_value,
+                        )
+                        drained = not truncated
+                        return columns, column_data, truncated
+                    finally:
+                        if drained:
+                            cursor.close()
+                        else:
+                            # 结果未读完时不关闭游标（pymysql SSCursor 关闭时会读完剩余结果集），
+                            # 直接作废连接：关闭底层连接，连接池随后新建连接补充
+                            conn.invalidate()
 
         except Exception as e:
             logger.error(f"执行查询失败: {e}")
@@ -1061,3 +1058,242 @@ class DatasourceConfigUtil:
         except Exception as e:
             logger.error(f"解密配置失败: {e}")
             raise
+
+
+# 本进程的数据源配置版本号；绑定 shared_ctx 后以共享版本号为准
+_local_datasource_versions: Dict[int, int] = {}
+_shared_datasource_versions = None
+_datasource_version_lock = Lock()
+
+
+def bind_shared_datasource_versions(shared_array) -> None:
+    """
+    绑定跨 worker 共享的数据源配置版本号（multiprocessing.Array），在 worker 启动时调用
+    """
+    global _shared_datasource_versions
+    _shared_datasource_versions = shared_array
+
+
+def get_datasource_version(ds_id: Optional[int]) -> int:
+    """
+    数据源配置版本号（跨 worker 共享），持有数据源连接池或配置的长期缓存可据此判断是否需要重建
+    """
+    if ds_id is None:
+        return 0
+    if _shared_datasource_versions is not None:
+        return _shared_datasource_versions[ds_id % len(_shared_datasource_versions)]
+    return _local_datasource_versions.get(ds_id, 0)
+
+
+def bump_datasource_version(ds_id: Optional[int]) -> None:
+    """
+    递增数据源配置版本号，通知其它 worker 重建该数据源的连接池和缓存
+    """
+    if ds_id is None:
+        return
+    with _datasource_version_lock:
+        _local_datasource_versions[ds_id] = _local_datasource_versions.get(ds_id, 0) + 1
+    if _shared_datasource_versions is not None:
+        with _shared_datasource_versions.get_lock():
+            _shared_datasource_versions[ds_id % len(_shared_datasource_versions)] += 1
+
+
+class _PoolEntry:
+    """连接池注册表条目"""
+
+    __slots__ = ("ds_id", "pool", "last_used", "version")
+
+    def __init__(self, ds_id: Optional[int], pool, version: int = 0):
+        self.ds_id = ds_id
+        self.pool = pool  # SQLAlchemy Engine 或原生驱动 QueuePool
+        self.last_used = time.time()
+        self.version = version  # 创建时的数据源配置版本号
+
+    def in_use(self) -> bool:
+        """是否仍有连接被检出（正在执行查询的连接池不能被回收）"""
+        pool = self.pool.pool if isinstance(self.pool, Engine) else self.pool
+        try:
+            return pool.checkedout() > 0
+        except Exception:
+            return False
+
+    def dispose(self):
+        try:
+            self.pool.dispose()
+        except Exception as e:
+            logger.warning(f"释放数据源连接池失败 (ds_id={self.ds_id}): {e}")
+
+
+class DatasourcePoolRegistry:
+    """
+    用户数据源连接池注册表 (单例模式)
+    按 (数据源ID, 配置哈希) 复用 SQLAlchemy engine 和原生驱动连接池，避免每次问答都重新建立 TCP/TLS/认证握手。
+    - 池大小受 DATASOURCE_POOL_SIZE / DATASOURCE_POOL_MAX_OVERFLOW 限制
+    - 空闲超过 DATASOURCE_POOL_IDLE_TIMEOUT 的连接池自动释放，总数超过 DATASOURCE_POOL_MAX_ENTRIES 时按 LRU 淘汰
+    - 检出连接前做预检测（pre-ping），失效连接自动重建
+    - 数据源配置变更/删除时通过 invalidate(ds_id) 主动失效，并递增共享的数据源配置版本号，
+      其它 worker 获取连接池时发现版本号变化即释放旧连接池
+    """
+
+    _instance = None
+    _initialized = False
+
+    # 空闲回收的检查间隔（秒）
+    SWEEP_INTERVAL = 60
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DatasourcePoolRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # 防止重复初始化
+        if DatasourcePoolRegistry._initialized:
+            return
+
+        self._entries: "OrderedDict[Tuple[str, Optional[int], str], _PoolEntry]" = OrderedDict()
+        self._lock = Lock()
+        self._last_sweep = time.time()
+        DatasourcePoolRegistry._initialized = True
+
+    @staticmethod
+    def config_hash(ds_type: str, config: Dict[str, Any]) -> str:
+        """计算数据源配置哈希，配置任一项变化都会得到新的连接池"""
+        payload = json.dumps({"type": ds_type, "config": config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def get_engine(self, ds_type: str, config: Dict[str, Any], ds_id: Optional[int] = None) -> Engine:
+        """获取（或创建）SQLAlchemy 驱动数据源的 engine"""
+        key = ("engine", ds_id, self.config_hash(ds_type, config))
+        return self._get_or_create(
+            key,
+            ds_id,
+            lambda: DatasourceConnectionUtil._create_engine(
+                ds_type,
+                config,
+                pool_size=DATASOURCE_POOL_SIZE,
+                max_overflow=DATASOURCE_POOL_MAX_OVERFLOW,
+                pool_timeout=DATASOURCE_POOL_TIMEOUT,
+                pool_recycle=DATASOURCE_POOL_RECYCLE,
+            ),
+        )
+
+    def get_native_pool(self, ds_type: str, config: Dict[str, Any], ds_id: Optional[int] = None) -> QueuePool:
+        """获取（或创建）原生驱动数据源的连接池"""
+        key = ("native", ds_id, self.config_hash(ds_type, config))
+
+        def _create_pool() -> QueuePool:
+            pool = QueuePool(
+                lambda: DatasourceConnectionUtil._create_native_connection(ds_type, config),
+                pool_size=DATASOURCE_POOL_SIZE,
+                max_overflow=DATASOURCE_POOL_MAX_OVERFLOW,
+                timeout=DATASOURCE_POOL_TIMEOUT,
+                recycle=DATASOURCE_POOL_RECYCLE,
+            )
+            # 原生连接池没有方言对象，无法使用 pre_ping，改为检出时执行 SELECT 1 预检测
+            event.listen(pool, "checkout", DatasourcePoolRegistry._ping_on_checkout)
+            return pool
+
+        return self._get_or_create(key, ds_id, _create_pool)
+
+    @staticmethod
+    def _ping_on_checkout(dbapi_connection, connection_record, connection_proxy):
+        """检出原生连接时预检测，抛出 DisconnectionError 后连接池会丢弃该连接并重新建立"""
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            raise DisconnectionError(f"原生驱动连接已失效: {e}")
+
+    def _get_or_create(self, key: Tuple[str, Optional[int], str], ds_id: Optional[int], factory):
+        self._sweep_if_due()
+
+        evicted: List[_PoolEntry] = []
+        version = get_datasource_version(ds_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                # 数据源配置已在其它 worker 中变更，释放该数据源的旧连接池
+                stale_keys = [k for k, e in self._entries.items() if e.ds_id == ds_id and e.version != version]
+                evicted.extend(self._entries.pop(k) for k in stale_keys)
+                logger.info(f"数据源 {ds_id} 配置版本已变更，释放 {len(stale_keys)} 个旧连接池")
+                entry = None
+            if entry is None:
+                entry = _PoolEntry(ds_id, factory(), version)
+                self._entries[key] = entry
+                logger.info(f"创建数据源连接池: type={key[0]}, ds_id={ds_id}, 当前连接池数: {len(self._entries)}")
+
+                # 超出上限时按 LRU 淘汰空闲的连接池
+                if len(self._entries) > DATASOURCE_POOL_MAX_ENTRIES:
+                    for old_key, old_entry in list(self._entries.items()):
+                        if len(self._entries) <= DATASOURCE_POOL_MAX_ENTRIES:
+                            break
+                        if old_key != key and not old_entry.in_use():
+                            evicted.append(self._entries.pop(old_key))
+            else:
+                self._entries.move_to_end(key)
+            entry.last_used = time.time()
+
+        for old_entry in evicted:
+            old_entry.dispose()
+        return entry.pool
+
+    def _sweep_if_due(self):
+        if time.time() - self._last_sweep >= self.SWEEP_INTERVAL:
+            self.sweep_idle()
+
+    def sweep_idle(self) -> int:
+        """释放空闲超时的连接池，返回释放数量"""
+        now = time.time()
+        with self._lock:
+            self._last_sweep = now
+            expired_keys = [
+                key
+                for key, entry in self._entries.items()
+                if now - entry.last_used > DATASOURCE_POOL_IDLE_TIMEOUT and not entry.in_use()
+            ]
+            expired = [self._entries.pop(key) for key in expired_keys]
+
+        for entry in expired:
+            entry.dispose()
+        if expired:
+            logger.info(f"释放 {len(expired)} 个空闲的数据源连接池")
+        return len(expired)
+
+    def invalidate(self, ds_id: int) -> int:
+        """
+        数据源配置变更或删除时，释放该数据源的全部连接池，返回释放数量
+        同时递增共享的数据源配置版本号，其它 worker 在下次获取连接池时释放旧连接池
+        """
+        bump_datasource_version(ds_id)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.ds_id == ds_id]
+            removed = [self._entries.pop(key) for key in keys]
+
+        for entry in removed:
+            entry.dispose()
+        if removed:
+            logger.info(f"数据源 {ds_id} 配置已变更，释放 {len(removed)} 个连接池")
+        return len(removed)
+
+    def dispose_all(self):
+        """释放全部连接池（进程退出时调用）"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        for entry in entries:
+            entry.dispose()
+
+
+# 提供全局访问点
+def get_datasource_pool_registry() -> DatasourcePoolRegistry:
+    """
+    获取用户数据源连接池注册表实例
+    :return: DatasourcePoolRegistry
+    """
+    return DatasourcePoolRegistry()
@@ -242,3 +242,30 @@ def generate_embedding_local_sync(text: str) -> Optional[List[float]]:
         )
         return None
         return None
+
+
+def generate_embeddings_local_sync(texts: List[str]) -> Optional[List[List[float]]]:
+    """
+    使用本地模型批量生成文档 embedding（同步版本）
+
+    Args:
+        texts: 要生成 embedding 的文本列表
+
+    Returns:
+        与 texts 一一对应的 embedding 向量列表，如果失败则返回 None
+    """
+    if not texts:
+        return []
+
+    model = _get_local_embedding_model()
+    if not model:
+        logger.warning("Local embedding model not available")
+        return None
+
+    try:
+        return model.embed_documents(texts)
+    except Exception as e:
+        logger.error(
+            f"Failed to generate document embeddings with local model: {e}", exc_info=True
+        )
+        return None
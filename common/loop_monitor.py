@@ -0,0 +1,104 @@
+"""
+事件循环延迟监控
+每个 worker 周期性地 sleep 固定间隔，实际唤醒时间与预期时间之差即为事件循环延迟（loop lag），
+延迟过高说明有同步阻塞操作占用了事件循环，此时该 worker 上所有 SSE 流都会停顿
+- 单次延迟超过阈值时立即告警
+- 每个统计周期输出一次 p50 / p99 / max 摘要，以及元数据库线程池、旁路任务执行器的排队数量
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# 采样间隔（秒）
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.5))
+# 单次延迟告警阈值（毫秒）
+EVENT_LOOP_LAG_WARN_MS = float(os.getenv("EVENT_LOOP_LAG_WARN_MS", 200))
+# 统计摘要输出周期（秒），为 0 时不输出摘要
+EVENT_LOOP_LAG_REPORT_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_REPORT_INTERVAL", 60))
+
+_lag_samples: deque = deque(
+    maxlen=max(1, int(EVENT_LOOP_LAG_REPORT_INTERVAL / EVENT_LOOP_LAG_INTERVAL) or 1)
+)
+_lag_lock = threading.Lock()
+_lag_totals = {"samples": 0, "slow": 0, "max_ms": 0.0}
+
+
+def _percentile(sorted_values, ratio: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def get_loop_lag_stats() -> Dict[str, Any]:
+    """
+    获取当前 worker 的事件循环延迟统计
+
+    Returns:
+        {"p50_ms", "p99_ms", "max_ms"}（最近一个统计周期），以及累计的 samples / slow / peak_ms
+    """
+    with _lag_lock:
+        recent = sorted(_lag_samples)
+        totals = dict(_lag_totals)
+    return {
+        "p50_ms": round(_percentile(recent, 0.5), 1),
+        "p99_ms": round(_percentile(recent, 0.99), 1),
+        "max_ms": round(recent[-1], 1) if recent else 0.0,
+        "samples": totals["samples"],
+        "slow": totals["slow"],
+        "peak_ms": round(totals["max_ms"], 1),
+    }
+
+
+def _record(lag_ms: float):
+    with _lag_lock:
+        _lag_samples.append(lag_ms)
+        _lag_totals["samples"] += 1
+        if lag_ms > EVENT_LOOP_LAG_WARN_MS:
+            _lag_totals["slow"] += 1
+        if lag_ms > _lag_totals["max_ms"]:
+            _lag_totals["max_ms"] = lag_ms
+
+
+async def run_loop_lag_monitor():
+    """
+    事件循环延迟监控任务（每个 worker 启动后通过 app.add_task 注册）
+    """
+    from common.side_task_executor import get_side_task_backlog
+    from model.db_connection_pool import get_db_executor_backlog
+
+    loop = asyncio.get_running_loop()
+    last_report = loop.time()
+    logger.info(
+        f"🩺 事件循环延迟监控已启动: 采样间隔 {EVENT_LOOP_LAG_INTERVAL}s，告警阈值 {EVENT_LOOP_LAG_WARN_MS}ms"
+    )
+    while True:
+        start = loop.time()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL)
+        now = loop.time()
+        lag_ms = max(0.0, (now - start - EVENT_LOOP_LAG_INTERVAL) * 1000)
+        _record(lag_ms)
+
+        if lag_ms > EVENT_LOOP_LAG_WARN_MS:
+            logger.warning(
+                f"⚠️ 事件循环阻塞 {lag_ms:.0f}ms（阈值 {EVENT_LOOP_LAG_WARN_MS:.0f}ms），"
+                f"元数据库线程池排队 {get_db_executor_backlog()} 个任务，旁路任务排队 {get_side_task_backlog()} 个"
+            )
+
+        if (
+            EVENT_LOOP_LAG_REPORT_INTERVAL > 0
+            and now - last_report >= EVENT_LOOP_LAG_REPORT_INTERVAL
+        ):
+            last_report = now
+            stats = get_loop_lag_stats()
+            logger.info(
+                f"📈 事件循环延迟: p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms，"
+                f"累计超阈值 {stats['slow']}/{stats['samples']} 次，"
+                f"元数据库线程池排队 {get_db_executor_backlog()} 个任务，旁路任务排队 {get_side_task_backlog()} 个"
+            )
@@ -0,0 +1,81 @@
+"""
+表结构 embedding 存储迁移脚本
+将 t_datasource_table.embedding 从 JSON 数组字符串（TEXT）迁移为 pgvector VECTOR 类型
+JSON 数组文本与 pgvector 的文本格式兼容，可直接在数据库内完成类型转换
+"""
+
+import logging
+import os
+import sys
+
+from sqlalchemy import text
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.db_connection_pool import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_table_embedding_column() -> bool:
+    """
+    迁移 t_datasource_table.embedding 列类型（可重复执行，已迁移时直接跳过）
+
+    Returns:
+        True 表示列已是 VECTOR 类型或迁移成功
+    """
+    engine = get_db_pool().get_engine()
+    try:
+        with engine.begin() as connection:
+            udt_name = connection.execute(text("""
+                    SELECT udt_name
+                    FROM information_schema.columns
+                    WHERE table_name = 't_datasource_table'
+                      AND column_name = 'embedding'
+                    """)).scalar()
+
+            if udt_name is None:
+                logger.info("t_datasource_table.embedding 列不存在，跳过迁移")
+                return True
+            if udt_name == "vector":
+                return True
+
+            logger.info(
+                f"开始迁移 t_datasource_table.embedding：{udt_name} -> vector ..."
+            )
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            # 无法转换的历史数据（空串、空数组等）置空，后续重新计算 embedding 时会补齐
+            cleared = connection.execute(text(r"""
+                    UPDATE t_datasource_table
+                    SET embedding = NULL
+                    WHERE embedding IS NOT NULL
+                      AND embedding !~ '^\s*\[\s*[-+0-9.eE]'
+                    """)).rowcount
+            if cleared:
+                logger.warning(
+                    f"{cleared} 条表 embedding 格式无效，已置空，请重新计算表结构 embedding"
+                )
+
+            connection.execute(text("""
+                    ALTER TABLE t_datasource_table
+                    ALTER COLUMN embedding TYPE vector USING embedding::vector
+                    """))
+            connection.execute(
+                text(
+                    "COMMENT ON COLUMN t_datasource_table.embedding "
+                    "IS '表结构向量数据（pgvector VECTOR 类型，支持动态维度）'"
+                )
+            )
+
+        logger.info("✅ t_datasource_table.embedding 已迁移为 VECTOR 类型")
+        return True
+    except Exception as e:
+        logger.error(f"迁移 t_datasource_table.embedding 失败: {e}", exc_info=True)
+        return False
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    success = migrate_table_embedding_column()
+    sys.exit(0 if success else 1)
@@ -17,10 +17,35 @@ from minio import Minio, S3Error
 from sanic import Request
 
 from common.exception import MyException
+from common.upload_stream import UploadedFile
 from constants.code_enum import SysCodeEnum as SysCode
 
 logger = logging.getLogger(__name__)
 
+# 上传解析表格文件时每个 Sheet 保留的最大行数，超出部分以列统计摘要代替
+UPLOAD_PARSE_MAX_ROWS = int(os.getenv("UPLOAD_PARSE_MAX_ROWS", 200))
+# 上传解析表格文件时单元格文本的最大长度
+UPLOAD_PARSE_MAX_CELL_CHARS = int(os.getenv("UPLOAD_PARSE_MAX_CELL_CHARS", 200))
+# 列统计摘要中每列保留的高频取值个数
+UPLOAD_PARSE_TOP_VALUES = 5
+# 上传并解析的文件大小上限（字节）
+UPLOAD_PARSE_MAX_FILE_SIZE = int(os.getenv("UPLOAD_PARSE_MAX_FILE_SIZE", str(50 * 1024 * 1024)))
+# 上传 MinIO 的分片大小（字节，不小于 5MB），大文件按分片流式上传
+MINIO_UPLOAD_PART_SIZE = max(int(os.getenv("MINIO_UPLOAD_PART_SIZE", str(10 * 1024 * 1024))), 5 * 1024 * 1024)
+
+# 支持上传解析的 MIME 类型
+ALLOWED_PARSE_MIMES = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # .docx
+    "application/msword",  # .doc
+    "text/plain",  # .txt
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # .xlsx
+    "application/vnd.ms-excel",  # .xls
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",  # .pptx
+    "application/vnd.ms-powerpoint",  # .ppt
+    "application/pdf",  # .pdf
+    "text/csv",  # .csv
+}
+
 
 class MinioUtils:
     """
@@ -86,7 +111,7 @@ class MinioUtils:
         self, request: Request, bucket_name: str = "filedata", object_name: str = None
     ) -> dict:
         """
-        从请求中读取文件数据并上传到MinIO服务器，返回预签名URL。
+        从请求中读取文件数据并上传到MinIO服务器（请求体已整体缓冲，流式接收请使用 upload_received_file）
 
         参数:
         - request: Sanic请求对象
@@ -94,24 +119,58 @@ class MinioUtils:
         返回:
         - 包含object_key的字典
         """
+        file_data = request.files.get("file")
+        if not file_data:
+            raise MyException(SysCode.c_9999, "未找到文件数据")
+        upload = UploadedFile.from_bytes(file_data.name, file_data.type, file_data.body)
+        try:
+            return self.upload_received_file(upload, bucket_name, object_name)
+        finally:
+            upload.close()
+
+    @staticmethod
+    def _dedup_object_name(upload: UploadedFile) -> str:
+        # 内容哈希作为前缀：不同用户上传的同名文件不会互相覆盖，相同文件重复上传时复用已有对象
+        return f"{upload.sha256[:32]}__{upload.name}"
+
+    def _object_exists(self, bucket_name: str, object_name: str, size: int | None = None) -> bool:
         try:
-            file_data = request.files.get("file")
-            if not file_data:
-                raise MyException(SysCode.c_9999, "未找到文件数据")
+            stat = self.client.stat_object(bucket_name=bucket_name, object_name=object_name)
+        except Exception:
+            return False
+        return size is None or stat.size == size
 
-            file_stream = io.BytesIO(file_data.body)
-            file_length = len(file_data.body)
+    def upload_received_file(
+        self, upload: UploadedFile, bucket_name: str = "filedata", object_name: str = None
+    ) -> dict:
+        """
+        将已接收的上传文件以分片方式上传到MinIO（阻塞操作，需在线程池中调用）
+        未指定 object_name 时按内容哈希命名，已存在相同内容的对象时跳过上传
+
+        参数:
+        - upload: 已接收的上传文件
+        - bucket_name: 存储桶名称
+        - object_name: 对象名称（可选）
+        返回:
+        - 包含object_key的字典
+        """
+        try:
             if object_name is None:
-                # uuid可以避免不同用户上传同名文件 导致minio的文件被覆盖
-                object_name = f"{uuid4()}__{file_data.name}"
+                object_name = self._dedup_object_name(upload)
 
             self.ensure_bucket(bucket_name)
+            if self._object_exists(bucket_name, object_name, upload.size):
+                logger.info(f"File already exists, skip uploading: {object_name}")
+                return {"object_key": object_name}
+
+            upload.file.seek(0)
             self.client.put_object(
                 bucket_name=bucket_name,
                 object_name=object_name,
-                data=file_stream,
-                length=file_length,
-                content_type=file_data.type,
+                data=upload.file,
+                length=upload.size,
+                content_type=upload.type or "application/octet-stream",
+                part_size=MINIO_UPLOAD_PART_SIZE,
             )
             logger.info(f"File successfully uploaded as {object_name}.")
 
@@ -186,11 +245,26 @@ class MinioUtils:
             traceback.print_exception(err)
             raise MyException(SysCode.c_9999)
 
+    def get_object_etag(
+        self, bucket_name: str = "filedata", object_key: str | None = None
+    ) -> str | None:
+        """
+        获取对象的 ETag（内容标识），用于按内容缓存解析结果；获取失败时返回 None
+        """
+        try:
+            if not object_key:
+                return None
+            stat = self.client.stat_object(bucket_name=bucket_name, object_name=object_key)
+            return (stat.etag or "").strip('"') or None
+        except Exception as err:
+            logger.warning(f"Error getting object etag by key {object_key}: {err}")
+            return None
+
     def upload_file_and_parse_from_request(
         self, request: Request, bucket_name: str = "filedata"
     ) -> dict:
         """
-        上传文件并解析文件内容，返回文件内容key。
+        上传文件并解析文件内容（请求体已整体缓冲，流式接收请使用 upload_and_parse_received_file）
 
         参数:
         - request: Sanic请求对象
@@ -198,92 +272,97 @@ class MinioUtils:
         返回:
         - 文件内容key
         """
+        file_data = request.files.get("file")
+        if not file_data:
+            raise MyException(SysCode.c_9999, "未找到文件数据")
+        upload = UploadedFile.from_bytes(file_data.name, file_data.type, file_data.body)
+        try:
+            return self.upload_and_parse_received_file(upload, bucket_name)
+        finally:
+            upload.close()
+
+    def upload_and_parse_received_file(
+        self, upload: UploadedFile, bucket_name: str = "filedata"
+    ) -> dict:
+        """
+        上传已接收的文件并解析文件内容，返回文件内容key（阻塞操作，需在线程池中调用）
+        相同内容的文件重复上传时复用已有的源文件和解析结果
+
+        参数:
+        - upload: 已接收的上传文件
+        - bucket_name: 存储桶名称
+        返回:
+        - 文件内容key
+        """
 
         try:
-            file_data = request.files.get("file")
-            if not file_data:
-                raise MyException(SysCode.c_9999, "未找到文件数据")
-
-            content = io.BytesIO(file_data.body)
-            # uuid可以避免不同用户上传同名文件 导致minio的文件被覆盖
-            object_name = f"{uuid4()}__{file_data.name}"
-            mime_type = file_data.type
+            mime_type = upload.type
             file_suffix = ".txt"
-            # 可选：添加文件大小限制（例如 50MB）
-            if len(file_data.body) > 50 * 1024 * 1024:
+            if upload.size > UPLOAD_PARSE_MAX_FILE_SIZE:
                 raise MyException(SysCode.c_9999, "文件大小超出限制")
 
-            source_file_key = self.upload_file_from_request(
-                request, bucket_name, object_name
-            )
-
             # 校验 MIME 类型是否支持（增强安全性）
-            allowed_mimes = {
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # .docx
-                "application/msword",  # .doc
-                "text/plain",  # .txt
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # .xlsx
-                "application/vnd.ms-excel",  # .xls
-                "application/vnd.openxmlformats-officedocument.presentationml.presentation",  # .pptx
-                "application/vnd.ms-powerpoint",  # .ppt
-                "application/pdf",  # .pdf
-                "text/csv",  # .csv
-            }
-
-            # 获取文件大小
-            file_size = len(file_data.body)
-
-            if mime_type not in allowed_mimes:
+            if mime_type not in ALLOWED_PARSE_MIMES:
                 raise ValueError("不支持的文件格式")
 
-            # 根据文件类型选择不同的方式读取内容
-            if mime_type in (
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                "application/msword",
-            ):
-                doc = Document(content)
-                full_text = "\n".join([para.text for para in doc.paragraphs])
-            elif mime_type == "text/plain":
-                content.seek(0)
-                full_text = content.read().decode("utf-8")
-            elif mime_type == "text/csv":
-                content.seek(0)
-                full_text = self._parse_csv(content)
-            elif mime_type in (
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                "application/vnd.ms-excel",
-            ):
-                content.seek(0)
-                full_text = self._parse_excel(content, mime_type)
-            elif mime_type in (
-                "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                "application/vnd.ms-powerpoint",
-            ):
-                content.seek(0)
-                full_text = self.read_pdf_text_from_bytes(content.getvalue())
-            elif mime_type == "application/pdf":
-                # todo 如果pdf文件中包含图片，则需要使用OCR处理图片 私有化部署minerU支持
-                content.seek(0)
-                full_text = self.read_pdf_text_from_bytes(content.getvalue())
-            else:
-                raise ValueError("不支持的文件格式")
+            object_name = self._dedup_object_name(upload)
+            source_file_key = self.upload_received_file(upload, bucket_name, object_name)
 
-            # 创建一个txt文件并上传
-            parse_file_key = self.upload_to_minio_form_stream(
-                io.BytesIO(full_text.encode("utf-8")),
-                bucket_name,
-                object_name + file_suffix,
-            )
+            parse_file_key = object_name + file_suffix
+            if self._object_exists(bucket_name, parse_file_key):
+                logger.info(f"Parsed file already exists, skip parsing: {parse_file_key}")
+            else:
+                upload.file.seek(0)
+                full_text = self.parse_file_content(upload.file, mime_type)
+                # 创建一个txt文件并上传
+                parse_file_key = self.upload_to_minio_form_stream(
+                    io.BytesIO(full_text.encode("utf-8")),
+                    bucket_name,
+                    parse_file_key,
+                )
             return {
                 "source_file_key": source_file_key["object_key"],
                 "parse_file_key": parse_file_key,
-                "file_size": self._format_file_size(file_size),
+                "file_size": self._format_file_size(upload.size),
             }
         except Exception as err:
             logger.error(f"Error uploading file and parsing from request: {err}")
             traceback.print_exception(type(err), err, err.__traceback__)
             raise MyException(SysCode.c_9999) from err
 
+    def parse_file_content(self, content, mime_type: str) -> str:
+        """
+        根据文件类型读取文件内容
+
+        :param content: 文件对象（可 seek，读取位置在开头）
+        :param mime_type: 文件MIME类型
+        :return: 解析后的文本
+        """
+        if mime_type in (
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            "application/msword",
+        ):
+            doc = Document(content)
+            return "\n".join([para.text for para in doc.paragraphs])
+        elif mime_type == "text/plain":
+            return content.read().decode("utf-8")
+        elif mime_type == "text/csv":
+            return self._parse_csv(content)
+        elif mime_type in (
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "application/vnd.ms-excel",
+        ):
+            return self._parse_excel(content, mime_type)
+        elif mime_type in (
+            "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            "application/vnd.ms-powerpoint",
+        ):
+            return self.read_pdf_text_from_bytes(content.read())
+        elif mime_type == "application/pdf":
+            # todo 如果pdf文件中包含图片，则需要使用OCR处理图片 私有化部署minerU支持
+            return self.read_pdf_text_from_bytes(content.read())
+        raise ValueError("不支持的文件格式")
+
     @staticmethod
     def _format_file_size(size_bytes: int) -> str:
         """
@@ -341,11 +420,52 @@ class MinioUtils:
             logger.error(f"读取CSV文件时出错: {e}")
             raise MyException(SysCode.c_9999, "CSV解析失败") from e
 
+    @staticmethod
+    def _summarize_sheet(df: pd.DataFrame) -> dict:
+        """
+        计算 Sheet 的列统计摘要（按列向量化计算），用于截断后向大模型描述整表数据
+        首行视为表头；数值列给出最小值 / 最大值 / 平均值，其它列给出不同取值数和高频取值
+        """
+        header = [str(v) if pd.notna(v) else f"列{idx + 1}" for idx, v in enumerate(df.iloc[0])]
+        body = df.iloc[1:]
+        columns = []
+        for idx, name in enumerate(header):
+            column = body.iloc[:, idx]
+            non_null = column.dropna()
+            stats = {"column": name, "non_null": int(len(non_null))}
+            if non_null.empty:
+                columns.append(stats)
+                continue
+            numeric = pd.to_numeric(non_null, errors="coerce").dropna()
+            if len(numeric) >= 0.8 * len(non_null):
+                stats.update(
+                    {
+                        "min": float(numeric.min()),
+                        "max": float(numeric.max()),
+                        "mean": round(float(numeric.mean()), 4),
+                    }
+                )
+            else:
+                value_counts = non_null.astype(str).value_counts()
+                stats.update(
+                    {
+                        "distinct": int(len(value_counts)),
+                        "top_values": [
+                            value[:UPLOAD_PARSE_MAX_CELL_CHARS]
+                            for value in value_counts.index[:UPLOAD_PARSE_TOP_VALUES]
+                        ],
+                    }
+                )
+            columns.append(stats)
+        return {"columns": columns}
+
     @staticmethod
     def _parse_excel(content, mime_type):
         """
-        解析Excel文件内容，输出结构化JSON，便于大模型识别
+        解析Excel文件内容，输出紧凑的结构化JSON，便于大模型识别
         自动根据 MIME 类型选择正确引擎，避免 xlrd 读取 .xlsx
+        每个 Sheet 的行以数组形式输出（按原始行列顺序，空单元格为 null），
+        超过 UPLOAD_PARSE_MAX_ROWS 行时截断，并附带整表的列统计摘要
         :param content: Excel文件内容（BytesIO 或 bytes）
         :param mime_type: 文件MIME类型
         :return: JSON 字符串，含结构化表格数据
@@ -379,32 +499,30 @@ class MinioUtils:
             for sheet_name in xls.sheet_names:
                 # 读取时不自动推断 header，保留原始行列结构
                 df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+                nrows = len(df)
                 sheet_data = {
                     "sheet_name": sheet_name,
-                    "nrows": len(df),
+                    "nrows": nrows,
                     "ncols": len(df.columns) if not df.empty else 0,
                     "rows": [],
+                    "truncated": nrows > UPLOAD_PARSE_MAX_ROWS,
                 }
 
-                for row_idx, row in df.iterrows():
-                    row_cells = []
-                    for col_idx, cell in enumerate(row):
-                        # 保留原始值类型（int/float/datetime 等），转字符串用于显示
-                        raw_value = cell
-                        display_value = str(cell) if pd.notna(cell) else None
-                        row_cells.append(
-                            {
-                                "row": row_idx + 1,  # 从 1 开始，符合人类习惯
-                                "col": col_idx + 1,
-                                "value": display_value,  # 用于显示/LLM 理解
-                                "raw_value": raw_value,  # 保留原始数据类型
-                            }
-                        )
-                    sheet_data["rows"].append(row_cells)
+                if not df.empty:
+                    # 整块转换为字符串，空单元格保留为 None，超长文本截断
+                    preview = df.iloc[:UPLOAD_PARSE_MAX_ROWS]
+                    display = preview.astype(str).apply(lambda col: col.str.slice(0, UPLOAD_PARSE_MAX_CELL_CHARS))
+                    sheet_data["rows"] = display.where(preview.notna(), None).values.tolist()
+
+                if sheet_data["truncated"]:
+                    sheet_data["summary"] = {
+                        "rows_omitted": nrows - UPLOAD_PARSE_MAX_ROWS,
+                        **MinioUtils._summarize_sheet(df),
+                    }
 
                 result["sheets"].append(sheet_data)
 
-            return json.dumps(result, ensure_ascii=False, indent=2, default=str)
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
 
         except Exception as e:
             logger.error(f"读取Excel文件时出错: {e}")
@@ -0,0 +1,206 @@
+"""
+模型配置注册表
+进程内缓存 t_ai_model 中各类型默认模型的配置，以及按配置创建的客户端实例（LLM / Embedding），
+避免每次调用 get_llm / 获取 embedding、rerank 配置时都查询元数据库并新建 HTTP 连接池
+- 配置按模型类型缓存，超过 MODEL_REGISTRY_TTL 后重新读取
+- 客户端按 (配置指纹, 温度, 超时等参数) 缓存，配置变化后自然使用新的客户端
+- 模型配置写入时调用 invalidate_model_registry()，通过 Sanic shared_ctx 中的版本号通知其它 worker
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 模型配置缓存有效期（秒），用于兜底跨主机部署等收不到版本通知的场景
+MODEL_REGISTRY_TTL = int(os.getenv("MODEL_REGISTRY_TTL", 300))
+# 缓存的客户端实例数量上限
+MODEL_CLIENT_CACHE_SIZE = int(os.getenv("MODEL_CLIENT_CACHE_SIZE", 32))
+
+# 模型类型：1:LLM, 2:Embedding, 3:Rerank
+MODEL_TYPE_LLM = 1
+MODEL_TYPE_EMBEDDING = 2
+MODEL_TYPE_RERANK = 3
+
+_config_cache: Dict[Tuple[int, bool], Tuple[Optional[Dict[str, Any]], float, int]] = {}
+_client_cache: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+# 异步客户端的连接池绑定事件循环，按事件循环分别缓存，事件循环销毁后随之释放
+_async_client_cache: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, OrderedDict]"
+) = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+# 本进程的配置版本号；绑定 shared_ctx 后以共享版本号为准
+_local_version = 0
+_shared_version = None
+
+
+def bind_shared_version(shared_value) -> None:
+    """
+    绑定跨 worker 共享的配置版本号（multiprocessing.Value），在 worker 启动时调用
+    """
+    global _shared_version
+    _shared_version = shared_value
+
+
+def _current_version() -> int:
+    if _shared_version is not None:
+        return _shared_version.value
+    return _local_version
+
+
+def get_model_registry_version() -> int:
+    """
+    当前模型配置版本号（跨 worker 共享），持有模型客户端的长期缓存可据此判断是否需要重建
+    """
+    return _current_version()
+
+
+def invalidate_model_registry() -> None:
+    """
+    失效模型配置和客户端缓存，并递增共享版本号通知其它 worker
+    """
+    global _local_version
+    with _registry_lock:
+        _config_cache.clear()
+        _client_cache.clear()
+        _async_client_cache.clear()
+        _local_version += 1
+    if _shared_version is not None:
+        with _shared_version.get_lock():
+            _shared_version.value += 1
+    logger.info("已失效模型配置注册表")
+
+
+def _load_model_config(model_type: int, fallback_any: bool) -> Optional[Dict[str, Any]]:
+    from model.db_connection_pool import get_db_pool
+    from model.db_models import TAiModel
+
+    with get_db_pool().get_session() as session:
+        model = (
+            session.query(TAiModel)
+            .filter(TAiModel.model_type == model_type, TAiModel.default_model == True)
+            .first()
+        )
+        if not model and fallback_any:
+            model = (
+                session.query(TAiModel)
+                .filter(TAiModel.model_type == model_type)
+                .first()
+            )
+        if not model:
+            return None
+        return {
+            "id": model.id,
+            "supplier": model.supplier,
+            "base_model": model.base_model,
+            "api_key": model.api_key,
+            "api_domain": model.api_domain,
+            "protocol": model.protocol,
+            "config": model.config,
+        }
+
+
+def get_model_config(
+    model_type: int, fallback_any: bool = True
+) -> Optional[Dict[str, Any]]:
+    """
+    获取指定类型的默认模型配置（带缓存）
+
+    Args:
+        model_type: 模型类型（1:LLM, 2:Embedding, 3:Rerank）
+        fallback_any: 没有默认模型时是否使用该类型的任意模型
+
+    Returns:
+        模型配置字典（副本），未配置时返回 None
+    """
+    key = (model_type, fallback_any)
+    version = _current_version()
+    with _registry_lock:
+        entry = _config_cache.get(key)
+        if entry is not None:
+            config, loaded_at, entry_version = entry
+            if (
+                entry_version == version
+                and time.time() - loaded_at < MODEL_REGISTRY_TTL
+            ):
+                return dict(config) if config else None
+
+    config = _load_model_config(model_type, fallback_any)
+    with _registry_lock:
+        _config_cache[key] = (config, time.time(), version)
+    return dict(config) if config else None
+
+
+def config_fingerprint(config: Optional[Dict[str, Any]]) -> str:
+    """模型配置指纹，用作客户端缓存键的一部分（不直接暴露 api_key）"""
+    if not config:
+        return ""
+    raw = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _get_cached(cache: OrderedDict, key: Tuple, factory: Callable[[], T]) -> T:
+    version = _current_version()
+    with _registry_lock:
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            cache.move_to_end(key)
+            return entry[0]
+
+    client = factory()
+    with _registry_lock:
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            # 并发创建时保留先写入的实例
+            return entry[0]
+        cache[key] = (client, version)
+        cache.move_to_end(key)
+        while len(cache) > MODEL_CLIENT_CACHE_SIZE:
+            cache.popitem(last=False)
+    return client
+
+
+def get_model_client(
+    key: Tuple, factory: Callable[[], T], loop_bound: bool = False
+) -> T:
+    """
+    获取缓存的客户端实例（线程安全的客户端，如 ChatOpenAI / OpenAI），不存在时调用 factory 创建
+
+    Args:
+        key: 缓存键，需包含配置指纹及影响客户端行为的参数（温度、超时等）
+        factory: 创建客户端的函数
+        loop_bound: 客户端同时包含异步连接池（如 ChatOpenAI）时为 True，
+                    在事件循环中调用时按事件循环分别缓存，避免跨事件循环复用异步连接
+    """
+    if loop_bound:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            return get_async_model_client(key, factory)
+    return _get_cached(_client_cache, key, factory)
+
+
+def get_async_model_client(key: Tuple, factory: Callable[[], T]) -> T:
+    """
+    获取当前事件循环下缓存的异步客户端实例（如 AsyncOpenAI），不存在时调用 factory 创建
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        cache = _async_client_cache.get(loop)
+        if cache is None:
+            cache = OrderedDict()
+            _async_client_cache[loop] = cache
+    return _get_cached(cache, key, factory)
@@ -4,7 +4,7 @@
 
 from common.exception import MyException
 from constants.code_enum import SysCodeEnum
-from model.db_connection_pool import get_db_pool
+from model.db_connection_pool import get_db_pool, run_db
 from model.db_models import TUser
 
 
@@ -33,6 +33,47 @@ def is_admin(user_id: int) -> bool:
         return False
 
 
+def has_datasource_permission(user_id: int, datasource_id: int) -> bool:
+    """
+    判断用户是否有数据源的访问权限（管理员拥有全部权限）
+
+    Args:
+        user_id: 用户ID
+        datasource_id: 数据源ID
+
+    Returns:
+        bool: 有权限返回True，否则返回False
+    """
+    from sqlalchemy import and_
+
+    from model.datasource_models import DatasourceAuth
+
+    if is_admin(user_id):
+        return True
+
+    db_pool = get_db_pool()
+    with db_pool.get_session() as session:
+        auth = (
+            session.query(DatasourceAuth.id)
+            .filter(
+                and_(
+                    DatasourceAuth.datasource_id == datasource_id,
+                    DatasourceAuth.user_id == user_id,
+                    DatasourceAuth.enable == True,
+                )
+            )
+            .first()
+        )
+        return auth is not None
+
+
+async def check_datasource_permission(user_id: int, datasource_id: int) -> bool:
+    """
+    异步判断用户是否有数据源的访问权限（数据库查询在元数据库线程池中执行）
+    """
+    return await run_db(has_datasource_permission, user_id, datasource_id)
+
+
 async def check_admin_permission(request):
     """
     检查当前用户是否为管理员，如果不是则抛出异常
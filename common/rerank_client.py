@@ -0,0 +1,319 @@
+"""
+重排（Rerank）客户端
+- 在线重排：基于 httpx 的连接池客户端（keep-alive），支持 DashScope 与通用 rerank API（Jina / vLLM / TEI 等）
+- 离线重排：未配置在线重排模型时，可通过 RERANK_LOCAL_MODEL 使用本地 CrossEncoder 模型
+- 结果按文档下标映射，并按 (归一化问题, 候选文档集合) 缓存，重复或近似重复的问题不再调用重排模型
+"""
+
+import abc
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from common.model_registry import (
+    config_fingerprint,
+    get_async_model_client,
+    get_model_client,
+)
+
+logger = logging.getLogger(__name__)
+
+# 在线重排请求超时（秒）
+RERANK_TIMEOUT = float(os.getenv("RERANK_TIMEOUT", 30))
+# 每个重排 endpoint 保持的最大连接数
+RERANK_MAX_CONNECTIONS = int(os.getenv("RERANK_MAX_CONNECTIONS", 20))
+# 重排结果缓存数量与有效期（秒）
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 1024))
+RERANK_CACHE_TTL = int(os.getenv("RERANK_CACHE_TTL", 600))
+# 离线重排模型（HuggingFace 模型 ID 或本地路径），为空时不启用离线重排
+RERANK_LOCAL_MODEL = os.getenv("RERANK_LOCAL_MODEL", "")
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", "./models")
+
+_rerank_cache: "OrderedDict[Tuple[str, str, str], Tuple[Dict[str, float], float]]" = (
+    OrderedDict()
+)
+_rerank_cache_lock = threading.Lock()
+
+# 问题末尾的标点与语气词不影响重排结果
+_QUERY_TRAILING = re.compile(r"[\s?？。.!！,，、;；~～]+$")
+
+
+def _normalize_query(query: str) -> str:
+    return _QUERY_TRAILING.sub("", " ".join(query.lower().split()))
+
+
+def _doc_hash(document: str) -> str:
+    return hashlib.sha1(document.encode("utf-8")).hexdigest()[:16]
+
+
+class RerankClient(abc.ABC):
+    """
+    重排客户端基类：子类实现 _score（可选覆盖 _ascore），返回 [(文档下标, 分数), ...]
+    rerank / arerank 返回按分数降序排列的 [(文档下标, 分数), ...]
+    """
+
+    def __init__(self, backend_key: str, model_name: str):
+        self.backend_key = backend_key
+        self.model_name = model_name
+
+    @abc.abstractmethod
+    def _score(self, query: str, documents: List[str]) -> List[Tuple[int, float]]:
+        """对文档打分（同步），返回 [(文档下标, 分数), ...]"""
+
+    async def _ascore(
+        self, query: str, documents: List[str]
+    ) -> List[Tuple[int, float]]:
+        return await asyncio.to_thread(self._score, query, documents)
+
+    def _cache_key(self, query: str, doc_hashes: List[str]) -> Tuple[str, str, str]:
+        # 候选集合与顺序无关，结果按文档哈希保存
+        candidate_set = hashlib.sha1(
+            "\n".join(sorted(doc_hashes)).encode("utf-8")
+        ).hexdigest()
+        return self.backend_key, _normalize_query(query), candidate_set
+
+    @staticmethod
+    def _cache_get(key) -> Optional[Dict[str, float]]:
+        with _rerank_cache_lock:
+            entry = _rerank_cache.get(key)
+            if entry is None:
+                return None
+            scores, cached_time = entry
+            if time.time() - cached_time >= RERANK_CACHE_TTL:
+                _rerank_cache.pop(key, None)
+                return None
+            _rerank_cache.move_to_end(key)
+            return scores
+
+    @staticmethod
+    def _cache_put(key, scores: Dict[str, float]):
+        with _rerank_cache_lock:
+            _rerank_cache[key] = (scores, time.time())
+            _rerank_cache.move_to_end(key)
+            while len(_rerank_cache) > RERANK_CACHE_SIZE:
+                _rerank_cache.popitem(last=False)
+
+    @staticmethod
+    def _ranked(
+        doc_hashes: List[str], scores: Dict[str, float]
+    ) -> List[Tuple[int, float]]:
+        ranked = [(idx, scores[h]) for idx, h in enumerate(doc_hashes) if h in scores]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
+
+    def rerank(self, query: str, documents: Sequence[str]) -> List[Tuple[int, float]]:
+        """
+        对文档重排（同步，带缓存），失败时抛出异常由调用方降级
+        """
+        documents = list(documents)
+        if not documents:
+            return []
+        doc_hashes = [_doc_hash(doc) for doc in documents]
+        key = self._cache_key(query, doc_hashes)
+        scores = self._cache_get(key)
+        if scores is not None:
+            logger.info(f"♻️ 命中重排缓存 ({len(documents)} 个候选)")
+            return self._ranked(doc_hashes, scores)
+
+        scores = {
+            doc_hashes[idx]: score for idx, score in self._score(query, documents)
+        }
+        self._cache_put(key, scores)
+        return self._ranked(doc_hashes, scores)
+
+    async def arerank(
+        self, query: str, documents: Sequence[str]
+    ) -> List[Tuple[int, float]]:
+        """
+        对文档重排（异步，带缓存），失败时抛出异常由调用方降级
+        """
+        documents = list(documents)
+        if not documents:
+            return []
+        doc_hashes = [_doc_hash(doc) for doc in documents]
+        key = self._cache_key(query, doc_hashes)
+        scores = self._cache_get(key)
+        if scores is not None:
+            logger.info(f"♻️ 命中重排缓存 ({len(documents)} 个候选)")
+            return self._ranked(doc_hashes, scores)
+
+        scores = {
+            doc_hashes[idx]: score
+            for idx, score in await self._ascore(query, documents)
+        }
+        self._cache_put(key, scores)
+        return self._ranked(doc_hashes, scores)
+
+
+class HttpRerankClient(RerankClient):
+    """
+    在线重排客户端（httpx 连接池，同步 / 异步客户端分别复用）
+    """
+
+    def __init__(self, model_name: str, api_key: Optional[str], base_url: str):
+        self.api_key = api_key
+        self.base_url = base_url
+        # DashScope 与通用 rerank API 的请求 / 响应结构不同
+        self.is_dashscope = "aliyuncs" in base_url or "Qwen" in model_name
+        fingerprint = config_fingerprint(
+            {"name": model_name, "api_key": api_key, "base_url": base_url}
+        )
+        super().__init__(f"http:{fingerprint}", model_name)
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _limits():
+        import httpx
+
+        return httpx.Limits(
+            max_connections=RERANK_MAX_CONNECTIONS,
+            max_keepalive_connections=RERANK_MAX_CONNECTIONS,
+        )
+
+    def _client(self):
+        import httpx
+
+        return get_model_client(
+            ("rerank-http", self.backend_key),
+            lambda: httpx.Client(timeout=RERANK_TIMEOUT, limits=self._limits()),
+        )
+
+    def _async_client(self):
+        import httpx
+
+        return get_async_model_client(
+            ("rerank-http", self.backend_key),
+            lambda: httpx.AsyncClient(timeout=RERANK_TIMEOUT, limits=self._limits()),
+        )
+
+    def _build_payload(self, query: str, documents: List[str]) -> Dict[str, Any]:
+        if self.is_dashscope:
+            # 阿里云 DashScope 格式
+            return {
+                "model": self.model_name,
+                "input": {"query": query, "documents": documents},
+                "parameters": {"top_n": len(documents), "return_documents": False},
+            }
+        # 其他格式（如本地模型或通用rerank API）
+        return {"query": query, "documents": documents}
+
+    def _parse_response(self, result_data: Any, size: int) -> List[Tuple[int, float]]:
+        if self.is_dashscope:
+            items = (
+                (result_data.get("output") or {}).get("results")
+                if isinstance(result_data, dict)
+                else None
+            )
+        elif isinstance(result_data, dict):
+            items = result_data.get("results")
+        else:
+            # 直接返回排序后的结果列表（如 TEI）
+            items = result_data
+        if not isinstance(items, list):
+            raise ValueError("Rerank API 返回格式异常")
+
+        results = []
+        for rank, item in enumerate(items):
+            if not isinstance(item, dict) or "index" not in item:
+                continue
+            idx = int(item["index"])
+            if not 0 <= idx < size:
+                continue
+            score = item.get("relevance_score", item.get("score", 1.0 - rank * 0.01))
+            results.append((idx, float(score)))
+        return results
+
+    def _score(self, query: str, documents: List[str]) -> List[Tuple[int, float]]:
+        response = self._client().post(
+            self.base_url,
+            headers=self._headers(),
+            json=self._build_payload(query, documents),
+        )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Rerank API 调用失败: {response.status_code} - {response.text[:500]}"
+            )
+        return self._parse_response(response.json(), len(documents))
+
+    async def _ascore(
+        self, query: str, documents: List[str]
+    ) -> List[Tuple[int, float]]:
+        response = await self._async_client().post(
+            self.base_url,
+            headers=self._headers(),
+            json=self._build_payload(query, documents),
+        )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Rerank API 调用失败: {response.status_code} - {response.text[:500]}"
+            )
+        return self._parse_response(response.json(), len(documents))
+
+
+class LocalCrossEncoderReranker(RerankClient):
+    """
+    离线重排客户端（sentence-transformers CrossEncoder，CPU 推理）
+    """
+
+    def __init__(self, model_id: str):
+        super().__init__(f"local:{model_id}", model_id)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _resolve_model_path(self) -> str:
+        # 与离线 embedding 模型相同的目录约定：{LOCAL_MODEL_PATH}/rerank/{namespace_name}/
+        custom_path = os.path.join(
+            LOCAL_MODEL_PATH, "rerank", self.model_name.replace("/", "_")
+        )
+        return custom_path if os.path.exists(custom_path) else self.model_name
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    model_path = self._resolve_model_path()
+                    self._model = CrossEncoder(model_path, device="cpu")
+                    logger.info(f"✅ 已加载离线重排模型: {model_path}")
+        return self._model
+
+    def _score(self, query: str, documents: List[str]) -> List[Tuple[int, float]]:
+        scores = self._get_model().predict([(query, doc) for doc in documents])
+        return [(idx, float(score)) for idx, score in enumerate(scores)]
+
+
+def get_rerank_client(config: Optional[Dict[str, Any]]) -> Optional[RerankClient]:
+    """
+    获取重排客户端（按配置复用实例）
+
+    Args:
+        config: 在线重排模型配置 {"name", "api_key", "base_url"}，为空时尝试离线重排模型
+
+    Returns:
+        RerankClient，在线与离线重排均未配置时返回 None
+    """
+    if config and config.get("base_url"):
+        return get_model_client(
+            ("rerank", config_fingerprint(config)),
+            lambda: HttpRerankClient(
+                config["name"], config.get("api_key"), config["base_url"]
+            ),
+        )
+    if RERANK_LOCAL_MODEL:
+        return get_model_client(
+            ("rerank-local", RERANK_LOCAL_MODEL),
+            lambda: LocalCrossEncoderReranker(RERANK_LOCAL_MODEL),
+        )
+    return None
@@ -0,0 +1,290 @@
+"""
+问答旁路任务执行器
+数据问答 / 表格问答在 SQL 执行后的总结、图表配置、推荐问题等 LLM 旁路任务统一提交到进程级线程池执行
+- 按任务类型限制并发数，空闲线程按优先级（总结 > 图表 > 推荐问题）领取任务，同类型任务先进先出
+- 任务按问答分组（side_task_group），客户端断开或停止问答时取消该组尚未开始的任务，已开始的任务结果被丢弃
+- get_side_task_stats() 提供各类型任务的排队数、运行数和排队耗时，事件循环监控周期性输出排队数量
+- 任务只接收所需字段组成的输入（side_task_input），不复制整个 state
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# 旁路任务类型（按优先级从高到低）
+SIDE_TASK_SUMMARY = "summary"
+SIDE_TASK_CHART = "chart"
+SIDE_TASK_RECOMMEND = "recommend"
+SIDE_TASK_KINDS = (SIDE_TASK_SUMMARY, SIDE_TASK_CHART, SIDE_TASK_RECOMMEND)
+
+# 旁路任务线程数（每个 worker 进程）
+SIDE_TASK_WORKERS = int(os.getenv("SIDE_TASK_WORKERS", 16))
+# 各类型任务的并发上限，推荐问题优先级最低，默认最多占用一半线程
+SIDE_TASK_LIMITS = {
+    SIDE_TASK_SUMMARY: int(
+        os.getenv("SIDE_TASK_SUMMARY_CONCURRENCY", SIDE_TASK_WORKERS)
+    ),
+    SIDE_TASK_CHART: int(os.getenv("SIDE_TASK_CHART_CONCURRENCY", SIDE_TASK_WORKERS)),
+    SIDE_TASK_RECOMMEND: int(
+        os.getenv("SIDE_TASK_RECOMMEND_CONCURRENCY", max(1, SIDE_TASK_WORKERS // 2))
+    ),
+}
+# 等待一组旁路任务完成的超时时间（秒）
+SIDE_TASK_TIMEOUT = float(os.getenv("SIDE_TASK_TIMEOUT", 180))
+
+
+class _SideTask:
+    __slots__ = ("kind", "group", "future", "func", "submitted_at")
+
+    def __init__(
+        self, kind: str, group: Optional[str], future: Future, func: Callable[[], Any]
+    ):
+        self.kind = kind
+        self.group = group
+        self.future = future
+        self.func = func
+        self.submitted_at = time.monotonic()
+
+
+class SideTaskExecutor:
+    """
+    按类型限流、按优先级调度的旁路任务线程池
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SIDE_TASK_WORKERS,
+        limits: Optional[Dict[str, int]] = None,
+    ):
+        self._limits = dict(limits or SIDE_TASK_LIMITS)
+        self._pending: Dict[str, deque] = {kind: deque() for kind in SIDE_TASK_KINDS}
+        self._running: Dict[str, int] = {kind: 0 for kind in SIDE_TASK_KINDS}
+        self._groups: Dict[str, set] = {}
+        self._stats = {
+            kind: {"completed": 0, "failed": 0, "cancelled": 0, "max_wait_ms": 0.0}
+            for kind in SIDE_TASK_KINDS
+        }
+        self._cond = threading.Condition()
+        for i in range(max(1, max_workers)):
+            threading.Thread(
+                target=self._worker, name=f"side-task-{i}", daemon=True
+            ).start()
+        logger.info(
+            f"✅ 创建旁路任务线程池: {max_workers} 个线程，并发上限 {self._limits}"
+        )
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args,
+        group: Optional[str] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        提交旁路任务
+
+        Args:
+            kind: 任务类型（SIDE_TASK_SUMMARY / SIDE_TASK_CHART / SIDE_TASK_RECOMMEND）
+            fn: 任务函数，在线程池中以当前上下文（contextvars）执行
+            group: 任务分组（一次问答），用于 cancel_group
+
+        Returns:
+            concurrent.futures.Future
+        """
+        if kind not in self._pending:
+            raise ValueError(f"未知的旁路任务类型: {kind}")
+        future: Future = Future()
+        ctx = contextvars.copy_context()
+        task = _SideTask(kind, group, future, lambda: ctx.run(fn, *args, **kwargs))
+        with self._cond:
+            self._pending[kind].append(task)
+            if group:
+                self._groups.setdefault(group, set()).add(future)
+            self._cond.notify()
+        if group:
+            future.add_done_callback(lambda f: self._discard(group, f))
+        return future
+
+    def _discard(self, group: str, future: Future):
+        with self._cond:
+            futures = self._groups.get(group)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._groups[group]
+
+    def cancel_group(self, group: Optional[str]) -> int:
+        """
+        取消一组旁路任务中尚未开始的任务，返回取消数量
+        """
+        if not group:
+            return 0
+        with self._cond:
+            futures = list(self._groups.get(group, ()))
+        cancelled = sum(1 for future in futures if future.cancel())
+        if cancelled:
+            logger.info(f"🛑 已取消 {cancelled} 个旁路任务（分组 {group}）")
+        return cancelled
+
+    def _next_task(self) -> Optional[_SideTask]:
+        # 调用方持有 self._cond
+        for kind in SIDE_TASK_KINDS:
+            queue = self._pending[kind]
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+                self._stats[kind]["cancelled"] += 1
+            if queue and self._running[kind] < self._limits.get(kind, 1):
+                return queue.popleft()
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task()
+                self._running[task.kind] += 1
+
+            stats = self._stats[task.kind]
+            try:
+                if not task.future.set_running_or_notify_cancel():
+                    with self._cond:
+                        stats["cancelled"] += 1
+                    continue
+                wait_ms = (time.monotonic() - task.submitted_at) * 1000
+                try:
+                    result = task.func()
+                except BaseException as e:
+                    task.future.set_exception(e)
+                    with self._cond:
+                        stats["failed"] += 1
+                else:
+                    task.future.set_result(result)
+                    with self._cond:
+                        stats["completed"] += 1
+                with self._cond:
+                    stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+            finally:
+                with self._cond:
+                    self._running[task.kind] -= 1
+                    # 释放并发名额后，可能有同类型任务可以执行
+                    self._cond.notify()
+
+    def backlog(self) -> int:
+        """排队中的旁路任务数量"""
+        with self._cond:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各类型旁路任务的排队数、运行数与累计统计"""
+        with self._cond:
+            return {
+                kind: {
+                    "pending": len(self._pending[kind]),
+                    "running": self._running[kind],
+                    "limit": self._limits.get(kind, 1),
+                    **self._stats[kind],
+                }
+                for kind in SIDE_TASK_KINDS
+            }
+
+
+_side_task_executor: Optional[SideTaskExecutor] = None
+_side_task_lock = threading.Lock()
+
+
+def get_side_task_executor() -> SideTaskExecutor:
+    """获取进程级旁路任务执行器（单例）"""
+    global _side_task_executor
+    if _side_task_executor is None:
+        with _side_task_lock:
+            if _side_task_executor is None:
+                _side_task_executor = SideTaskExecutor()
+    return _side_task_executor
+
+
+def submit_side_task(
+    kind: str, fn: Callable[..., Any], *args, group: Optional[str] = None, **kwargs
+) -> Future:
+    """提交旁路任务（见 SideTaskExecutor.submit）"""
+    return get_side_task_executor().submit(kind, fn, *args, group=group, **kwargs)
+
+
+def cancel_side_tasks(group: Optional[str]) -> int:
+    """取消一次问答中尚未开始的旁路任务"""
+    if _side_task_executor is None or not group:
+        return 0
+    return _side_task_executor.cancel_group(group)
+
+
+def get_side_task_backlog() -> int:
+    """排队中的旁路任务数量（执行器未创建时为 0）"""
+    return _side_task_executor.backlog() if _side_task_executor is not None else 0
+
+
+def get_side_task_stats() -> Dict[str, Dict[str, Any]]:
+    """各类型旁路任务统计（执行器未创建时为空）"""
+    return _side_task_executor.stats() if _side_task_executor is not None else {}
+
+
+def side_task_input(state: Mapping[str, Any], keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    构建旁路任务的输入：仅包含任务读取的状态字段的新字典
+
+    字段值按引用共享（执行结果、表结构等较大的对象不复制），任务只读取这些对象，
+    结果写入该字典的输出字段，由调用方按任务的合并函数写回 state
+    """
+    return {key: state[key] for key in keys if key in state}
+
+
+async def wait_side_tasks(
+    futures: Dict[str, Future], timeout: float = SIDE_TASK_TIMEOUT
+) -> Dict[str, Any]:
+    """
+    在事件循环中等待一组旁路任务，不占用图执行线程
+
+    Args:
+        futures: {任务名: Future}
+        timeout: 整组任务的超时时间（秒）
+
+    Returns:
+        {任务名: 结果或异常}；超时的任务被取消并返回 TimeoutError。
+        等待被取消（客户端断开 / 停止问答）时取消全部未开始的任务后继续抛出 CancelledError
+    """
+    if not futures:
+        return {}
+    wrapped = {name: asyncio.wrap_future(future) for name, future in futures.items()}
+    try:
+        await asyncio.wait(wrapped.values(), timeout=timeout)
+    except asyncio.CancelledError:
+        _cancel_all(futures.values())
+        raise
+
+    results: Dict[str, Any] = {}
+    for name, aw in wrapped.items():
+        if not aw.done():
+            futures[name].cancel()
+            aw.cancel()
+            results[name] = TimeoutError(f"旁路任务 {name} 超时（{timeout}s）")
+        elif aw.cancelled():
+            results[name] = asyncio.CancelledError()
+        elif aw.exception() is not None:
+            results[name] = aw.exception()
+        else:
+            results[name] = aw.result()
+    return results
+
+
+def _cancel_all(futures: Iterable[Future]):
+    for future in futures:
+        future.cancel()
@@ -0,0 +1,266 @@
+"""
+SQL 解析工具
+对生成的 SQL 只做一次 sqlglot 解析，解析结果（AST、表名、别名映射、SELECT 列）按 SQL 文本 + 方言缓存，
+并通过 state["parsed_sql"] 在 Text2SQL / 表格问答流水线的各节点之间共享
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import parse
+
+logger = logging.getLogger(__name__)
+
+# 数据库类型到 sqlglot 方言的映射
+# 对于 sqlglot 不直接支持的数据源，映射到最接近的兼容方言
+DB_TYPE_TO_DIALECT = {
+    "mysql": "mysql",
+    "postgresql": "postgres",
+    "pg": "postgres",
+    "oracle": "oracle",
+    "sqlserver": "tsql",
+    "mssql": "tsql",
+    "clickhouse": "clickhouse",
+    "ck": "clickhouse",
+    "redshift": "redshift",
+    "elasticsearch": "mysql",  # Elasticsearch 使用 MySQL 兼容语法
+    "es": "mysql",
+    "starrocks": "mysql",  # StarRocks 兼容 MySQL 协议
+    "doris": "mysql",  # Doris 兼容 MySQL 协议
+    "dm": "oracle",  # 达梦数据库兼容 Oracle
+    "kingbase": "postgres",  # 人大金仓兼容 PostgreSQL
+    "excel": "postgres",  # Excel 使用 PostgreSQL 规则
+}
+
+# 进程内解析结果缓存大小（按 SQL 文本 + 方言）
+SQL_PARSE_CACHE_SIZE = int(os.getenv("SQL_PARSE_CACHE_SIZE", 256))
+
+_AGGREGATE_TYPES = (
+    sqlglot.exp.AggFunc,
+    sqlglot.exp.Sum,
+    sqlglot.exp.Count,
+    sqlglot.exp.Avg,
+    sqlglot.exp.Max,
+    sqlglot.exp.Min,
+)
+
+_parse_cache: "OrderedDict[Tuple[str, str], ParsedSQL]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def get_sqlglot_dialect(db_type: Optional[str]) -> str:
+    """
+    将数据库类型映射为 sqlglot 方言，未知类型按 mysql 处理
+    """
+    return DB_TYPE_TO_DIALECT.get(db_type.lower() if db_type else "mysql", "mysql")
+
+
+def _clean_alias(alias_str: str) -> str:
+    """清理别名：去掉外层的反引号、双引号、方括号"""
+    if not alias_str:
+        return alias_str
+    alias_str = alias_str.strip()
+    if alias_str.startswith("`") and alias_str.endswith("`"):
+        alias_str = alias_str[1:-1]
+    if alias_str.startswith('"') and alias_str.endswith('"'):
+        alias_str = alias_str[1:-1]
+    # SQL Server 方括号
+    if alias_str.startswith("[") and alias_str.endswith("]"):
+        alias_str = alias_str[1:-1]
+    return alias_str.strip()
+
+
+class ParsedSQL:
+    """
+    一条 SQL 的解析结果（只读）
+    - expressions 为共享的 AST，调用方如需改写 SQL 必须先调用 copy_expressions()
+    - tables / alias_mapping / 列信息在首次访问时计算并缓存
+    """
+
+    __slots__ = (
+        "sql",
+        "dialect",
+        "expressions",
+        "error",
+        "_tables",
+        "_alias_mapping",
+        "_projections",
+    )
+
+    def __init__(
+        self,
+        sql: str,
+        dialect: str,
+        expressions: List[Any],
+        error: Optional[str] = None,
+    ):
+        self.sql = sql
+        self.dialect = dialect
+        self.expressions = tuple(e for e in expressions if e is not None)
+        self.error = error
+        self._tables: Optional[List[str]] = None
+        self._alias_mapping: Optional[Dict[str, str]] = None
+        self._projections: Optional[List[Dict[str, Any]]] = None
+
+    def __deepcopy__(self, memo):
+        # 解析结果不可变，state 深拷贝时直接共享，避免复制整棵 AST
+        return self
+
+    def __copy__(self):
+        return self
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.expressions)
+
+    def matches(self, sql: str, dialect: str) -> bool:
+        return self.sql == sql and self.dialect == dialect
+
+    def copy_expressions(self) -> List[Any]:
+        """返回 AST 的副本（用于改写 SQL，不影响缓存中的解析结果）"""
+        return [e.copy() for e in self.expressions]
+
+    @property
+    def tables(self) -> List[str]:
+        """第一条语句中出现的所有表名（去重，保持出现顺序）"""
+        if self._tables is None:
+            tables: Dict[str, None] = {}
+            if self.expressions:
+                for table in self.expressions[0].find_all(sqlglot.exp.Table):
+                    if table.name:
+                        tables[table.name] = None
+            self._tables = list(tables)
+        return list(self._tables)
+
+    @property
+    def alias_mapping(self) -> Dict[str, str]:
+        """表别名到真实表名的映射 {alias: table_name}"""
+        if self._alias_mapping is None:
+            mapping: Dict[str, str] = {}
+            for expression in self.expressions:
+                for table in expression.find_all(sqlglot.exp.Table):
+                    if table.alias:
+                        mapping[table.alias] = table.name
+            self._alias_mapping = mapping
+        return dict(self._alias_mapping)
+
+    def _get_projections(self) -> List[Dict[str, Any]]:
+        if self._projections is None:
+            projections = []
+            for expression in self.expressions:
+                for select in expression.find_all(sqlglot.exp.Select):
+                    for proj in select.expressions:
+                        col_info = {
+                            "name": "",
+                            "alias": "",
+                            "table": "",
+                            "is_aggregate": False,
+                        }
+
+                        if isinstance(proj, _AGGREGATE_TYPES):
+                            col_info["is_aggregate"] = True
+                            col_info["name"] = str(proj)
+                        elif isinstance(proj, sqlglot.exp.Column):
+                            col_info["name"] = proj.name
+                            col_info["table"] = proj.table or ""
+                        elif isinstance(proj, sqlglot.exp.Star):
+                            col_info["name"] = "*"
+                        else:
+                            col_info["name"] = str(proj)
+
+                        if isinstance(proj, sqlglot.exp.Alias):
+                            col_info["alias"] = _clean_alias(proj.alias)
+                            if isinstance(proj.this, _AGGREGATE_TYPES):
+                                col_info["is_aggregate"] = True
+                        elif proj.alias:
+                            col_info["alias"] = _clean_alias(proj.alias)
+
+                        projections.append(col_info)
+            self._projections = projections
+        return self._projections
+
+    def get_select_columns(
+        self, table_alias_mapping: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        SELECT 列的详细信息
+        返回格式: [{"name": "column_name", "alias": "alias_name", "table": "table_name", "is_aggregate": False}, ...]
+
+        Args:
+            table_alias_mapping: 表别名映射字典，如果提供，会将别名转换为真实表名
+        """
+        columns = []
+        for info in self._get_projections():
+            col_info = dict(info)
+            if col_info["table"] and table_alias_mapping:
+                col_info["table"] = table_alias_mapping.get(
+                    col_info["table"], col_info["table"]
+                )
+            columns.append(col_info)
+        return columns
+
+    @property
+    def has_select_all(self) -> bool:
+        """是否包含 SELECT *"""
+        return any(info["name"] == "*" for info in self._get_projections())
+
+
+def parse_sql(sql: str, dialect: str) -> ParsedSQL:
+    """
+    解析 SQL（按 SQL 文本 + 方言缓存，解析失败的结果同样缓存）
+
+    Args:
+        sql: SQL 语句
+        dialect: sqlglot 方言
+
+    Returns:
+        ParsedSQL 解析结果，解析失败时 error 不为空
+    """
+    key = (sql or "", dialect)
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(key)
+        if parsed is not None:
+            _parse_cache.move_to_end(key)
+            return parsed
+
+    try:
+        parsed = ParsedSQL(key[0], dialect, parse(key[0], read=dialect))
+    except Exception as e:
+        logger.warning(f"SQL 解析错误: {e}")
+        parsed = ParsedSQL(key[0], dialect, [], error=str(e))
+
+    with _parse_cache_lock:
+        _parse_cache[key] = parsed
+        _parse_cache.move_to_end(key)
+        while len(_parse_cache) > SQL_PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return parsed
+
+
+def get_parsed_sql(
+    state: Optional[Dict[str, Any]], sql: str, dialect: str
+) -> ParsedSQL:
+    """
+    获取当前 SQL 的解析结果：优先复用 state["parsed_sql"]，不匹配时解析并写回 state
+
+    Args:
+        state: Agent 状态（可为 None）
+        sql: SQL 语句
+        dialect: sqlglot 方言
+
+    Returns:
+        ParsedSQL 解析结果
+    """
+    if state is not None:
+        parsed = state.get("parsed_sql")
+        if isinstance(parsed, ParsedSQL) and parsed.matches(sql or "", dialect):
+            return parsed
+
+    parsed = parse_sql(sql, dialect)
+    if state is not None:
+        state["parsed_sql"] = parsed
+    return parsed
@@ -0,0 +1,174 @@
+"""
+流式接收上传文件
+配合 Sanic 的流式请求体（路由声明 stream=True）按块读取 multipart/form-data，
+文件内容写入 SpooledTemporaryFile（小文件留在内存，超过阈值自动落盘），同时边接收边计算 sha256，
+上传 MinIO 和解析文件时直接读取该临时文件，不再在内存中保留整份请求体
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from sanic import Request
+
+from common.exception import MyException
+from constants.code_enum import SysCodeEnum as SysCode
+
+logger = logging.getLogger(__name__)
+
+# 上传文件在内存中缓冲的最大字节数，超过后写入临时文件
+UPLOAD_SPOOL_MAX_MEMORY = int(
+    os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024))
+)
+# 上传临时文件目录，为空时使用系统临时目录
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR") or None
+
+
+class UploadedFile:
+    """
+    已接收的上传文件
+    - file: 文件内容（SpooledTemporaryFile 或 BytesIO），读取位置已重置到开头
+    - sha256: 文件内容哈希，用于上传去重
+    """
+
+    __slots__ = ("name", "type", "size", "sha256", "file")
+
+    def __init__(self, name: str, content_type: str, size: int, sha256: str, file):
+        self.name = name
+        self.type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.file = file
+
+    @classmethod
+    def from_bytes(cls, name: str, content_type: str, body: bytes) -> "UploadedFile":
+        """由已缓冲的请求体（request.files）构造"""
+        return cls(
+            name,
+            content_type,
+            len(body),
+            hashlib.sha256(body).hexdigest(),
+            io.BytesIO(body),
+        )
+
+    def close(self):
+        try:
+            self.file.close()
+        except Exception:
+            pass
+
+
+def _decode_header_value(value: bytes) -> str:
+    # 浏览器通常以 UTF-8 原样发送文件名
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+async def receive_upload_file(
+    request: Request, field_name: str = "file", max_size: Optional[int] = None
+) -> UploadedFile:
+    """
+    从流式请求体中接收 multipart/form-data 的文件字段
+
+    Args:
+        request: Sanic 请求对象（路由需声明 stream=True）
+        field_name: 文件字段名
+        max_size: 文件大小上限（字节），为空时不限制；超出后立即停止接收
+
+    Returns:
+        UploadedFile，调用方使用完毕后需调用 close()
+    """
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise MyException(SysCode.c_9999, "未找到文件数据")
+
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=UPLOAD_SPOOL_MAX_MEMORY, dir=UPLOAD_TEMP_DIR
+    )
+    hasher = hashlib.sha256()
+    part = {"headers": {}, "field": b"", "value": b"", "target": False}
+    result = {"name": None, "type": None, "size": 0, "done": False}
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", target=False)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"] = b""
+        part["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(
+            part["headers"].get(b"content-disposition")
+        )
+        if (
+            result["name"] is None
+            and disposition.get(b"name") == field_name.encode()
+            and b"filename" in disposition
+        ):
+            part["target"] = True
+            result["name"] = _decode_header_value(disposition[b"filename"])
+            result["type"] = (
+                _decode_header_value(part["headers"].get(b"content-type", b"")).strip()
+                or None
+            )
+
+    def on_part_data(data, start, end):
+        if part["target"]:
+            chunk = data[start:end]
+            spooled.write(chunk)
+            hasher.update(chunk)
+            result["size"] += len(chunk)
+
+    def on_part_end():
+        if part["target"]:
+            part["target"] = False
+            result["done"] = True
+
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    try:
+        while True:
+            chunk = await request.stream.read()
+            if chunk is None:
+                break
+            parser.write(chunk)
+            if max_size is not None and result["size"] > max_size:
+                raise MyException(SysCode.c_9999, "文件大小超出限制")
+        parser.finalize()
+
+        if not result["done"]:
+            raise MyException(SysCode.c_9999, "未找到文件数据")
+        spooled.seek(0)
+        logger.info(f"📥 已接收上传文件: {result['name']} ({result['size']} bytes)")
+        return UploadedFile(
+            result["name"], result["type"], result["size"], hasher.hexdigest(), spooled
+        )
+    except Exception:
+        spooled.close()
+        raise
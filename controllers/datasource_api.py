@@ -2,6 +2,7 @@
 数据源管理API
 """
 
+import asyncio
 import logging
 from typing import Optional
 
@@ -13,7 +14,7 @@ from common.param_parser import parse_params
 from common.permission_util import check_admin_permission
 from common.res_decorator import async_json_resp
 from constants.code_enum import SysCodeEnum
-from model.db_connection_pool import get_db_pool
+from model.db_connection_pool import get_db_pool, run_slow_in_session
 from model.schemas import (
     CheckDatasourceRequest,
     CheckDatasourceResponse,
@@ -287,18 +288,17 @@ async def sync_tables(req: request.Request, ds_id: int, body: SyncTablesRequest)
         data = body.tables if body.tables else []
         is_select_all = getattr(body, "is_select_all", False)  # 获取是否全选标志
 
-        db_pool = get_db_pool()
-        with db_pool.get_session() as session:
-            success = DatasourceService.sync_tables(session, ds_id, data, is_select_all)
-            if not success:
-                raise MyException(SysCodeEnum.DATA_NOT_FOUND, "数据源不存在")
+        # 同步表结构（含 embedding 计算）耗时较长，在长耗时操作线程池中执行，不占用元数据库线程池
+        success = await run_slow_in_session(DatasourceService.sync_tables, ds_id, data, is_select_all)
+        if not success:
+            raise MyException(SysCodeEnum.DATA_NOT_FOUND, "数据源不存在")
 
-            # 返回同步结果，包含选择的表数量信息
-            return {
-                "message": "同步成功",
-                "table_count": len(data),
-                "is_select_all": is_select_all,
-            }
+        # 返回同步结果，包含选择的表数量信息
+        return {
+            "message": "同步成功",
+            "table_count": len(data),
+            "is_select_all": is_select_all,
+        }
     except MyException:
         raise
     except Exception as e:
@@ -468,10 +468,13 @@ async def check_datasource(req: request.Request, body: CheckDatasourceRequest):
         ds_type = body.type
         configuration = body.configuration
 
+        # 连接测试可能等待到超时，在线程池中执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+
         # 如果提供了配置信息，直接测试
         if ds_type and configuration:
-            is_connected, error_message = DatasourceService.check_connection_by_config(
-                ds_type, configuration
+            is_connected, error_message = await loop.run_in_executor(
+                None, DatasourceService.check_connection_by_config, ds_type, configuration
             )
             return {"connected": is_connected, "error_message": error_message}
 
@@ -479,16 +482,18 @@ async def check_datasource(req: request.Request, body: CheckDatasourceRequest):
         if not ds_id:
             raise MyException(SysCodeEnum.PARAM_ERROR, "缺少数据源ID或配置信息")
 
-        db_pool = get_db_pool()
-        with db_pool.get_session() as session:
-            datasource = DatasourceService.get_datasource_by_id(session, ds_id)
-            if not datasource:
-                raise MyException(SysCodeEnum.DATA_NOT_FOUND, "数据源不存在")
+        def _check_by_id():
+            db_pool = get_db_pool()
+            with db_pool.get_session() as session:
+                datasource = DatasourceService.get_datasource_by_id(session, ds_id)
+                if not datasource:
+                    raise MyException(SysCodeEnum.DATA_NOT_FOUND, "数据源不存在")
 
-            # 测试连接
-            is_connected, error_message = DatasourceService.check_connection(datasource)
+                # 测试连接
+                return DatasourceService.check_connection(datasource)
 
-            return {"connected": is_connected, "error_message": error_message}
+        is_connected, error_message = await loop.run_in_executor(None, _check_by_id)
+        return {"connected": is_connected, "error_message": error_message}
     except MyException:
         raise
     except Exception as e:
@@ -529,7 +534,9 @@ async def get_tables_by_conf(req: request.Request, body: GetTablesByConfRequest)
         ds_type = body.type
         configuration = body.configuration
 
-        tables = DatasourceService.get_tables_by_config(ds_type, configuration)
+        # 连接用户数据源读取元数据，在线程池中执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        tables = await loop.run_in_executor(None, DatasourceService.get_tables_by_config, ds_type, configuration)
 
         return tables
     except MyException:
@@ -572,7 +579,8 @@ async def get_fields_by_conf(req: request.Request, body: GetFieldsByConfRequest)
         ds_type = body.type
         config = body.configuration
         table_name = body.table_name
-        fields = DatasourceService.get_fields_by_config(ds_type, config, table_name)
+        loop = asyncio.get_running_loop()
+        fields = await loop.run_in_executor(None, DatasourceService.get_fields_by_config, ds_type, config, table_name)
         return fields
     except MyException:
         raise
@@ -814,12 +822,9 @@ async def preview_data(req: request.Request, body: PreviewDataRequest):
         if not table or not table.get("table_name"):
             raise MyException(SysCodeEnum.PARAM_ERROR, "缺少表信息")
 
-        db_pool = get_db_pool()
-        with db_pool.get_session() as session:
-            preview_result = DatasourceService.preview_table_data(
-                session, body.ds_id, table, fields
-            )
-            return preview_result
+        # 预览需要查询用户数据源，在长耗时操作线程池中执行，不占用元数据库线程池
+        preview_result = await run_slow_in_session(DatasourceService.preview_table_data, body.ds_id, table, fields)
+        return preview_result
     except MyException:
         raise
     except Exception as e:
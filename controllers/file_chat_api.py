@@ -1,9 +1,11 @@
+import asyncio
 import logging
 from typing import Optional
 
 from common.exception import MyException
-from common.minio_util import MinioUtils
+from common.minio_util import MinioUtils, UPLOAD_PARSE_MAX_FILE_SIZE
 from common.res_decorator import async_json_resp
+from common.upload_stream import receive_upload_file
 from constants.code_enum import SysCodeEnum
 from sanic import Blueprint, Request
 from services.file_chat_service import read_excel, read_file_columns
@@ -127,7 +129,7 @@ async def read_file_column(req: Request, file_qa_str: Optional[str] = None, body
     return result
 
 
-@bp.post("/upload_file")
+@bp.post("/upload_file", stream=True)
 @openapi.summary("上传文件")
 @openapi.description("上传文件到MinIO存储")
 @openapi.tag("文件服务")
@@ -162,15 +164,20 @@ async def read_file_column(req: Request, file_qa_str: Optional[str] = None, body
 @async_json_resp
 async def upload_file(request: Request):
     """
-    上传附件
+    上传附件（流式接收请求体，分片上传到 MinIO）
     :param request:
     :return:
     """
-    file_key = minio_utils.upload_file_from_request(request=request)
+    upload = await receive_upload_file(request)
+    try:
+        loop = asyncio.get_running_loop()
+        file_key = await loop.run_in_executor(None, minio_utils.upload_received_file, upload)
+    finally:
+        upload.close()
     return file_key
 
 
-@bp.post("/upload_file_and_parse")
+@bp.post("/upload_file_and_parse", stream=True)
 @openapi.summary("上传文件并解析")
 @openapi.description("上传文件到MinIO并解析文件内容")
 @openapi.tag("文件服务")
@@ -205,11 +212,17 @@ async def upload_file(request: Request):
 @async_json_resp
 async def upload_file_and_parse(request: Request):
     """
-    上传附件并解析内容
+    上传附件并解析内容（流式接收请求体，超出大小上限时立即中止）
     :param request:
     :return:
     """
-    file_key_dict = minio_utils.upload_file_and_parse_from_request(request=request)
+    upload = await receive_upload_file(request, max_size=UPLOAD_PARSE_MAX_FILE_SIZE)
+    try:
+        # 上传与解析为阻塞操作，放到线程池执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        file_key_dict = await loop.run_in_executor(None, minio_utils.upload_and_parse_received_file, upload)
+    finally:
+        upload.close()
     return file_key_dict
 
 
@@ -45,7 +45,7 @@ CREATE TABLE t_datasource_table (
   table_name TEXT NOT NULL,
   table_comment TEXT,
   custom_comment TEXT,
-  embedding TEXT
+  embedding VECTOR
 );
 
 COMMENT ON TABLE t_datasource_table IS '数据源表信息';
@@ -54,7 +54,7 @@ COMMENT ON COLUMN t_datasource_table.checked IS '是否选中';
 COMMENT ON COLUMN t_datasource_table.table_name IS '表名';
 COMMENT ON COLUMN t_datasource_table.table_comment IS '表注释';
 COMMENT ON COLUMN t_datasource_table.custom_comment IS '自定义注释';
-COMMENT ON COLUMN t_datasource_table.embedding IS '表结构 embedding (JSON 数组字符串)';
+COMMENT ON COLUMN t_datasource_table.embedding IS '表结构向量数据（pgvector VECTOR 类型，支持动态维度）';
 
 -- t_datasource_field definition
 DROP TABLE IF EXISTS t_datasource_field CASCADE;
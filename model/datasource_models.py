@@ -2,7 +2,8 @@
 数据源管理模型
 """
 import datetime
-from typing import Optional, List
+from typing import Optional, List, Union
+from pgvector.sqlalchemy import VECTOR
 from sqlalchemy import Column, BigInteger, DateTime, Text, JSON, Boolean
 from sqlalchemy.orm import Mapped, mapped_column
 from model.db_connection_pool import Base
@@ -37,8 +38,11 @@ class DatasourceTable(Base):
     table_name: Mapped[str] = mapped_column(Text, nullable=False, comment="表名")
     table_comment: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="表注释")
     custom_comment: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="自定义注释")
-    # 表结构向量：基于“表名 + 注释 + 字段名 + 字段注释”的文本生成的 embedding，存为 JSON 数组字符串
-    embedding: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="表结构 embedding (JSON 数组字符串)")
+    # 表结构向量：基于“表名 + 注释 + 字段名 + 字段注释”的文本生成的 embedding
+    # pgvector VECTOR 类型，不指定维度，支持动态维度（768/1024等）；旧版本的 TEXT 列可通过 common/migrate_table_embedding.py 迁移
+    embedding: Mapped[Optional[Union[List[float], str]]] = mapped_column(
+        VECTOR, nullable=True, comment="表结构向量数据（pgvector VECTOR 类型，支持动态维度）"
+    )
 
 
 class DatasourceField(Base):
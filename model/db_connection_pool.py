@@ -2,17 +2,33 @@
 基于sqlalchemy ORM框架数据库连接池
 """
 
+import asyncio
+import contextvars
+import functools
 import logging
 import os
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Callable, Generator, Optional, TypeVar
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# 连接池大小与最大溢出
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+# 元数据库阻塞操作的卸载线程数，默认与连接池容量一致，避免线程在等待连接时空转
+METADATA_DB_WORKERS = int(os.getenv("METADATA_DB_WORKERS", DB_POOL_SIZE + DB_MAX_OVERFLOW))
+# 长耗时操作（同步表结构并计算 embedding、预览用户数据源等）的线程数，与元数据库线程池隔离，
+# 避免远程调用长时间占满元数据库线程，使鉴权、数据源选择等短查询排队
+SLOW_DB_TASK_WORKERS = int(os.getenv("SLOW_DB_TASK_WORKERS", 4))
+
 
 class Base(DeclarativeBase):
     pass
@@ -42,8 +58,8 @@ class DBConnectionPool:
 
             self.engine = create_engine(
                 database_uri,
-                pool_size=10,  # 连接池大小
-                max_overflow=20,  # 连接池最大溢出大小
+                pool_size=DB_POOL_SIZE,  # 连接池大小
+                max_overflow=DB_MAX_OVERFLOW,  # 连接池最大溢出大小
                 pool_recycle=3600,  # 连接回收时间（秒），避免长时间连接失效
                 pool_timeout=30,  # 连接池等待超时时间（秒）
                 pool_pre_ping=True,  # 启用连接预检测，确保连接有效性
@@ -98,3 +114,83 @@ def get_db_pool() -> DBConnectionPool:
     :return: DBConnectionPool
     """
     return DBConnectionPool()
+
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_slow_task_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    获取元数据库操作专用线程池（单例模式）
+    """
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=METADATA_DB_WORKERS, thread_name_prefix="metadata-db")
+    return _db_executor
+
+
+def get_slow_task_executor() -> ThreadPoolExecutor:
+    """
+    获取长耗时操作专用线程池（单例模式）
+    """
+    global _slow_task_executor
+    if _slow_task_executor is None:
+        with _db_executor_lock:
+            if _slow_task_executor is None:
+                _slow_task_executor = ThreadPoolExecutor(
+                    max_workers=SLOW_DB_TASK_WORKERS, thread_name_prefix="slow-db-task"
+                )
+    return _slow_task_executor
+
+
+def get_db_executor_backlog() -> int:
+    """等待执行的元数据库操作数量（用于事件循环延迟监控）"""
+    return _db_executor._work_queue.qsize() if _db_executor is not None else 0
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在元数据库专用线程池中执行同步的数据库操作，避免阻塞事件循环
+    用法:
+    result = await run_db(execute_sql_dict, sql)
+    """
+    return await _run_in_executor(get_db_executor(), func, *args, **kwargs)
+
+
+async def _run_in_executor(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    # 与 asyncio.to_thread 一致，复制当前上下文（日志 trace 等 contextvars）
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+async def run_in_session(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在元数据库专用线程池中开启会话并执行 func(session, *args, **kwargs)
+    用法:
+    success = await run_in_session(DatasourceService.sync_tables, ds_id, tables)
+    注意 func 应返回普通数据（字典、标量等）：会话提交后 ORM 对象的属性已过期，脱离会话后无法再读取
+    """
+
+    def _call():
+        with get_db_pool().get_session() as session:
+            return func(session, *args, **kwargs)
+
+    return await run_db(_call)
+
+
+async def run_slow_in_session(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    与 run_in_session 相同，但在长耗时操作专用线程池中执行
+    用于会调用远程 embedding 接口或查询用户数据源的操作，不占用元数据库线程池
+    """
+
+    def _call():
+        with get_db_pool().get_session() as session:
+            return func(session, *args, **kwargs)
+
+    return await _run_in_executor(get_slow_task_executor(), _call)
@@ -0,0 +1,160 @@
+"""
+Text2SQL 问答初始化开销基准测试
+
+对比每次问答的图与数据源服务初始化方式：
+- 每次重建：create_graph() + DatabaseService(ds_id)，并失效模型配置缓存（每次重新查询 t_ai_model、创建模型客户端）
+- 进程内复用：get_compiled_graph() + get_database_service(ds_id)
+
+默认使用临时 SQLite 文件作为元数据库（仅创建 t_datasource / t_ai_model 并写入一条数据源和 embedding / rerank 模型配置），
+不访问外部服务；也可以通过 --db-uri 指定真实的元数据库（需已存在对应数据源与模型配置）。
+
+用法:
+    python scripts/bench_graph_setup.py --iterations 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _prepare_sqlite_metadata_db(ds_id: int) -> str:
+    """创建临时 SQLite 元数据库并写入测试数据源与模型配置，返回数据库文件路径"""
+    fd, path = tempfile.mkstemp(prefix="bench_graph_setup_", suffix=".db")
+    os.close(fd)
+    uri = f"sqlite:///{path}"
+    # 元数据库连接池在导入时按环境变量初始化，必须在导入项目模块前设置
+    os.environ["SQLALCHEMY_DATABASE_URI"] = uri
+
+    from common.datasource_util import DatasourceConfigUtil
+    from model.datasource_models import Datasource
+    from model.db_connection_pool import Base, get_db_pool
+    from model.db_models import TAiModel
+
+    db_pool = get_db_pool()
+    Base.metadata.create_all(
+        db_pool.get_engine(), tables=[Datasource.__table__, TAiModel.__table__]
+    )
+    config = {
+        "host": "127.0.0.1",
+        "port": 3306,
+        "username": "bench",
+        "password": "bench",
+        "database": "bench",
+    }
+    with db_pool.get_session() as session:
+        session.add(
+            Datasource(
+                id=ds_id,
+                name="bench",
+                type="mysql",
+                configuration=DatasourceConfigUtil.encrypt_config(config),
+            )
+        )
+        session.add_all(
+            [
+                TAiModel(
+                    id=1,
+                    supplier=9,
+                    name="bench-embedding",
+                    model_type=2,
+                    base_model="text-embedding-v4",
+                    default_model=True,
+                    api_key="bench",
+                    api_domain="http://127.0.0.1:9/v1",
+                    protocol=1,
+                ),
+                TAiModel(
+                    id=2,
+                    supplier=9,
+                    name="bench-rerank",
+                    model_type=3,
+                    base_model="bge-reranker",
+                    default_model=True,
+                    api_key="bench",
+                    api_domain="http://127.0.0.1:9/rerank",
+                    protocol=1,
+                ),
+            ]
+        )
+        session.commit()
+    return path
+
+
+def _timeit(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name: str, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{name:<12} mean {statistics.mean(samples):8.3f} ms  "
+        f"p50 {statistics.median(samples):8.3f} ms  p95 {p95:8.3f} ms  (n={len(samples)})"
+    )
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Text2SQL 图编译与 DatabaseService 初始化基准测试"
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=100, help="每种方式的测量次数"
+    )
+    parser.add_argument("--warmup", type=int, default=3, help="预热次数（不计入结果）")
+    parser.add_argument("--ds-id", type=int, default=1, help="数据源ID")
+    parser.add_argument(
+        "--db-uri", default=None, help="元数据库 URI，默认使用临时 SQLite 元数据库"
+    )
+    args = parser.parse_args()
+
+    sqlite_path = None
+    if args.db_uri:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.db_uri
+    else:
+        sqlite_path = _prepare_sqlite_metadata_db(args.ds_id)
+
+    import logging
+
+    logging.disable(logging.WARNING)
+
+    from agent.text2sql.analysis.graph import create_graph, get_compiled_graph
+    from agent.text2sql.database.db_service import DatabaseService, get_database_service
+    from common.model_registry import invalidate_model_registry
+
+    ds_id = args.ds_id
+
+    def per_request():
+        # 改动前每次问答的初始化：重新编译图、重新查询模型配置并创建客户端
+        invalidate_model_registry()
+        create_graph()
+        DatabaseService(ds_id)
+
+    def cached():
+        get_compiled_graph()
+        get_database_service(ds_id)
+
+    try:
+        for fn in (per_request, cached):
+            for _ in range(args.warmup):
+                fn()
+        baseline = _report("per-request", _timeit(per_request, args.iterations))
+        reused = _report("cached", _timeit(cached, args.iterations))
+        print(f"speedup      {baseline / reused:.0f}x")
+    finally:
+        if sqlite_path:
+            os.remove(sqlite_path)
+
+
+if __name__ == "__main__":
+    main()
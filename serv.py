@@ -63,6 +63,35 @@ async def ensure_logging_config(app, loop):
         )
 
 
+@app.main_process_start
+async def init_shared_state(app, loop):
+    """
+    在主进程创建跨 worker 共享的状态（模型配置版本号、数据源配置版本号），配置变更时用于通知其它 worker 失效缓存
+    """
+    from multiprocessing import Array, Value
+
+    from common.datasource_util import DATASOURCE_VERSION_SLOTS
+
+    app.shared_ctx.model_config_version = Value("i", 0)
+    app.shared_ctx.datasource_config_versions = Array("i", DATASOURCE_VERSION_SLOTS)
+
+
+@app.before_server_start
+async def bind_shared_state(app, loop):
+    """
+    worker 启动时绑定主进程创建的共享状态
+    """
+    from common.datasource_util import bind_shared_datasource_versions
+    from common.model_registry import bind_shared_version
+
+    model_config_version = getattr(app.shared_ctx, "model_config_version", None)
+    if model_config_version is not None:
+        bind_shared_version(model_config_version)
+    datasource_config_versions = getattr(app.shared_ctx, "datasource_config_versions", None)
+    if datasource_config_versions is not None:
+        bind_shared_datasource_versions(datasource_config_versions)
+
+
 @app.main_process_start
 async def init_minio(app, loop):
     """
@@ -90,6 +119,56 @@ async def init_minio(app, loop):
         )
 
 
+@app.main_process_start
+async def migrate_table_embedding(app, loop):
+    """
+    在主进程启动时将表结构 embedding 列迁移为 pgvector VECTOR 类型（只执行一次，已迁移时跳过）
+    """
+    from common.migrate_table_embedding import migrate_table_embedding_column
+
+    migrate_table_embedding_column()
+
+
+@app.after_server_start
+async def start_excel_session_sweeper(app, loop):
+    """
+    worker 启动后注册表格问答 DuckDB 会话清理任务（释放空闲连接、删除过期会话）
+    """
+    from agent.excel.excel_duckdb_manager import run_session_sweeper
+
+    app.add_task(run_session_sweeper(), name="excel_session_sweeper")
+
+
+@app.after_server_start
+async def start_loop_lag_monitor(app, loop):
+    """
+    worker 启动后注册事件循环延迟监控任务，用于发现阻塞事件循环的同步操作
+    """
+    from common.loop_monitor import run_loop_lag_monitor
+
+    app.add_task(run_loop_lag_monitor(), name="loop_lag_monitor")
+
+
+@app.before_server_stop
+async def close_excel_sessions(app, loop):
+    """
+    worker 退出前关闭表格问答 DuckDB 会话并删除会话数据库文件
+    """
+    from agent.excel.excel_duckdb_manager import get_chat_duckdb_manager
+
+    get_chat_duckdb_manager().close_all()
+
+
+@app.after_server_stop
+async def dispose_datasource_pools(app, loop):
+    """
+    worker 退出时释放用户数据源连接池，避免遗留空闲连接
+    """
+    from common.datasource_util import get_datasource_pool_registry
+
+    get_datasource_pool_registry().dispose_all()
+
+
 autodiscover(
     app,
     controllers,
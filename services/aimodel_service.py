@@ -15,6 +15,20 @@ from model.serializers import model_to_dict
 logger = logging.getLogger(__name__)
 pool = get_db_pool()
 
+
+def _invalidate_model_caches():
+    """
+    模型配置变更后失效依赖模型配置的进程内缓存（模型配置注册表会通知其它 worker 重新加载）
+    """
+    from common.model_registry import invalidate_model_registry
+
+    invalidate_model_registry()
+    try:
+        from agent.text2sql.database.db_service import invalidate_database_service
+        invalidate_database_service()
+    except Exception as e:
+        logger.warning(f"失效模型相关缓存失败: {e}")
+
 async def query_model_list(keyword: str = None, model_type: int = None) -> List[dict]:
     with pool.get_session() as session:
         query = session.query(TAiModel)
@@ -85,6 +99,7 @@ async def add_model(data: dict) -> bool:
         )
         session.add(new_model)
         session.commit()
+        _invalidate_model_caches()
         return True
 
 async def update_model(model_id: int, data: dict) -> bool:
@@ -117,6 +132,7 @@ async def update_model(model_id: int, data: dict) -> bool:
             model.config = json.dumps(data['config_list'])
             
         session.commit()
+        _invalidate_model_caches()
         return True
 
 async def delete_model(model_id: int) -> bool:
@@ -130,6 +146,7 @@ async def delete_model(model_id: int) -> bool:
              
         session.delete(model)
         session.commit()
+        _invalidate_model_caches()
         return True
 
 async def set_default_model(model_id: int) -> bool:
@@ -152,6 +169,7 @@ async def set_default_model(model_id: int) -> bool:
         
         model.default_model = True
         session.commit()
+        _invalidate_model_caches()
         return True
 
 async def get_default_model() -> Optional[dict]:
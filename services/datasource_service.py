@@ -24,6 +24,24 @@ from model.db_models import TAiModel
 logger = logging.getLogger(__name__)
 
 
+def _invalidate_datasource_caches(ds_id: int, changed_tables: Optional[List[str]] = None):
+    """
+    数据源元数据（表/字段/注释）变更后失效问答链路中的缓存
+
+    Args:
+        ds_id: 数据源ID
+        changed_tables: 重新计算了 embedding 的表名，检索索引只增量刷新这些表
+    """
+    try:
+        from agent.text2sql.database.db_service import invalidate_database_service
+        invalidate_database_service(ds_id)
+        if changed_tables:
+            from agent.text2sql.database.retrieval_index import invalidate_table_retrieval_index
+            invalidate_table_retrieval_index(ds_id, changed_tables)
+    except Exception as e:
+        logger.warning(f"失效数据源 {ds_id} 缓存失败: {e}")
+
+
 class DatasourceService:
     """数据源服务类"""
 
@@ -68,6 +86,12 @@ class DatasourceService:
         """根据ID获取数据源"""
         return session.query(Datasource).filter(Datasource.id == ds_id).first()
 
+    @staticmethod
+    def get_datasource_type(session: Session, ds_id: int) -> Optional[str]:
+        """根据ID获取数据源类型，数据源不存在时返回 None"""
+        row = session.query(Datasource.type).filter(Datasource.id == ds_id).first()
+        return row[0] if row else None
+
     @staticmethod
     def create_datasource(session: Session, data: Dict[str, Any], user_id: int) -> Datasource:
         """创建数据源"""
@@ -111,6 +135,16 @@ class DatasourceService:
 
         return datasource
 
+    @staticmethod
+    def _table_names_of(tables: List[Dict[str, Any]]) -> List[str]:
+        """提取前端传入表列表中的表名"""
+        names = []
+        for table_info in tables:
+            table_name = table_info.get("table_name") or table_info.get("tableName")
+            if table_name:
+                names.append(table_name)
+        return names
+
     @staticmethod
     def _save_tables_and_fields(session: Session, datasource: Datasource, tables: List[Dict[str, Any]], is_select_all: bool = False):
         """保存/同步表和字段信息，自动更新计数
@@ -134,7 +168,7 @@ class DatasourceService:
 
         # 获取源库总表数，用于 num 统计
         try:
-            all_db_tables = DatasourceConnectionUtil.get_tables(datasource.type, config)
+            all_db_tables = DatasourceConnectionUtil.get_tables(datasource.type, config, datasource.id)
             total_count = len(all_db_tables)
 
             # 如果是全选，记录日志
@@ -177,7 +211,7 @@ class DatasourceService:
 
             # 同步字段
             try:
-                fields = DatasourceConnectionUtil.get_fields(datasource.type, config, table_name)
+                fields = DatasourceConnectionUtil.get_fields(datasource.type, config, table_name, datasource.id)
             except Exception:
                 fields = []
 
@@ -372,9 +406,8 @@ class DatasourceService:
                     logger.warning(f"离线模型生成表 {table.table_name} 的 embedding 失败")
                     return
 
-            # 将 embedding 转换为 JSON 字符串并保存
-            embedding_json = json.dumps(embedding_vec)
-            table.embedding = embedding_json
+            # 直接保存为 pgvector 向量
+            table.embedding = embedding_vec
 
             logger.info(f"✅ 表 {table.table_name} 的 embedding 计算并保存成功（维度: {len(embedding_vec)}）")
 
@@ -433,9 +466,7 @@ class DatasourceService:
                 for idx, table in enumerate(tables_for_embedding):
                     if idx >= len(data):
                         break
-                    embedding_vec = data[idx].embedding
-                    embedding_json = json.dumps(embedding_vec)
-                    table.embedding = embedding_json
+                    table.embedding = data[idx].embedding
 
                 logger.info(f"✅ 批量表 embedding 计算并保存成功（维度: {len(data[0].embedding) if data else 'unknown'}）")
             else:
@@ -449,8 +480,7 @@ class DatasourceService:
                     try:
                         embedding_vec = generate_embedding_local_sync(docs[idx])
                         if embedding_vec:
-                            embedding_json = json.dumps(embedding_vec)
-                            table.embedding = embedding_json
+                            table.embedding = embedding_vec
                             success_count += 1
                         else:
                             logger.warning(f"离线模型生成表 {table.table_name} 的 embedding 失败")
@@ -497,6 +527,11 @@ class DatasourceService:
 
         session.commit()
         session.refresh(datasource)
+        # 配置提交后再释放旧连接池并递增配置版本号，避免其它 worker 在提交前按旧配置重建
+        if "configuration" in data:
+            from common.datasource_util import get_datasource_pool_registry
+            get_datasource_pool_registry().invalidate(ds_id)
+        _invalidate_datasource_caches(ds_id, DatasourceService._table_names_of(tables) if tables else None)
         return datasource
 
     @staticmethod
@@ -518,7 +553,7 @@ class DatasourceService:
                                             DatasourceConnectionUtil)
         try:
             config = DatasourceConfigUtil.decrypt_config(datasource.configuration)
-            all_db_tables = DatasourceConnectionUtil.get_tables(datasource.type, config)
+            all_db_tables = DatasourceConnectionUtil.get_tables(datasource.type, config, datasource.id)
             total_db_table_count = len(all_db_tables)
             selected_table_count = len(tables)
 
@@ -533,6 +568,7 @@ class DatasourceService:
         # 处理用户选择的表
         DatasourceService._save_tables_and_fields(session, datasource, tables, is_select_all)
         session.commit()
+        _invalidate_datasource_caches(ds_id, DatasourceService._table_names_of(tables))
         return True
 
     @staticmethod
@@ -555,6 +591,16 @@ class DatasourceService:
         session.query(DatasourceTable).filter(DatasourceTable.ds_id == ds_id).delete()
         session.delete(datasource)
         session.commit()
+
+        # 释放该数据源的连接池
+        from common.datasource_util import get_datasource_pool_registry
+        get_datasource_pool_registry().invalidate(ds_id)
+        _invalidate_datasource_caches(ds_id)
+        try:
+            from agent.text2sql.database.retrieval_index import remove_table_retrieval_index
+            remove_table_retrieval_index(ds_id)
+        except Exception as e:
+            logger.warning(f"删除数据源 {ds_id} 检索索引失败: {e}")
         return True
 
     @staticmethod
@@ -644,6 +690,7 @@ class DatasourceService:
             logger.warning(f"更新表 {table.table_name} 的 embedding 失败: {e}", exc_info=True)
 
         session.commit()
+        _invalidate_datasource_caches(table.ds_id, [table.table_name])
         return True
 
     @staticmethod
@@ -682,6 +729,7 @@ class DatasourceService:
                 logger.warning(f"更新表 {table.table_name} 的 embedding 失败: {e}", exc_info=True)
 
         session.commit()
+        _invalidate_datasource_caches(field.ds_id, [table.table_name] if table else None)
         return True
 
     @staticmethod
@@ -740,7 +788,7 @@ class DatasourceService:
 
         try:
             # 执行查询
-            result = DatasourceConnectionUtil.execute_query(datasource.type, config, sql)
+            result = DatasourceConnectionUtil.execute_query(datasource.type, config, sql, datasource.id)
 
             if not result:
                 return {"data": [], "fields": []}
@@ -359,6 +359,10 @@ async def recalculate_table_embeddings(progress_callback: Optional[Callable[[int
                     try:
                         DatasourceService._compute_and_save_table_embeddings_batch(session, items)
                         session.commit()
+
+                        # 表 embedding 已整体更新，失效该数据源检索索引中的向量
+                        from agent.text2sql.database.retrieval_index import invalidate_table_retrieval_index
+                        invalidate_table_retrieval_index(ds.id)
                         
                         # 检查成功数量
                         updated_tables = session.query(DatasourceTable).filter(
@@ -1,44 +1,303 @@
+import asyncio
+import contextvars
 import logging
+import os
+import time
 import traceback
-from typing import List, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from model.db_connection_pool import get_db_pool
-from model.db_models import TAiModel
+from common.model_registry import (
+    MODEL_TYPE_EMBEDDING,
+    config_fingerprint,
+    get_async_model_client,
+    get_model_client,
+    get_model_config,
+)
+from model.db_connection_pool import run_db
 
 logger = logging.getLogger(__name__)
-pool = get_db_pool()
+
+# 查询 embedding 缓存：同一问题在术语检索、训练示例检索和表结构向量检索中只计算一次
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "300"))  # 缓存有效期（秒），默认5分钟
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))  # 最多缓存的查询数量
+_query_embedding_cache: "OrderedDict[Tuple, Tuple[List[float], float]]" = OrderedDict()
+# 正在计算中的查询：并发请求同一查询时等待首个请求的结果，而不是重复调用模型
+_query_embedding_inflight: Dict[Tuple, Future] = {}
+_query_embedding_lock = Lock()
+# 批量生成文档 embedding 时单次请求的文本数量（部分在线模型限制单次最多 10 条）
+DOCUMENT_EMBEDDING_BATCH_SIZE = int(os.getenv("DOCUMENT_EMBEDDING_BATCH_SIZE", "10"))
+# 后台计算查询 embedding 的线程数（检索时与关键词匹配并行，进程内共享）
+QUERY_EMBEDDING_WORKERS = int(os.getenv("QUERY_EMBEDDING_WORKERS", "8"))
+_query_embedding_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_default_embedding_model_sync() -> Optional[Dict[str, Any]]:
+    """
+    获取默认的 embedding 模型配置（同步版本，配置由模型配置注册表缓存）
+    只查找 Embedding 类型的模型（model_type=2），不回退到 LLM
+    没有配置 embedding 模型时返回 None（将使用离线模型）
+    """
+    model = get_model_config(MODEL_TYPE_EMBEDDING)
+    if not model:
+        return None
+    return {
+        "supplier": model["supplier"],
+        "api_key": model["api_key"],
+        "api_domain": model["api_domain"],
+        "base_model": model["base_model"],
+    }
+
+
+def _get_online_client(api_key: str, base_url: str) -> OpenAI:
+    """复用同一 endpoint 的 OpenAI 客户端（及其连接池）"""
+    return get_model_client(
+        ("openai-embedding", base_url, config_fingerprint({"api_key": api_key})),
+        lambda: OpenAI(api_key=api_key, base_url=base_url),
+    )
+
+
+def _get_online_async_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    """复用当前事件循环下同一 endpoint 的 AsyncOpenAI 客户端（及其连接池）"""
+    return get_async_model_client(
+        ("openai-embedding", base_url, config_fingerprint({"api_key": api_key})),
+        lambda: AsyncOpenAI(api_key=api_key, base_url=base_url),
+    )
 
 
 async def get_default_embedding_model():
     """
     获取默认的 embedding 模型配置
     只查找 Embedding 类型的模型（model_type=2），不回退到 LLM
+    数据库查询在元数据库线程池中执行，避免阻塞事件循环
+    """
+    return await run_db(_get_default_embedding_model_sync)
+
+
+def _resolve_online_endpoint(model: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
     """
-    with pool.get_session() as session:
-        # 优先查找默认的 embedding 模型 (model_type=2)
-        model = session.query(TAiModel).filter(
-            TAiModel.model_type == 2,
-            TAiModel.default_model == True
-        ).first()
-
-        # 如果没有默认的，查找任何可用的 embedding 模型
-        if not model:
-            model = session.query(TAiModel).filter(TAiModel.model_type == 2).first()
-
-        # 如果找到了 embedding 模型，返回配置
-        if model:
-            return {
-                "supplier": model.supplier,
-                "api_key": model.api_key,
-                "api_domain": model.api_domain,
-                "base_model": model.base_model
-            }
-        
-        # 没有配置 embedding 模型，返回 None（将使用离线模型）
+    解析在线 embedding 模型的调用参数
+
+    Returns:
+        (api_key, base_url, model_name)，API Domain 为空时返回 None（使用离线模型）
+    """
+    base_url = (model.get("api_domain") or "").strip()
+    if not base_url:
         return None
 
+    # 确保 base_url 包含协议前缀，本地地址默认 http，其它默认 https
+    if not base_url.startswith(("http://", "https://")):
+        if base_url.startswith(("localhost", "127.0.0.1", "0.0.0.0")):
+            base_url = f"http://{base_url}"
+        else:
+            base_url = f"https://{base_url}"
+
+    # Special handling for Ollama to ensure OpenAI compatibility
+    if model["supplier"] == 3:  # Ollama
+        if not base_url.endswith("/v1"):
+            base_url = f"{base_url.rstrip('/')}/v1"
+
+    return model["api_key"] or "empty", base_url, model["base_model"]
+
+
+def _normalize_query_text(text: str) -> str:
+    """归一化查询文本（去除首尾空白并合并连续空白），作为缓存键的一部分"""
+    return " ".join(text.split())
+
+
+def _cache_lookup(key: Tuple) -> Tuple[Optional[List[float]], Optional[Future], bool]:
+    """
+    查询缓存
+
+    Returns:
+        (缓存命中的 embedding, 需要等待或负责完成的 Future, 当前调用方是否负责计算)
+    """
+    with _query_embedding_lock:
+        entry = _query_embedding_cache.get(key)
+        if entry is not None:
+            embedding, cached_time = entry
+            if time.time() - cached_time < QUERY_EMBEDDING_CACHE_TTL:
+                _query_embedding_cache.move_to_end(key)
+                return embedding, None, False
+            del _query_embedding_cache[key]
+
+        future = _query_embedding_inflight.get(key)
+        if future is not None:
+            return None, future, False
+
+        future = Future()
+        _query_embedding_inflight[key] = future
+        return None, future, True
+
+
+def _cache_complete(key: Tuple, future: Future, embedding: Optional[List[float]]):
+    """写入缓存并唤醒等待同一查询的调用方（计算失败时不缓存）"""
+    with _query_embedding_lock:
+        _query_embedding_inflight.pop(key, None)
+        if embedding:
+            _query_embedding_cache[key] = (embedding, time.time())
+            _query_embedding_cache.move_to_end(key)
+            while len(_query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embedding_cache.popitem(last=False)
+    future.set_result(embedding)
+
+
+async def _cached_embedding_async(key: Tuple, compute: Callable) -> Optional[List[float]]:
+    embedding, future, owner = _cache_lookup(key)
+    if future is None:
+        return embedding
+    if not owner:
+        return await asyncio.wrap_future(future)
+
+    embedding = None
+    try:
+        embedding = await compute()
+    finally:
+        _cache_complete(key, future, embedding)
+    return embedding
+
+
+def _cached_embedding_sync(key: Tuple, compute: Callable) -> Optional[List[float]]:
+    embedding, future, owner = _cache_lookup(key)
+    if future is None:
+        return embedding
+    if not owner:
+        return future.result()
+
+    embedding = None
+    try:
+        embedding = compute()
+    finally:
+        _cache_complete(key, future, embedding)
+    return embedding
+
+
+def _local_cache_key(text: str) -> Tuple:
+    from common.local_embedding import DEFAULT_EMBEDDING_MODEL_ID
+
+    return ("local", DEFAULT_EMBEDDING_MODEL_ID, text)
+
+
+async def get_query_embedding(text: str) -> Optional[List[float]]:
+    """
+    生成查询文本的 embedding（带缓存）
+    缓存键为 模型标识 + 归一化文本，同一问题在多个检索器之间只调用一次模型；
+    并发请求同一查询时共享同一次计算。写入类场景（术语、训练数据入库）请使用 generate_embedding。
+    """
+    if not text or not text.strip():
+        return None
+    text = _normalize_query_text(text)
+
+    model = await get_default_embedding_model()
+    endpoint = _resolve_online_endpoint(model) if model else None
+    if endpoint:
+        api_key, base_url, model_name = endpoint
+
+        async def _compute_online():
+            client = _get_online_async_client(api_key, base_url)
+            response = await client.embeddings.create(model=model_name, input=text)
+            return response.data[0].embedding if response.data else None
+
+        try:
+            embedding = await _cached_embedding_async((base_url, model_name, text), _compute_online)
+            if embedding:
+                return embedding
+        except Exception as e:
+            logger.warning(f"Failed to generate query embedding with online model: {e}, falling back to local CPU model")
+
+    from common.local_embedding import generate_embedding_local
+
+    return await _cached_embedding_async(_local_cache_key(text), lambda: generate_embedding_local(text))
+
+
+def get_query_embedding_sync(text: str) -> Optional[List[float]]:
+    """
+    生成查询文本的 embedding（带缓存，同步版本，供线程池中的检索逻辑使用）
+    与 get_query_embedding 共用同一份缓存
+    """
+    if not text or not text.strip():
+        return None
+    text = _normalize_query_text(text)
+
+    model = _get_default_embedding_model_sync()
+    endpoint = _resolve_online_endpoint(model) if model else None
+    if endpoint:
+        api_key, base_url, model_name = endpoint
+
+        def _compute_online():
+            client = _get_online_client(api_key, base_url)
+            response = client.embeddings.create(model=model_name, input=text)
+            return response.data[0].embedding if response.data else None
+
+        try:
+            embedding = _cached_embedding_sync((base_url, model_name, text), _compute_online)
+            if embedding:
+                return embedding
+        except Exception as e:
+            logger.warning(f"Failed to generate query embedding with online model: {e}, falling back to local CPU model")
+
+    from common.local_embedding import generate_embedding_local_sync
+
+    return _cached_embedding_sync(_local_cache_key(text), lambda: generate_embedding_local_sync(text))
+
+
+def submit_query_embedding(text: str) -> "Future[Optional[List[float]]]":
+    """
+    在进程共享的线程池中后台计算查询 embedding（同 get_query_embedding_sync，带缓存）
+    调用方可以先执行其它检索，再通过 future.result() 获取结果
+    """
+    global _query_embedding_executor
+    if _query_embedding_executor is None:
+        with _query_embedding_lock:
+            if _query_embedding_executor is None:
+                _query_embedding_executor = ThreadPoolExecutor(
+                    max_workers=QUERY_EMBEDDING_WORKERS, thread_name_prefix="query-embedding"
+                )
+    # 复制当前上下文（日志 trace 等 contextvars）
+    ctx = contextvars.copy_context()
+    return _query_embedding_executor.submit(ctx.run, get_query_embedding_sync, text)
+
+
+def generate_document_embeddings_sync(texts: List[str]) -> Optional[List[Optional[List[float]]]]:
+    """
+    批量生成文档 embedding（同步版本，不使用查询 embedding 缓存）
+    在线模型按 DOCUMENT_EMBEDDING_BATCH_SIZE 分批请求，失败时回退到本地 CPU 模型
+
+    Returns:
+        与 texts 一一对应的 embedding 列表，全部失败时返回 None
+    """
+    if not texts:
+        return []
+
+    model = _get_default_embedding_model_sync()
+    endpoint = _resolve_online_endpoint(model) if model else None
+    if endpoint:
+        api_key, base_url, model_name = endpoint
+        client = _get_online_client(api_key, base_url)
+        try:
+            embeddings: List[Optional[List[float]]] = []
+            for start in range(0, len(texts), DOCUMENT_EMBEDDING_BATCH_SIZE):
+                batch = texts[start : start + DOCUMENT_EMBEDDING_BATCH_SIZE]
+                response = client.embeddings.create(model=model_name, input=batch)
+                # 按 index 对齐，返回顺序与输入不一致时也能正确映射
+                batch_embeddings: List[Optional[List[float]]] = [None] * len(batch)
+                for position, item in enumerate(response.data or []):
+                    index = getattr(item, "index", position)
+                    if 0 <= index < len(batch):
+                        batch_embeddings[index] = item.embedding
+                embeddings.extend(batch_embeddings)
+            return embeddings
+        except Exception as e:
+            logger.warning(f"Failed to generate document embeddings with online model: {e}, falling back to local CPU model")
+
+    from common.local_embedding import generate_embeddings_local_sync
+
+    return generate_embeddings_local_sync(texts)
+
 
 async def generate_embedding(text: str) -> Optional[List[float]]:
     """Generate embedding for the given text"""
@@ -54,35 +313,19 @@ async def generate_embedding(text: str) -> Optional[List[float]]:
         return await generate_embedding_local(text)
 
     try:
-        api_key = model["api_key"] or "empty"
-        base_url = model.get("api_domain") or ""
-
         # 验证 base_url 是否有效
-        if not base_url or not base_url.strip():
+        endpoint = _resolve_online_endpoint(model)
+        if not endpoint:
             logger.warning("API domain is empty, falling back to local CPU model")
             from common.local_embedding import generate_embedding_local
             return await generate_embedding_local(text)
+        api_key, base_url, model_name = endpoint
+
+        client = _get_online_async_client(api_key, base_url)
+        response = await client.embeddings.create(model=model_name, input=text)
 
-        # 确保 base_url 包含协议前缀
-        base_url = base_url.strip()
-        if not base_url.startswith(("http://", "https://")):
-            # 默认使用 https，如果是本地地址则使用 http
-            if base_url.startswith(("localhost", "127.0.0.1", "0.0.0.0")):
-                base_url = f"http://{base_url}"
-            else:
-                base_url = f"https://{base_url}"
-
-        # Special handling for Ollama to ensure OpenAI compatibility
-        if model["supplier"] == 3:  # Ollama
-            if not base_url.endswith("/v1"):
-                base_url = f"{base_url.rstrip('/')}/v1"
-
-        # 使用 async with 确保客户端被正确关闭
-        async with AsyncOpenAI(api_key=api_key, base_url=base_url) as client:
-            response = await client.embeddings.create(model=model["base_model"], input=text)
-
-            if response.data:
-                return response.data[0].embedding
+        if response.data:
+            return response.data[0].embedding
 
     except Exception as e:
         traceback.print_exc()
@@ -14,7 +14,7 @@ from sqlalchemy.orm import Session
 from common.exception import MyException
 from constants.code_enum import SysCodeEnum, IntentEnum, DataTypeEnum
 from constants.dify_rest_api import DiFyRestApi
-from model.db_connection_pool import get_db_pool
+from model.db_connection_pool import get_db_pool, run_db
 from model.db_models import TUserQaRecord, TUser
 from model.serializers import model_to_dict
 from model.schemas import PaginatedResponse
@@ -83,7 +83,7 @@ def execute_sql_update(sql: str, params: tuple = None):
         return result.rowcount
 
 
-async def authenticate_user(username, password):
+def _authenticate_user_sync(username, password):
     """验证用户凭据并返回用户信息或 None"""
     with pool.get_session() as session:
         session: Session = session
@@ -115,6 +115,11 @@ async def authenticate_user(username, password):
     #     return False
 
 
+async def authenticate_user(username, password):
+    """验证用户凭据并返回用户信息或 None（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_authenticate_user_sync, username, password)
+
+
 async def generate_jwt_token(user_id, username, role="user"):
     """生成 JWT token"""
     payload = {
@@ -207,13 +212,13 @@ async def add_question_record(
             question = question.split("|")[1]
 
         sql = f"select * from t_user_qa_record where user_id={user_id} and chat_id='{chat_id}' and message_id='{message_id}'"
-        log_dict = execute_sql_dict(sql)
+        log_dict = await run_db(execute_sql_dict, sql)
 
         # 根据 message_id 判断是否是同一个问题
         if len(log_dict) > 0:
             sql = f"""update t_user_qa_record set to4_answer='{json.dumps(t04_answer, ensure_ascii=False)}' 
                     where user_id={user_id} and chat_id='{chat_id}' and message_id='{message_id}'"""
-            execute_sql_update(sql)
+            await run_db(execute_sql_update, sql)
         else:
             insert_params = (
                 uuid_str,
@@ -231,7 +236,7 @@ async def add_question_record(
                 f" insert into t_user_qa_record(uuid,user_id,conversation_id, message_id, task_id,chat_id,question,to2_answer,qa_type,file_key) "
                 f"values (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
             )
-            execute_sql_update(sql, insert_params)
+            await run_db(execute_sql_update, sql, insert_params)
 
     except Exception as e:
         traceback.print_exception(e)
@@ -290,7 +295,7 @@ async def add_user_record(
         )
 
         # 执行插入并获取返回的ID
-        result = execute_sql_dict(sql=insert_sql, params=insert_params)
+        result = await run_db(execute_sql_dict, sql=insert_sql, params=insert_params)
         record_id = result[0]["id"] if result else None
         
         return record_id
@@ -323,7 +328,7 @@ async def delete_user_record(user_id, record_ids):
     params = tuple([user_id] + record_ids)
 
     # 执行更新操作
-    execute_sql_update(sql=sql, params=params)
+    await run_db(execute_sql_update, sql=sql, params=params)
 
 
 async def query_user_record(user_id, page, size, search_text, chat_id):
@@ -354,7 +359,7 @@ async def query_user_record(user_id, page, size, search_text, chat_id):
         count_sql = "SELECT COUNT(1) as count FROM t_user_qa_record"
         if conditions:
             count_sql += " WHERE " + " AND ".join(conditions)
-        total_count_result = execute_sql_dict(count_sql)
+        total_count_result = await run_db(execute_sql_dict, count_sql)
         total_count = total_count_result[0]["count"] if total_count_result else 0
         total_pages = (total_count + size - 1) // size
 
@@ -374,7 +379,7 @@ async def query_user_record(user_id, page, size, search_text, chat_id):
             where_clause = " WHERE " + " AND ".join([f"t.{c}" if "id" in c or "question" in c or "chat_id" in c or "user_id" in c else c for c in conditions])
             records_sql += where_clause
         records_sql += f" ORDER BY t.id ASC LIMIT {size} OFFSET {offset}"
-        records = execute_sql_dict(records_sql)
+        records = await run_db(execute_sql_dict, records_sql)
     else:
         # 如果chat_id为空，则需要去重，根据chat_id取id最小的记录
         base_condition = ""
@@ -389,7 +394,7 @@ async def query_user_record(user_id, page, size, search_text, chat_id):
                 GROUP BY chat_id
             ) as distinct_chats
         """
-        total_count_result = execute_sql_dict(count_sql)
+        total_count_result = await run_db(execute_sql_dict, count_sql)
         total_count = total_count_result[0]["count"] if total_count_result else 0
         total_pages = (total_count + size - 1) // size
 
@@ -406,7 +411,7 @@ async def query_user_record(user_id, page, size, search_text, chat_id):
             ORDER BY t.id DESC 
             LIMIT {size} OFFSET {offset}
         """
-        records = execute_sql_dict(records_sql)
+        records = await run_db(execute_sql_dict, records_sql)
 
     return PaginatedResponse(
         records=records,
@@ -449,7 +454,7 @@ async def query_user_record_list(user_id, page, size, search_text):
             GROUP BY chat_id
         ) as distinct_chats
     """
-    total_count_result = execute_sql_dict(count_sql)
+    total_count_result = await run_db(execute_sql_dict, count_sql)
     total_count = total_count_result[0]["count"] if total_count_result else 0
     total_pages = (total_count + size - 1) // size
 
@@ -473,7 +478,7 @@ async def query_user_record_list(user_id, page, size, search_text):
         ORDER BY t.id DESC 
         LIMIT {size} OFFSET {offset}
     """
-    records = execute_sql_dict(records_sql)
+    records = await run_db(execute_sql_dict, records_sql)
 
     return PaginatedResponse(
         records=records,
@@ -502,7 +507,7 @@ def query_user_qa_record(chat_id):
     # return mysql_client.query_mysql_dict(sql)
 
 
-async def get_record_sql(record_id: int, user_id: int) -> dict:
+def _get_record_sql_sync(record_id: int, user_id: int) -> dict:
     """
     根据记录ID查询SQL语句
     :param record_id: 记录ID
@@ -529,6 +534,11 @@ async def get_record_sql(record_id: int, user_id: int) -> dict:
         return {"sql_statement": ""}
 
 
+async def get_record_sql(record_id: int, user_id: int) -> dict:
+    """根据记录ID查询SQL语句（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_get_record_sql_sync, record_id, user_id)
+
+
 async def send_dify_feedback(chat_id, rating):
     """
     发送反馈给指定的消息ID。
@@ -538,7 +548,7 @@ async def send_dify_feedback(chat_id, rating):
     :return: 返回服务器响应。
     """
     # 查询对话记录
-    qa_record = query_user_qa_record(chat_id)
+    qa_record = await run_db(query_user_qa_record, chat_id)
     url = DiFyRestApi.replace_path_params(DiFyRestApi.DIFY_REST_FEEDBACK, {"message_id": qa_record[0]["message_id"]})
     api_key = os.getenv("DIFY_DATABASE_QA_API_KEY")
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
@@ -554,7 +564,7 @@ async def send_dify_feedback(chat_id, rating):
         raise
 
 
-async def query_user_list(page, size, name=None):
+def _query_user_list_sync(page, size, name=None):
     """
     查询用户列表
     :param page: 页码
@@ -589,7 +599,12 @@ async def query_user_list(page, size, name=None):
         )
 
 
-async def add_user(username, password, mobile, role="user"):
+async def query_user_list(page, size, name=None):
+    """查询用户列表（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_query_user_list_sync, page, size, name)
+
+
+def _add_user_sync(username, password, mobile, role="user"):
     """
     添加用户
     :param username: 用户名
@@ -618,6 +633,11 @@ async def add_user(username, password, mobile, role="user"):
         return True
 
 
+async def add_user(username, password, mobile, role="user"):
+    """添加用户（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_add_user_sync, username, password, mobile, role)
+
+
 async def init_super_admin():
     """初始化超级管理员"""
     admin_name = "admin"
@@ -655,7 +675,7 @@ async def init_super_admin():
 
 
 
-async def update_user(user_id, username, mobile, password=None):
+def _update_user_sync(user_id, username, mobile, password=None):
     """
     更新用户
     :param user_id: 用户ID
@@ -683,7 +703,12 @@ async def update_user(user_id, username, mobile, password=None):
         return True
 
 
-async def delete_user(user_id):
+async def update_user(user_id, username, mobile, password=None):
+    """更新用户（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_update_user_sync, user_id, username, mobile, password)
+
+
+def _delete_user_sync(user_id):
     """
     删除用户
     :param user_id: 用户ID
@@ -696,3 +721,8 @@ async def delete_user(user_id):
         session.delete(user)
         session.commit()
         return True
+
+
+async def delete_user(user_id):
+    """删除用户（数据库操作在元数据库线程池中执行）"""
+    return await run_db(_delete_user_sync, user_id)